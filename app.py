@@ -1,83 +1,162 @@
 import gradio as gr
 import pandas as pd
-from generate_data import generate_intelligent_sourcing_excel
-from read_data import load_excel_data
-from create_optimization_problem import create_sourcing_problem
-from solve_optimization_problem import solve_sourcing_problem
-from network_diagram import create_sourcing_graph, display_gallery
 import os
-import requests
+import shutil
+import re
+import threading
+from generate_data import generate_intelligent_sourcing_excel
+from read_data import load_data_cached, file_signature, load_tables, save_tables, read_sheets, write_sheets, list_sheets
+from result_writer import write_results, read_results, RESULT_SHEETS
+from sheet_pages import sheet_page, save_sheet_page, PAGE_SIZE, ROW_COLUMN
+from run_report import RunReport
+from job_queue import JobQueue, JobQueueFull
+from workspace import Workspace
 
 # Default file name
 default_file = "Intelligent_Sourcing.xlsx"
 
-# Dictionary to store sheet data
-df_sheets = {}
+# Sample dataset every session starts with. Set SOURCING_STORE to a SQLite file (.sqlite) to keep the
+# datasets in an indexed store with row-level updates; workbooks are then only used for import and export.
+# Sessions never write it, their edits go to a copy in their own workspace.
+store_file = os.environ.get("SOURCING_STORE", default_file)
 
-# Function to read the Markdown file from GitHub
-def read_markdown_file_github(url):
-    response = requests.get(url)
-    if response.status_code == 200:
-        readme_content = response.text
-    else:
-        readme_content = "Failed to load {url}"
-    return readme_content[237:] # exclude first part of README.md file in GitHub
+# Diagrams of all orders are drawn after every run up to this many orders, beyond that an order
+# is only drawn when it is selected in the Plots tab
+EAGER_PLOT_ORDERS = 50
+
+# Workspace of every session, by session hash. None is the session of direct calls outside the UI.
+workspaces = {}
+workspaces_lock = threading.Lock()
+
+# Optimization runs are queued and run in the background, so a long run does not block the app. Runs of
+# different sessions work in their own workspaces and run side by side, runs of one session one after the other.
+optimization_jobs = JobQueue(max_workers=min(4, os.cpu_count() or 1), max_jobs=16)
+
+# Function to get the workspace of a session, created on its first action
+def get_workspace(request=None):
+    session = request.session_hash if request is not None else None
+    with workspaces_lock:
+        if session not in workspaces:
+            workspaces[session] = Workspace(store_file)
+        return workspaces[session]
+
+# Function to delete the workspace of a session when its page is closed
+def close_workspace(request: gr.Request):
+    with workspaces_lock:
+        workspace = workspaces.pop(request.session_hash, None)
+    if workspace is not None:
+        with workspace.lock:
+            workspace.close()
+
+# Function to copy a workbook into a store, if the store is not the workbook itself
+def import_workbook(workbook, store):
+    if store != workbook:
+        save_tables(store, load_tables(workbook))
+
+# Function to make a workbook in the workspace the dataset of the session
+def use_workbook(workspace, workbook):
+    store = workspace.path(os.path.basename(store_file)) if store_file != default_file else workbook
+    import_workbook(workbook, store)
+    workspace.dataset = store
+
+# Function to read the README shipped with the app, without the Hugging Face Spaces configuration before the first heading
+def read_readme(file="README.md"):
+    text = read_markdown_file(file)
+    heading = re.search(r"^# ", text, re.MULTILINE)
+    return text[heading.start():] if heading else text
 
 # Function to read the Markdown file
 def read_markdown_file(file):
     with open(file, "r", encoding="utf-8") as f:
         return f.read()
 
-# Function to load the default Excel file
+# Function to list the sheets of the sample dataset and the results of a run
 def load_default_file():
-    global df_sheets
     try:
-        df_sheets = pd.read_excel(default_file, sheet_name=None)
-        return list(df_sheets.keys())
+        sheets = list_sheets(store_file)
+        return sheets + [sheet for sheet in RESULT_SHEETS if sheet not in sheets]
     except Exception as e:
         return ["Error loading default file: " + str(e)]
 
 # Function to upload a new Excel file
-def upload_file(file):
-    global df_sheets
+def upload_file(file, request: gr.Request = None):
     if file is None:
         return {"message": "Please upload a file."}
-    
-    # Save uploaded file as default
-    file_path = default_file
-    with open(file_path, "wb") as f:
-        f.write(file.read())
-    
-    df_sheets = pd.read_excel(file_path, sheet_name=None)
-    return list(df_sheets.keys())
-
-# Function to load a selected sheet
-def load_sheet(sheet_name):
-    df_sheets = pd.read_excel(default_file, sheet_name=None)
-    if sheet_name in df_sheets:
-        return df_sheets[sheet_name]
-    return pd.DataFrame()
-
-# Function to save edited data back to the sheet
-def save_changes(sheet_name, edited_df):
-    global df_sheets
-    # Write data to Excel
-    with pd.ExcelWriter(default_file, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
-        edited_df.to_excel(writer, sheet_name=sheet_name, index=False)
-    df_sheets = pd.read_excel(default_file, sheet_name=None)
-    return "Changes saved!"
+    workspace = get_workspace(request)
+
+    with workspace.lock:
+        # Save uploaded file as the workbook of the session
+        file_path = workspace.path(default_file)
+        shutil.copyfile(file, file_path)
+        use_workbook(workspace, file_path)
+        return list_sheets(workspace.dataset)
+
+# Function to find the file holding a sheet, the results of the session or the dataset.
+# Results of the last run come first, a workbook may still hold the result sheets of an older run.
+def sheet_file(workspace, sheet_name):
+    if (sheet_name in RESULT_SHEETS and os.path.exists(workspace.results_file)
+            and sheet_name in list_sheets(workspace.results_file)):
+        return workspace.results_file
+    if sheet_name in list_sheets(workspace.dataset):
+        return workspace.dataset
+    return None
+
+# Function to load a page of a selected sheet, filtered on one column
+def load_sheet(sheet_name, page=1, filter_column=None, filter_value=None, request: gr.Request = None):
+    workspace = get_workspace(request)
+    filepath = sheet_file(workspace, sheet_name)
+    if filepath is None:
+        return pd.DataFrame(), 1, "No data"
+    page_df, page, num_rows, num_pages = sheet_page(filepath, sheet_name, page, PAGE_SIZE, filter_column, filter_value)
+    if not num_rows:
+        return page_df, page, "No rows"
+    first = (page - 1) * PAGE_SIZE + 1
+    return page_df, page, f"Rows {first:,}-{first + len(page_df) - 1:,} of {num_rows:,} (page {page} of {num_pages})"
+
+# Function to load the first page of a newly selected sheet and offer its columns as filters
+def select_sheet(sheet_name, request: gr.Request = None):
+    page_df, page, page_info = load_sheet(sheet_name, request=request)
+    columns = [column for column in page_df.columns if column != ROW_COLUMN]
+    return page_df, page, page_info, gr.update(choices=columns, value=None), ""
+
+# Functions to move to the previous or next page
+def previous_page(sheet_name, page, filter_column, filter_value, request: gr.Request = None):
+    return load_sheet(sheet_name, (page or 1) - 1, filter_column, filter_value, request)
+
+def next_page(sheet_name, page, filter_column, filter_value, request: gr.Request = None):
+    return load_sheet(sheet_name, (page or 1) + 1, filter_column, filter_value, request)
+
+# Function to save the edited rows of a page back to the sheet
+def save_changes(sheet_name, edited_df, request: gr.Request = None):
+    workspace = get_workspace(request)
+    with workspace.lock:
+        filepath = sheet_file(workspace, sheet_name)
+        if filepath is None:
+            return "Nothing to save."
+        if filepath == workspace.dataset:
+            filepath = workspace.writable_dataset()
+        # Only the changed rows are written to the store, a workbook is written once with the changes
+        changed = save_sheet_page(filepath, sheet_name, edited_df)
+    return f"Changes saved! {changed} rows changed." if changed else "No changes to save."
 
 # Function to download the updated Excel file
-def download_file():
-    output_path = default_file
+def download_file(request: gr.Request = None):
+    workspace = get_workspace(request)
+    output_path = workspace.path(os.path.join("download", default_file))
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    # Export the inputs together with the results of the last run
+    with workspace.lock:
+        df_sheets = {**read_sheets(workspace.dataset), **read_results(workspace.results_file)}
     with pd.ExcelWriter(output_path) as writer:
         for sheet, df in df_sheets.items():
             df.to_excel(writer, sheet_name=sheet, index=False)
     return output_path
 
 # Define parameters for data generation
-def generate_data(num_of_warehouses, num_of_products, num_of_orders, weightage_Cost, weightage_Priority, weightage_distance, weightage_days, range_priority, range_prod_stock, range_order, range_cost, range_distance, range_days):
-    output_filename = "Intelligent_Sourcing.xlsx"
+def generate_data(num_of_warehouses, num_of_products, num_of_orders, weightage_Cost, weightage_Priority, weightage_distance, weightage_days, range_priority, range_prod_stock, range_order, range_cost, range_distance, range_days,
+                  request: gr.Request = None):
+    workspace = get_workspace(request)
+    output_filename = workspace.path(default_file)
     
     # Convert string inputs to appropriate types
     range_priority = eval(range_priority)
@@ -87,161 +166,330 @@ def generate_data(num_of_warehouses, num_of_products, num_of_orders, weightage_C
     range_distance = eval(range_distance)
     range_days = eval(range_days)
     
-    generate_intelligent_sourcing_excel(output_filename, int(num_of_warehouses), int(num_of_products), int(num_of_orders), 
-                                        float(weightage_Cost), float(weightage_Priority), float(weightage_distance), float(weightage_days), 
-                                        range_priority, range_prod_stock, range_order, range_cost, range_distance, range_days)
+    with workspace.lock:
+        generate_intelligent_sourcing_excel(output_filename, int(num_of_warehouses), int(num_of_products), int(num_of_orders), 
+                                            float(weightage_Cost), float(weightage_Priority), float(weightage_distance), float(weightage_days), 
+                                            range_priority, range_prod_stock, range_order, range_cost, range_distance, range_days)
+        use_workbook(workspace, output_filename)
     return "New data generated successfully!"
 
 # Function to save weightage values
-def save_weightage(weightage_Cost, weightage_Priority, weightage_distance, weightage_days):
-    # Create weightage DataFrame
-    weightage_df = pd.DataFrame({
-        'Variable': ['Cost', 'Priority', 'Distance', 'Days'],
-        'Weightage': [weightage_Cost, weightage_Priority, weightage_distance, weightage_days]
-    })
-    # Write data to Excel
-    with pd.ExcelWriter(default_file, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
-        weightage_df.to_excel(writer, sheet_name='Weightage', index=False)
+def save_weightage(weightage_Cost, weightage_Priority, weightage_distance, weightage_days, request: gr.Request = None):
+    workspace = get_workspace(request)
+    with workspace.lock:
+        problem_up_to_date = (workspace.sourcing_problem is not None
+                              and file_signature(workspace.dataset) == workspace.sourcing_problem_signature)
+
+        # Create weightage DataFrame
+        weightage_df = pd.DataFrame({
+            'Variable': ['Cost', 'Priority', 'Distance', 'Days'],
+            'Weightage': [weightage_Cost, weightage_Priority, weightage_distance, weightage_days]
+        })
+        # Write data to the workbook, or the four weightage rows to the store
+        write_sheets(workspace.writable_dataset(), {'Weightage': weightage_df})
+
+        # Only the weightage changed, so the last problem can still be reused with a new objective
+        workspace.sourcing_weightage_dict = dict(zip(weightage_df['Variable'], weightage_df['Weightage']))
+        if problem_up_to_date:
+            workspace.sourcing_problem_signature = file_signature(workspace.dataset)
     return "Weights saved successfully!"
 
-# Run optimization problem
-def run_optimization():
-    # Read Data
-    weightage_dict, priority_df, warehouse_df, order_df, cost_df, distance_df, days_df = load_excel_data(default_file)
+# Function to report the phases of a run to its job, and stop the run between phases once it is cancelled
+def job_listener(job):
+    # Once the solve is done, a solution found within the time budget is still written and drawn
+    solved = False
+    def listener(name, record):
+        nonlocal solved
+        if record is None:
+            job.check(budget=not solved)
+            job.report(f"{name}...")
+        else:
+            solved = solved or name == "Solve"
+            job.report(f"{name} done in {record['Wall Time (s)']:.2f}s")
+    return listener
+
+# Run optimization problem in a workspace, as a job of optimization_jobs if given
+def run_optimization(job=None, workspace=None):
+    workspace = workspace if workspace is not None else get_workspace()
+    with workspace.lock:
+        return _run_optimization(job, workspace)
 
-    # Create LP Problem
-    prob, Warehouses, Products, Stock, Priority, Orders, Quantity, Variable = create_sourcing_problem(weightage_dict, priority_df, 
-                                                                                                      warehouse_df, order_df, cost_df, distance_df, days_df)
+def _run_optimization(job, workspace):
+    # The solver and plotting stacks are imported on the first run, so the app starts without them
+    from create_optimization_problem import create_sourcing_problem, update_sourcing_weights
+    from solve_optimization_problem import solve_sourcing_problem, progress_message, SolveStopped, SOLUTION_STATUSES, FEASIBLE_STATUS
+    from presolve import presolve_message
+    from network_diagram import create_sourcing_graph
+
+    # Peak memory is not traced, tracing covers the whole process and runs of other sessions overlap
+    report = RunReport(trace_memory=False, listener=job_listener(job) if job is not None else None)
+
+    if (workspace.sourcing_problem is not None
+            and file_signature(workspace.dataset) == workspace.sourcing_problem_signature):
+        # Only the weightage changed since the last run: swap the objective and warm start from the last solution
+        with report.phase("Update Weights"):
+            update_sourcing_weights(workspace.sourcing_problem[0], workspace.sourcing_weightage_dict)
+        warm_start = True
+    else:
+        signature = file_signature(workspace.dataset)
+
+        # Read Data
+        with report.phase("Load Data"):
+            weightage_dict, priority_df, warehouse_df, order_df, cost_df, distance_df, days_df = load_data_cached(workspace.dataset)
+
+        # Create LP Problem
+        workspace.sourcing_problem = create_sourcing_problem(weightage_dict, priority_df, warehouse_df, order_df, cost_df, distance_df, days_df,
+                                                             report=report)
+        # Only kept once complete, a run cancelled before this point leaves the last problem as it was
+        workspace.sourcing_problem_signature = signature
+        workspace.sourcing_weightage_dict = weightage_dict
+        warm_start = False
+    prob, Warehouses, Products, Stock, Priority, Orders, Quantity, Variable = workspace.sourcing_problem
     #print(prob.objective)
 
-    # Solve LP Problem
-    status, fulfillment_solution, warehouse_stock_status = solve_sourcing_problem(prob, Warehouses, Products, Stock,
-                                                                                   Priority, Orders, Quantity, Variable)
+    # Solve LP Problem, the solver is stopped as soon as the job is cancelled
+    try:
+        status, fulfillment_solution, warehouse_stock_status = solve_sourcing_problem(prob, Warehouses, Products, Stock,
+                                                                                       Priority, Orders, Quantity, Variable,
+                                                                                       warm_start=warm_start,
+                                                                                       presolve=not warm_start,
+                                                                                       nonzero_only=True,
+                                                                                       report=report,
+                                                                                       time_limit=job.remaining_time() if job is not None else None,
+                                                                                       progress=(lambda *update: job.report(progress_message(*update))) if job is not None else None,
+                                                                                       stop=(lambda: job.cancelled) if job is not None else None)
+    except SolveStopped:
+        job.check(budget=False)
+        raise
+    if job is not None:
+        job.report(f"Solver status: {status}, solved as {prob.solve_info['path']}")
+
+    if status in SOLUTION_STATUSES:
+        with report.phase("Write Results"):
+            # Write the shipments with a non-zero quantity and the stock levels next to the inputs;
+            # a store holds the results itself, so it is copied into the workspace first
+            if workspace.is_store:
+                workspace.writable_dataset()
+            write_results(workspace.results_file, fulfillment_solution, warehouse_stock_status)
+
+        # Only the result tables changed, so the problem stays reusable
+        workspace.sourcing_problem_signature = file_signature(workspace.dataset)
 
-    if status == "Optimal":
-        # Create a Pandas Excel writer using XlsxWriter as the engine.
-        writer = pd.ExcelWriter(default_file, engine='openpyxl',
-                                mode='a', if_sheet_exists='replace')
+        with report.phase("Network Diagram"):
+            lazy = fulfillment_solution["Order"].nunique() > EAGER_PLOT_ORDERS
+            workspace.plot_shipments = create_sourcing_graph(fulfillment_solution, plot_folder=workspace.plot_folder,
+                                                             lazy=lazy)
+        # Get all image files in the plot folder of the workspace
+        plot_images = [os.path.join(workspace.plot_folder, filename) for filename in os.listdir(workspace.plot_folder)
+                       if filename.endswith(('.png', '.jpg', '.jpeg'))]
+        shipped_orders = set(workspace.plot_shipments["Order"])
+        plot_orders = gr.update(choices=[o for o in prob.sourcing_model.orders if o in shipped_orders], value=None)
 
-        # Write each DataFrame to a different worksheet.
-        fulfillment_solution.to_excel(writer, sheet_name='Fulfillment Solution', index=False)
-        warehouse_stock_status.to_excel(writer, sheet_name='Warehouse Stock Status', index=False)
+        message = f'Optimization Status: {status}'
+        if status == FEASIBLE_STATUS and prob.solve_info['gap'] is not None:
+            # Best solution found within the time budget, not proven optimal
+            message += f" - gap to the best bound {prob.solve_info['gap']:.2%}"
+        return message, fulfillment_solution, warehouse_stock_status, plot_images, report.to_dict(), plot_orders
+    else:
+        message = f'Solution not found!!!! - status is - {status}'
+        if "presolve" in prob.solve_info and not prob.solve_info["presolve"]["feasible"]:
+            # Name the products and orders that make the problem infeasible
+            message += '\n' + presolve_message(prob.solve_info["presolve"])
+        return message, gr.update(visible=False), gr.update(visible=False), gr.update(visible=False), report.to_dict(), gr.update(choices=[], value=None)
 
-        # Close the Pandas Excel writer and output the Excel file.
-        writer.close()
+# Function to describe the progress of a job
+def job_progress(job):
+    if job.status == "Queued":
+        ahead = optimization_jobs.position(job)
+        header = f"Run {job.id} is queued" + (f" behind {ahead} other runs" if ahead else "")
+    else:
+        header = f"Run {job.id}: {job.status}" + (f" - {job.error}" if job.error else "")
+    return "\n".join([header] + job.progress)
 
-        create_sourcing_graph(fulfillment_solution)
-        # Get all image files in the '/tmp/plots' folder
-        plot_images = [os.path.join("/tmp/plots", filename) for filename in os.listdir("/tmp/plots") if filename.endswith(('.png', '.jpg', '.jpeg'))]
+# Queue an optimization run and stream its progress until the results are there
+def run_optimization_job(time_budget, request: gr.Request = None):
+    no_change = [gr.update()] * 5
+    try:
+        job = optimization_jobs.submit(run_optimization, get_workspace(request), time_budget=time_budget or None)
+    except JobQueueFull:
+        yield "Too many optimization runs are queued, please try again later.", *no_change, None
+        return
 
-        return f'Optimization Status: {status}', fulfillment_solution, warehouse_stock_status, plot_images
+    for job in optimization_jobs.follow(job):
+        if not job.finished.is_set():
+            yield job_progress(job), *no_change, job.id
+    if job.status == "Done":
+        message, *outputs = job.result
+        yield message + "\n" + job_progress(job), *outputs, None
     else:
-        return f'Solution not found!!!! - status is - {status}', gr.update(visible=False), gr.update(visible=False), gr.update(visible=False)
-
-# Generate excel sheet on app startup
-# Define parameters for execution
-output_filename = "Intelligent_Sourcing.xlsx"
-num_of_warehouses = 4
-num_of_products = 10
-num_of_orders = 4
-weightage_Cost = 1
-weightage_Priority = 0.75
-weightage_distance = 0.5
-weightage_days = 0.25
-range_priority = (1, 10)
-range_prod_stock = (1, 100)
-range_order = (1, 10)
-range_cost = (1, 300)
-range_distance = (1, 200)
-range_days = (1, 7)
-# Run function
-generate_intelligent_sourcing_excel(output_filename, num_of_warehouses, num_of_products, num_of_orders, weightage_Cost, weightage_Priority,
-                                    weightage_distance, weightage_days, range_priority, range_prod_stock, range_order, range_cost, range_distance, range_days)
-
-# Gradio UI
-with gr.Blocks(theme=gr.themes.Soft()) as app:
-    gr.Markdown("""# Intelligent Sourcing """)
-    with gr.Tabs():
-
-        with gr.TabItem("About this App"):
-            gr.Markdown(read_markdown_file_github("https://raw.githubusercontent.com/kk20krishna/Intelligent-Sourcing/refs/heads/main/README.md"))
-        
-        with gr.TabItem("📖 How to use this App"):
-            gr.Markdown(read_markdown_file("app_doc.md"))
-
-        with gr.TabItem("Run Optimization"):
-            gr.Markdown("""### Run Optimization\nAdjust weightage parameters and run optimization.""")
-            run_weightage_Cost = gr.Slider(label="Weightage Cost", minimum=0, maximum=1, value=0.5, step=0.25, interactive=True)
-            run_weightage_Priority = gr.Slider(label="Weightage Priority", minimum=0, maximum=1, value=0.5, step=0.25, interactive=True)
-            run_weightage_distance = gr.Slider(label="Weightage Distance", minimum=0, maximum=1, value=0.5, step=0.25, interactive=True)
-            run_weightage_days = gr.Slider(label="Weightage Days", minimum=0, maximum=1, value=0.25, step=0.25, interactive=True)
-            save_Weightage_button = gr.Button("Save Weightage")
-            weightage_message_output = gr.Textbox(label="Status", interactive=False)
-            run_optimization_button = gr.Button("Run Optimization")
-            run_optimization_message_output = gr.Textbox(label="Status", interactive=False)
-            with gr.Tabs():
-                with gr.TabItem("Results: Fulfillment Solution"):
-                    fulfillment_dataframe = gr.Dataframe(label="Fulfillment Solution")
-                with gr.TabItem("Results: Warehouse Stock Status"):
-                    warehouse_stock_dataframe = gr.Dataframe(label="Warehouse Stock Status")
-                with gr.TabItem("Results: Plots"):
-                    gallery_output = gr.Gallery(label="Plots")
-
-            # Button bindings
-            run_optimization_button.click(run_optimization, inputs=[], 
-                                          outputs=[run_optimization_message_output, 
-                                                   fulfillment_dataframe, 
-                                                   warehouse_stock_dataframe,
-                                                   gallery_output])
-            save_Weightage_button.click(save_weightage, 
-                                        inputs=[run_weightage_Cost, run_weightage_Priority, 
-                                                run_weightage_distance, run_weightage_days], 
-                                        outputs=weightage_message_output)
-
-        with gr.TabItem("View/Edit Data"):
-            gr.Markdown("""### View/Edit Data\nSelect a sheet to view and edit data.""")
-            sheet_dropdown = gr.Dropdown(choices=load_default_file(), label="Select Sheet", interactive=True)
-            dataframe = gr.Dataframe(load_sheet('Weightage'), label="Edit Data", interactive=True)
-            save_button = gr.Button("Save Changes", variant="primary")
-            view_data_message_output = gr.Textbox(label="Status Message", interactive=False)
-
-            # Button Bindings
-            sheet_dropdown.change(load_sheet, sheet_dropdown, dataframe)
-            save_button.click(save_changes, [sheet_dropdown, dataframe], view_data_message_output)
-        
-        with gr.TabItem("Generate Data"):
-            gr.Markdown("""### Generate Data\nEnter parameters to generate new intelligent sourcing data.""")
-            generate_button = gr.Button("Generate Data")
-            generate_data_message_output = gr.Textbox(label="Status Message", interactive=False)
-            num_of_warehouses = gr.Textbox(label="Number of Warehouses", value="4")
-            num_of_products = gr.Textbox(label="Number of Products", value="10")
-            num_of_orders = gr.Textbox(label="Number of Orders", value="2")
-            weightage_Cost = gr.Slider(label="Weightage Cost", minimum=0, maximum=1, value=0.5, step=0.25, interactive=True)
-            weightage_Priority = gr.Slider(label="Weightage Priority", minimum=0, maximum=1, value=0.5, step=0.25, interactive=True)
-            weightage_distance = gr.Slider(label="Weightage Distance", minimum=0, maximum=1, value=0.5, step=0.25, interactive=True)
-            weightage_days = gr.Slider(label="Weightage Days", minimum=0, maximum=1, value=0.5, interactive=True)
-            range_priority = gr.Textbox(label="Range Priority", value="(1, 10)")
-            range_prod_stock = gr.Textbox(label="Range Product Stock", value="(1, 100)")
-            range_order = gr.Textbox(label="Range Order", value="(1, 10)")
-            range_cost = gr.Textbox(label="Range Cost", value="(1, 500)")
-            range_distance = gr.Textbox(label="Range Distance", value="(1, 300)")
-            range_days = gr.Textbox(label="Range Days", value="(1, 14)")
-
-            # Button Bindings
-            generate_button.click(generate_data, 
-                                  inputs=[num_of_warehouses, num_of_products, num_of_orders, 
-                                          weightage_Cost, weightage_Priority, weightage_distance, weightage_days, 
-                                          range_priority, range_prod_stock, range_order, range_cost, range_distance, range_days], 
-            outputs=generate_data_message_output)
-        
-        with gr.TabItem("Upload/Download Data"):
-            gr.Markdown("""### Upload file / download file""")
-            file_upload = gr.File(label="Upload Excel File", type="filepath")
-            download_button = gr.Button("Download Updated File")
-            file_output = gr.File(label="Download Processed File", value=default_file)
-
-            # Button Bindings
-            file_upload.upload(upload_file, file_upload, sheet_dropdown)
-            download_button.click(download_file, inputs=[], outputs=file_output)
-        
-app.launch()
+        yield job_progress(job), *no_change, None
+
+# Cancel the run of this session
+def cancel_optimization(job_id):
+    if job_id is not None and optimization_jobs.cancel(job_id):
+        return f"Cancelling run {job_id}..."
+    return "No optimization run to cancel."
+
+# Draw the diagram of the order selected in the Plots tab
+def show_order_plot(order, request: gr.Request = None):
+    workspace = get_workspace(request)
+    if workspace.plot_shipments is None or not order:
+        return gr.update()
+    from network_diagram import draw_order_graph
+    path = draw_order_graph(workspace.plot_shipments, order, plot_folder=workspace.plot_folder)
+    return [path] if path else []
+
+# Function to generate the sample dataset on app startup, only if it does not exist yet. The data only depends on
+# the parameters and the seed, so a dataset left by an earlier start is the same.
+def prepare_sample_dataset():
+    if not os.path.exists(store_file):
+        if not os.path.exists(default_file):
+            # Define parameters for execution
+            output_filename = "Intelligent_Sourcing.xlsx"
+            num_of_warehouses = 4
+            num_of_products = 10
+            num_of_orders = 4
+            weightage_Cost = 1
+            weightage_Priority = 0.75
+            weightage_distance = 0.5
+            weightage_days = 0.25
+            range_priority = (1, 10)
+            range_prod_stock = (1, 100)
+            range_order = (1, 10)
+            range_cost = (1, 300)
+            range_distance = (1, 200)
+            range_days = (1, 7)
+            # Run function
+            generate_intelligent_sourcing_excel(output_filename, num_of_warehouses, num_of_products, num_of_orders, weightage_Cost, weightage_Priority,
+                                                weightage_distance, weightage_days, range_priority, range_prod_stock, range_order, range_cost, range_distance, range_days)
+        import_workbook(default_file, store_file)
+
+# Function to build the Gradio UI
+def create_app():
+    with gr.Blocks(theme=gr.themes.Soft()) as app:
+        gr.Markdown("""# Intelligent Sourcing """)
+        with gr.Tabs():
+
+            with gr.TabItem("About this App"):
+                gr.Markdown(read_readme())
+
+            with gr.TabItem("📖 How to use this App"):
+                gr.Markdown(read_markdown_file("app_doc.md"))
+
+            with gr.TabItem("Run Optimization"):
+                gr.Markdown("""### Run Optimization\nAdjust weightage parameters and run optimization.""")
+                run_weightage_Cost = gr.Slider(label="Weightage Cost", minimum=0, maximum=1, value=0.5, step=0.25, interactive=True)
+                run_weightage_Priority = gr.Slider(label="Weightage Priority", minimum=0, maximum=1, value=0.5, step=0.25, interactive=True)
+                run_weightage_distance = gr.Slider(label="Weightage Distance", minimum=0, maximum=1, value=0.5, step=0.25, interactive=True)
+                run_weightage_days = gr.Slider(label="Weightage Days", minimum=0, maximum=1, value=0.25, step=0.25, interactive=True)
+                save_Weightage_button = gr.Button("Save Weightage")
+                weightage_message_output = gr.Textbox(label="Status", interactive=False)
+                run_time_budget = gr.Number(label="Time Budget (seconds, 0 for no limit)", value=0, minimum=0)
+                with gr.Row():
+                    run_optimization_button = gr.Button("Run Optimization")
+                    cancel_optimization_button = gr.Button("Cancel Run")
+                run_optimization_message_output = gr.Textbox(label="Status", interactive=False)
+                run_job_id = gr.State(None)
+                with gr.Tabs():
+                    with gr.TabItem("Results: Fulfillment Solution"):
+                        fulfillment_dataframe = gr.Dataframe(label="Fulfillment Solution")
+                    with gr.TabItem("Results: Warehouse Stock Status"):
+                        warehouse_stock_dataframe = gr.Dataframe(label="Warehouse Stock Status")
+                    with gr.TabItem("Results: Plots"):
+                        plot_order_dropdown = gr.Dropdown(label="Show Order", choices=[], interactive=True)
+                        gallery_output = gr.Gallery(label="Plots")
+                    with gr.TabItem("Run Report"):
+                        run_report_output = gr.JSON(label="Time, memory and model statistics of the last run")
+
+                # Button bindings
+                run_optimization_button.click(run_optimization_job, inputs=[run_time_budget],
+                                              outputs=[run_optimization_message_output, 
+                                                       fulfillment_dataframe, 
+                                                       warehouse_stock_dataframe,
+                                                       gallery_output,
+                                                       run_report_output,
+                                                       plot_order_dropdown,
+                                                       run_job_id])
+                cancel_optimization_button.click(cancel_optimization, inputs=run_job_id,
+                                                 outputs=run_optimization_message_output)
+                plot_order_dropdown.change(show_order_plot, inputs=plot_order_dropdown, outputs=gallery_output)
+                save_Weightage_button.click(save_weightage, 
+                                            inputs=[run_weightage_Cost, run_weightage_Priority, 
+                                                    run_weightage_distance, run_weightage_days], 
+                                            outputs=weightage_message_output)
+
+            with gr.TabItem("View/Edit Data"):
+                gr.Markdown("""### View/Edit Data\nSelect a sheet to view and edit data.""")
+                sheet_dropdown = gr.Dropdown(choices=load_default_file(), value='Weightage', label="Select Sheet", interactive=True)
+                initial_page, _, initial_page_info = load_sheet('Weightage')
+                with gr.Row():
+                    filter_column = gr.Dropdown(label="Filter Column", choices=list(initial_page.columns[1:]), value=None, interactive=True)
+                    filter_value = gr.Textbox(label="Filter Value", placeholder="Press Enter to filter")
+                    page_number = gr.Number(label="Page", value=1, minimum=1, precision=0)
+                with gr.Row():
+                    previous_page_button = gr.Button("Previous Page")
+                    next_page_button = gr.Button("Next Page")
+                page_info = gr.Markdown(initial_page_info)
+                # The first column holds the position of every row in the sheet and cannot be edited
+                dataframe = gr.Dataframe(initial_page, label="Edit Data", interactive=True, static_columns=[0])
+                save_button = gr.Button("Save Changes", variant="primary")
+                view_data_message_output = gr.Textbox(label="Status Message", interactive=False)
+
+                # Button Bindings
+                page_inputs = [sheet_dropdown, page_number, filter_column, filter_value]
+                page_outputs = [dataframe, page_number, page_info]
+                sheet_dropdown.change(select_sheet, sheet_dropdown, page_outputs + [filter_column, filter_value])
+                filter_column.change(load_sheet, [sheet_dropdown, gr.State(1), filter_column, filter_value], page_outputs)
+                filter_value.submit(load_sheet, [sheet_dropdown, gr.State(1), filter_column, filter_value], page_outputs)
+                page_number.submit(load_sheet, page_inputs, page_outputs)
+                previous_page_button.click(previous_page, page_inputs, page_outputs)
+                next_page_button.click(next_page, page_inputs, page_outputs)
+                save_button.click(save_changes, [sheet_dropdown, dataframe], view_data_message_output)
+
+            with gr.TabItem("Generate Data"):
+                gr.Markdown("""### Generate Data\nEnter parameters to generate new intelligent sourcing data.""")
+                generate_button = gr.Button("Generate Data")
+                generate_data_message_output = gr.Textbox(label="Status Message", interactive=False)
+                num_of_warehouses = gr.Textbox(label="Number of Warehouses", value="4")
+                num_of_products = gr.Textbox(label="Number of Products", value="10")
+                num_of_orders = gr.Textbox(label="Number of Orders", value="2")
+                weightage_Cost = gr.Slider(label="Weightage Cost", minimum=0, maximum=1, value=0.5, step=0.25, interactive=True)
+                weightage_Priority = gr.Slider(label="Weightage Priority", minimum=0, maximum=1, value=0.5, step=0.25, interactive=True)
+                weightage_distance = gr.Slider(label="Weightage Distance", minimum=0, maximum=1, value=0.5, step=0.25, interactive=True)
+                weightage_days = gr.Slider(label="Weightage Days", minimum=0, maximum=1, value=0.5, interactive=True)
+                range_priority = gr.Textbox(label="Range Priority", value="(1, 10)")
+                range_prod_stock = gr.Textbox(label="Range Product Stock", value="(1, 100)")
+                range_order = gr.Textbox(label="Range Order", value="(1, 10)")
+                range_cost = gr.Textbox(label="Range Cost", value="(1, 500)")
+                range_distance = gr.Textbox(label="Range Distance", value="(1, 300)")
+                range_days = gr.Textbox(label="Range Days", value="(1, 14)")
+
+                # Button Bindings
+                generate_button.click(generate_data, 
+                                      inputs=[num_of_warehouses, num_of_products, num_of_orders, 
+                                              weightage_Cost, weightage_Priority, weightage_distance, weightage_days, 
+                                              range_priority, range_prod_stock, range_order, range_cost, range_distance, range_days], 
+                outputs=generate_data_message_output)
+
+            with gr.TabItem("Upload/Download Data"):
+                gr.Markdown("""### Upload file / download file""")
+                file_upload = gr.File(label="Upload Excel File", type="filepath")
+                download_button = gr.Button("Download Updated File")
+                file_output = gr.File(label="Download Processed File", value=default_file)
+
+                # Button Bindings
+                file_upload.upload(upload_file, file_upload, sheet_dropdown)
+                download_button.click(download_file, inputs=[], outputs=file_output)
+
+        # Delete the workspace of a session when its page is closed
+        app.unload(close_workspace)
+    return app
+
+# The app is only started when run as a script, so worker processes that import it do not start it again
+if __name__ == "__main__":
+    prepare_sample_dataset()
+    app = create_app()
+    # Every session works in its own workspace, so handlers of different sessions run side by side.
+    # Optimization runs are limited by optimization_jobs instead.
+    app.queue(default_concurrency_limit=None)
+    app.launch()
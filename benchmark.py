@@ -0,0 +1,250 @@
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from generate_data import generate_intelligent_sourcing_excel
+from read_data import load_data, load_tensor_data, TENSOR_EXTENSION
+from create_optimization_problem import create_sourcing_model
+from solve_optimization_problem import solve_sourcing_problem, BLOCK_SOLVERS, SOLUTION_STATUSES
+from run_report import RunReport
+from result_writer import write_results
+
+# Problem sizes (warehouses, orders, products), from the default dataset of the app up to
+# sizes that stress memory. The largest has 500,000 routes per shipping sheet.
+SIZES = [(4, 2, 10), (10, 20, 25), (25, 50, 50), (50, 100, 100)]
+
+# Generator parameters of the benchmark datasets, the same as the default dataset of the app
+GENERATOR_PARAMETERS = dict(
+    weightage_Cost=1, weightage_Priority=0.75, weightage_distance=0.5, weightage_days=0.25,
+    range_priority=(1, 10), range_prod_stock=(1, 100), range_order=(1, 10),
+    range_cost=(1, 300), range_distance=(1, 200), range_days=(1, 7),
+)
+
+# Measurements compared against the baseline
+MEASURES = ["Wall Time (s)", "Peak RSS (MB)"]
+
+# Settings recorded with every result, only results with the same settings are compared with a baseline
+CONFIGURATION = ["Engine", "Format", "Factorized", "Decompose", "Presolve", "Render", "Time Limit", "Threads",
+                 "Gap Limit", "Trace Memory"]
+
+
+def size_label(size):
+    return "x".join(str(n) for n in size)
+
+
+def dataset_path(data_dir, size, seed, extension=".xlsx", factorized=False):
+    """
+    Returns the path of the benchmark dataset of a size, generating it the first time.
+    """
+    kind = "_factorized" if factorized else ""
+    path = os.path.join(data_dir, f"benchmark_{size_label(size)}_seed{seed}{kind}{extension}")
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        num_of_warehouses, num_of_orders, num_of_products = size
+        generate_intelligent_sourcing_excel(path, num_of_warehouses, num_of_products, num_of_orders,
+                                            seed=seed, factorized=factorized, **GENERATOR_PARAMETERS)
+    return path
+
+
+def run_pipeline(filepath, engine="cbc", presolve=False, render=True, solver_options=None, decompose=False,
+                 trace_memory=False):
+    """
+    Runs the load, build, solve, extract, write and render phases on one dataset.
+
+    Meant to run in a fresh process, so the peak RSS only reflects this dataset.
+    solver_options are the time_limit, threads and gap_rel of solve_sourcing_problem.
+    trace_memory also records the peak traced memory of every phase, which slows the phases down.
+
+    Returns:
+    dict: The run report, see RunReport.to_dict.
+    """
+    # Imported here so matplotlib is only loaded by the runs that render
+    from network_diagram import create_sourcing_graph
+
+    report = RunReport(trace_memory=trace_memory)
+    # The solver logs are not needed, only the measurements
+    with contextlib.redirect_stdout(io.StringIO()):
+        with report.phase("Load Data"):
+            if filepath.endswith(TENSOR_EXTENSION):
+                # Memory-mapped route tensors instead of the shipping sheets
+                weightage_dict, priority_df, warehouse_df, order_df, tensors = load_tensor_data(filepath)
+                data = (weightage_dict, priority_df, warehouse_df, order_df)
+            else:
+                data, tensors = load_data(filepath), None
+        # The PuLP problem is only built by the engines that solve it
+        with report.phase("Normalization"):
+            model = create_sourcing_model(*data, tensors=tensors)
+        status, fulfillment_solution, warehouse_stock_status = solve_sourcing_problem(
+            model, engine=engine, decompose=decompose, presolve=presolve, nonzero_only=True, report=report,
+            **(solver_options or {}))
+        if status in SOLUTION_STATUSES:
+            with tempfile.TemporaryDirectory() as results_folder, report.phase("Write Results"):
+                write_results(os.path.join(results_folder, "results.parquet"), fulfillment_solution,
+                              warehouse_stock_status)
+        if render and status in SOLUTION_STATUSES:
+            with tempfile.TemporaryDirectory() as plot_folder, report.phase("Render"):
+                create_sourcing_graph(fulfillment_solution, plot_folder=plot_folder)
+    return report.to_dict()
+
+
+def run_benchmark(sizes=SIZES, engine="cbc", presolve=False, render=True, repeat=1, seed=42,
+                  data_dir="benchmark_data", extension=".xlsx", factorized=False, solver_options=None, decompose=False,
+                  trace_memory=False):
+    """
+    Runs the pipeline for every size and records time and memory per phase.
+
+    Every run happens in a new process. With repeat > 1 the fastest wall and CPU time and the
+    smallest memory of the repeats are kept, which filters out most of the noise.
+
+    Parameters:
+    sizes (list): (warehouses, orders, products) of every dataset.
+    engine (str): Engine passed to solve_sourcing_problem.
+    presolve (bool): Presolve before solving.
+    render (bool): Include the network diagrams.
+    repeat (int): Runs per size.
+    seed (int): Seed of the generated datasets.
+    data_dir (str): Folder the generated datasets are kept in between benchmark runs.
+    extension (str): Format of the datasets, ".parquet" or ".tensors" for sizes beyond the Excel row limit.
+    factorized (bool): Use datasets with lane-level distance and days and warehouse-product cost.
+    solver_options (dict): time_limit, threads and gap_rel passed to solve_sourcing_problem.
+    decompose (bool): Solve every product as an independent problem.
+    trace_memory (bool): Also record the peak traced memory of every phase. Tracing slows the
+        phases down, so times measured with it are only compared with baselines traced too.
+
+    Returns:
+    DataFrame: One row per size and phase with the CONFIGURATION, the measurements and the model statistics.
+    """
+    solver_options = solver_options or {}
+    configuration = {"Engine": engine, "Format": extension, "Factorized": factorized, "Decompose": decompose,
+                     "Presolve": presolve, "Render": render, "Time Limit": solver_options.get("time_limit"),
+                     "Threads": solver_options.get("threads"), "Gap Limit": solver_options.get("gap_rel"),
+                     "Trace Memory": trace_memory}
+    context = multiprocessing.get_context("spawn")
+    rows = []
+    for size in sizes:
+        filepath = dataset_path(data_dir, size, seed, extension, factorized)
+        reports = []
+        for _ in range(repeat):
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                reports.append(executor.submit(run_pipeline, filepath, engine, presolve, render,
+                                               solver_options, decompose, trace_memory).result())
+
+        phases = pd.concat([pd.DataFrame(report["phases"]) for report in reports])
+        phases = phases.groupby("Phase", sort=False).min().reset_index()
+        statistics = reports[0]["statistics"]
+        phases.insert(0, "Size", size_label(size))
+        for position, (key, value) in enumerate(configuration.items(), start=1):
+            phases.insert(position, key, value)
+        for key in ["Variables", "Constraints", "Non-zeros", "Status", "Gap"]:
+            phases[key] = statistics.get(key)
+        rows.append(phases)
+        print(f"{size_label(size)}: {phases['Wall Time (s)'].sum():.2f}s, "
+              f"{phases['Peak RSS (MB)'].max():.0f} MB peak RSS, {statistics.get('Status')}")
+    return pd.concat(rows, ignore_index=True)
+
+
+def _configuration_keys(results):
+    # The CONFIGURATION as text, so settings read back from a CSV file match those of a run, unset ones included
+    results = results.copy()
+    for column in CONFIGURATION:
+        results[column] = results[column].astype(object).where(results[column].notna(), "").astype(str)
+    return results
+
+
+def compare_to_baseline(results, baseline, threshold=0.2, min_difference=0.05):
+    """
+    Compares benchmark results with a saved baseline.
+
+    A measurement regressed when it is more than threshold (relative) and more than
+    min_difference (absolute) above the baseline. The absolute margin keeps phases that
+    take a few milliseconds from being flagged because of noise. Only results with the same
+    CONFIGURATION (engine, format, flags and solver options) are compared.
+
+    Parameters:
+    results (DataFrame): Output of run_benchmark.
+    baseline (DataFrame): Output of an earlier run_benchmark.
+    threshold (float): Allowed relative increase, 0.2 is 20%.
+    min_difference (float): Allowed absolute increase in seconds or MB.
+
+    Returns:
+    DataFrame: One row per configuration, size, phase and measurement found in both, with the
+    ratio to the baseline and whether it regressed.
+
+    Raises:
+    ValueError: If the baseline does not record the CONFIGURATION of its results.
+    """
+    missing = [column for column in CONFIGURATION if column not in baseline.columns]
+    if missing:
+        raise ValueError(f"The baseline does not record {', '.join(missing)}, save a new baseline")
+    keys = CONFIGURATION + ["Size", "Phase"]
+    merged = _configuration_keys(results).merge(_configuration_keys(baseline), on=keys, suffixes=("", " Baseline"))
+    comparisons = []
+    for measure in MEASURES:
+        comparison = merged[keys].copy()
+        comparison["Measure"] = measure
+        comparison["Baseline"] = merged[f"{measure} Baseline"]
+        comparison["Current"] = merged[measure]
+        comparison["Ratio"] = comparison["Current"] / comparison["Baseline"]
+        comparison["Regression"] = ((comparison["Current"] > comparison["Baseline"] * (1 + threshold))
+                                    & (comparison["Current"] - comparison["Baseline"] > min_difference))
+        comparisons.append(comparison)
+    return pd.concat(comparisons, ignore_index=True)
+
+
+def parse_size(text):
+    warehouses, orders, products = (int(n) for n in text.lower().split("x"))
+    return warehouses, orders, products
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure how the sourcing pipeline scales with the problem size.")
+    parser.add_argument("--sizes", type=lambda text: [parse_size(size) for size in text.split(",")],
+                        default=SIZES, help="Comma separated WxOxP sizes, e.g. 4x2x10,10x20x25.")
+    parser.add_argument("--engine", default="cbc", choices=sorted(BLOCK_SOLVERS))
+    parser.add_argument("--time-limit", type=float, help="Seconds the solver may spend.")
+    parser.add_argument("--threads", type=int, help="Threads of CBC.")
+    parser.add_argument("--gap-rel", type=float, help="Relative MIP gap to stop at, e.g. 0.01.")
+    parser.add_argument("--presolve", action="store_true")
+    parser.add_argument("--decompose", action="store_true", help="Solve every product as an independent problem.")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Also record the traced peak memory of every phase, slows the phases down.")
+    parser.add_argument("--no-render", dest="render", action="store_false", help="Skip the network diagrams.")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--data-dir", default="benchmark_data")
+    parser.add_argument("--format", default=".xlsx", choices=[".xlsx", ".parquet", ".npz", ".tensors"],
+                        help="Dataset format, .parquet or .tensors is needed beyond the Excel row limit.")
+    parser.add_argument("--factorized", action="store_true",
+                        help="Lane-level distance and days and warehouse-product cost instead of route-level sheets.")
+    parser.add_argument("--output", default="benchmark_results.csv")
+    parser.add_argument("--baseline", help="Results of an earlier run to compare with.")
+    parser.add_argument("--save-baseline", help="Also write the results to this baseline file.")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed relative regression.")
+    parser.add_argument("--min-difference", type=float, default=0.05,
+                        help="Allowed absolute regression in seconds or MB.")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.sizes, args.engine, args.presolve, args.render, args.repeat, args.seed, args.data_dir,
+                            args.format, args.factorized,
+                            {"time_limit": args.time_limit, "threads": args.threads, "gap_rel": args.gap_rel},
+                            args.decompose, args.trace_memory)
+    results.to_csv(args.output, index=False)
+    if args.save_baseline:
+        results.to_csv(args.save_baseline, index=False)
+
+    if args.baseline:
+        comparison = compare_to_baseline(results, pd.read_csv(args.baseline), args.threshold, args.min_difference)
+        if comparison.empty:
+            print("The baseline has no results with the same configuration")
+            sys.exit(1)
+        regressions = comparison[comparison["Regression"]]
+        print(comparison.to_string(index=False))
+        if len(regressions):
+            print(f"{len(regressions)} regressions above {args.threshold:.0%}")
+            sys.exit(1)
+        print("No regressions")
@@ -1,92 +1,335 @@
 from pulp import *
+import numpy as np
 import pandas as pd
-from read_data import load_excel_data
+from scipy import sparse
+from contextlib import nullcontext
+from read_data import load_excel_data, cached_arrays
+from route_tensors import RouteTensors, ROUTE_SHEETS
 
-def create_sourcing_problem(weightage_dict, priority_df, warehouse_df, order_df, cost_df, distance_df, days_df):
+# Metrics that make up the weighted objective, in the order of the 'Weightage' sheet
+METRICS = ["Cost", "Priority", "Distance", "Days"]
+
+
+def min_max_scale(values):
     """
-    Creates and returns a linear programming problem for intelligent sourcing optimization.
-    
+    Scales an array of values to the range [0, 1] without modifying the input.
+    A constant array is scaled to all zeros.
+    """
+    values = np.asarray(values, dtype=float)
+    min_val = values.min()
+    max_val = values.max()
+    if max_val == min_val:
+        return np.zeros_like(values)
+    return (values - min_val) / (max_val - min_val)
+
+
+class SourcingModel:
+    """
+    Array representation of the sourcing optimization problem.
+
+    Every decision variable is a route (warehouse, order, product) identified by the
+    index arrays var_w, var_o and var_p. The model is stored in the form accepted by
+    scipy.optimize.milp / linprog, so it can be passed to a solver or written to an
+    MPS file without creating a PuLP expression per route.
+
+    Attributes:
+        warehouses, orders, products (list): Names of the warehouses, orders and products.
+        stock (ndarray): Stock available, shape (W, P).
+        quantity (ndarray): Quantity ordered, shape (O, P).
+        priority (ndarray): Normalized warehouse priority, shape (W,).
+        var_w, var_o, var_p (ndarray): Warehouse, order and product index of every variable.
+        metrics (dict): Normalized coefficient of every variable for each metric in METRICS.
+        weightage_dict (dict): Weightages used to build the objective.
+        c (ndarray): Objective coefficients (the objective is maximized).
+        A_ub, b_ub: Stock constraints, one row per (warehouse, product).
+        A_eq, b_eq: Order constraints, one row per (order, product).
+        pulp_problem (LpProblem): PuLP problem of the model once sourcing_model_to_pulp built it, else None.
+    """
+
+    sense = LpMaximize
+
+    def __init__(self, warehouses, orders, products, stock, quantity, priority,
+                 var_w, var_o, var_p, metrics, weightage_dict):
+        self.warehouses = list(warehouses)
+        self.orders = list(orders)
+        self.products = list(products)
+        self.stock = stock
+        self.quantity = quantity
+        self.priority = priority
+        self.var_w = var_w
+        self.var_o = var_o
+        self.var_p = var_p
+        self.metrics = metrics
+        self.pulp_problem = None
+
+        num_products = len(self.products)
+        columns = np.arange(self.num_variables)
+        ones = np.ones(self.num_variables)
+        self.A_ub = sparse.csr_matrix((ones, (var_w * num_products + var_p, columns)),
+                                      shape=(len(self.warehouses) * num_products, self.num_variables))
+        self.b_ub = stock.ravel().astype(float)
+        self.A_eq = sparse.csr_matrix((ones, (var_o * num_products + var_p, columns)),
+                                      shape=(len(self.orders) * num_products, self.num_variables))
+        self.b_eq = quantity.ravel().astype(float)
+
+        self.set_weights(weightage_dict)
+
+    @property
+    def num_variables(self):
+        return len(self.var_w)
+
+    @property
+    def shape(self):
+        return len(self.warehouses), len(self.orders), len(self.products)
+
+    def set_weights(self, weightage_dict):
+        """
+        Rebuilds the objective coefficients from the normalized metrics and the given weightages.
+        """
+        self.weightage_dict = dict(weightage_dict)
+        c = np.zeros(self.num_variables)
+        for metric in METRICS:
+            c -= self.weightage_dict[metric] * self.metrics[metric]
+        self.c = c
+
+    def select(self, variables, stock=None, quantity=None):
+        """
+        Returns a model with only the given variables, and optionally new stock and order quantities.
+        """
+        metrics = {metric: values[variables] for metric, values in self.metrics.items()}
+        return SourcingModel(self.warehouses, self.orders, self.products,
+                             self.stock if stock is None else stock,
+                             self.quantity if quantity is None else quantity, self.priority,
+                             self.var_w[variables], self.var_o[variables], self.var_p[variables],
+                             metrics, self.weightage_dict)
+
+    def stock_constraint_names(self):
+        return [f"Stock_Constraint_{p}_in_{w}" for w in self.warehouses for p in self.products]
+
+    def order_constraint_names(self):
+        return [f"Order_Fulfillment_{p}_to_{o}" for o in self.orders for p in self.products]
+
+    def variable_names(self):
+        return [f"Route_{self.warehouses[w]}_{self.orders[o]}_{self.products[p]}"
+                for w, o, p in zip(self.var_w, self.var_o, self.var_p)]
+
+
+def create_sourcing_model(weightage_dict, priority_df, warehouse_df, order_df, cost_df=None, distance_df=None,
+                          days_df=None, tensors=None):
+    """
+    Creates the array representation of the sourcing optimization problem.
+
+    The cost, distance and days of the routes are held as RouteTensors, indexed by warehouse,
+    order and product, so the shipping sheets may list only the lanes that exist and are matched
+    by key rather than by row order. A factorized sheet, e.g. distance per warehouse-order lane
+    or cost per warehouse-product pair, stays factorized and is only broadcast to the lanes when
+    the objective coefficients are taken. The metrics are normalized and combined into one objective
+    coefficient vector with NumPy, and the stock and order constraints are created as SciPy
+    sparse matrices. Normalization produces new arrays; the input DataFrames and tensors are
+    not modified.
+
+    The routes with a cost are the allowed lanes (warehouse, order, product). Variables are only
+    created for lanes with a non-zero order quantity and non-zero stock.
+
     Parameters:
-        weightage_dict (dict): Dictionary containing weightages for cost, priority, distance, and days.
-        priority_df (DataFrame): DataFrame containing priority values for each warehouse.
-        warehouse_df (DataFrame): DataFrame containing stock availability for each warehouse.
-        order_df (DataFrame): DataFrame containing order quantities for each product.
-        cost_df (DataFrame): DataFrame containing cost values.
-        distance_df (DataFrame): DataFrame containing distance values.
-        days_df (DataFrame): DataFrame containing expected delivery days.
-    
+        Same as create_sourcing_problem. The shipping sheets are not needed when tensors are given.
+        tensors (RouteTensors): Route metrics, e.g. memory-mapped by read_data.load_tensor_data.
+
     Returns:
-        LpProblem: Linear programming problem formulated for sourcing optimization.
-        Warehouses, Products, Stock, Priority, Orders, Quantity
+        SourcingModel: Array representation of the problem.
+
+    Raises:
+        ValueError: If a lane of the Cost Data sheet has no distance or days, or the tensors do
+        not have the warehouses, orders and products of the input.
     """
-    def min_max_scale(df, column):
-        min_val = df[column].min()
-        max_val = df[column].max()
-        df[column] = (df[column] - min_val) / (max_val - min_val)
-        return df
-
-    # Extract weightages
-    weightage_Cost = weightage_dict["Cost"]
-    weightage_Priority = weightage_dict["Priority"]
-    weightage_distance = weightage_dict["Distance"]
-    weightage_days = weightage_dict["Days"]
-
-    # Normalize data
-    priority_df = min_max_scale(priority_df, "Priority")
-    cost_df = min_max_scale(cost_df, "Cost")
-    distance_df = min_max_scale(distance_df, "Distance")
-    days_df = min_max_scale(days_df, "Days")
-
-    # Create dictionaries for optimization
     Warehouses = warehouse_df['Warehouse'].tolist()
-    Products = warehouse_df.columns[1:]
-    Stock = makeDict([Warehouses, Products], warehouse_df.drop('Warehouse', axis=1).values, default=0)
-    Priority = makeDict([Warehouses], priority_df.drop('Warehouse', axis=1).values.reshape(len(Warehouses)), default=0)
+    Products = list(warehouse_df.columns[1:])
     Orders = order_df['Order'].tolist()
-    Quantity = makeDict([Orders, Products], order_df.drop('Order', axis=1).values, default=0)
+    num_orders, num_products = len(Orders), len(Products)
+
+    stock = warehouse_df[Products].to_numpy()
+    quantity = order_df[Products].to_numpy()
+
+    tables = [priority_df, warehouse_df, order_df]
+    # Given tensors are not part of the cache of read_data, so nothing derived from them is cached
+    cacheable = tensors is None
+    if tensors is None:
+        # Tensors are reused when the tables come unchanged from read_data.load_data_cached
+        tables += [cost_df, distance_df, days_df]
+        frames = {'Cost': cost_df, 'Distance': distance_df, 'Days': days_df}
+        arrays = cached_arrays(tables, "tensors",
+                               lambda: RouteTensors.from_frames(Warehouses, Orders, Products, frames).arrays())
+        tensors = RouteTensors.from_arrays(Warehouses, Orders, Products, arrays)
+    elif (tensors.warehouses, tensors.orders, tensors.products) != (Warehouses, Orders, Products):
+        raise ValueError("The route tensors do not have the warehouses, orders and products of the input data")
 
-    cost_values = cost_df["Cost"].values.reshape(len(Warehouses), len(Orders), len(Products))
-    cost = makeDict([Warehouses, Orders, Products], cost_values, default=0)
+    def lanes():
+        # Flat index of every lane of the Cost tensor, as int32 when the routes allow it
+        keys = tensors.lanes()
+        dtype = np.int32 if np.prod(tensors.shape, dtype=np.int64) <= np.iinfo(np.int32).max else np.int64
+        return {"keys": keys.astype(dtype)}
 
-    distance_values = distance_df["Distance"].values.reshape(len(Warehouses), len(Orders), len(Products))
-    distance = makeDict([Warehouses, Orders, Products], distance_values, default=0)
+    # Lanes are reused when the tables come unchanged from read_data.load_data_cached. Only their
+    # keys are cached, the normalized metrics are taken from the tensors for the lanes in use.
+    keys = (cached_arrays(tables, "lanes", lanes) if cacheable else lanes())["keys"]
 
-    days_values = days_df["Days"].values.reshape(len(Warehouses), len(Orders), len(Products))
-    days = makeDict([Warehouses, Orders, Products], days_values, default=0)
+    # Only lanes that can carry something become variables
+    var_w, remainder = np.divmod(keys, num_orders * num_products)
+    var_o, var_p = np.divmod(remainder, num_products)
+    used = (quantity[var_o, var_p] > 0) & (stock[var_w, var_p] > 0)
+    keys = keys[used].astype(np.intp)
+    var_w, var_o, var_p = var_w[used].astype(np.intp), var_o[used].astype(np.intp), var_p[used].astype(np.intp)
 
-    # Define variables and routes
-    routes = [(w, o, s) for w in Warehouses for o in Orders for s in Products]
-    Variable = LpVariable.dicts("Route", (Warehouses, Orders, Products), 0, None, LpInteger)
+    priority = min_max_scale(priority_df["Priority"].to_numpy())
+    metrics = {
+        "Cost": tensors.scaled("Cost", keys),
+        "Priority": priority[var_w],
+        "Distance": tensors.scaled("Distance", keys),
+        "Days": tensors.scaled("Days", keys),
+    }
 
-    # Create optimization problem
-    prob = LpProblem("Sourcing_Problem", LpMaximize)
+    return SourcingModel(Warehouses, Orders, Products, stock, quantity, priority,
+                         var_w, var_o, var_p, metrics, weightage_dict)
+
+
+def sourcing_model_to_pulp(model):
+    """
+    Converts a SourcingModel into a PuLP problem, which is also kept as model.pulp_problem.
+
+    Parameters:
+        model (SourcingModel): Array representation of the problem.
+
+    Returns:
+        LpProblem, Warehouses, Products, Stock, Priority, Orders, Quantity, Variable
+        in the form returned by create_sourcing_problem.
+    """
+    Warehouses, Orders, Products = model.warehouses, model.orders, model.products
+    Stock = makeDict([Warehouses, Products], model.stock, default=0)
+    Priority = makeDict([Warehouses], model.priority, default=0)
+    Quantity = makeDict([Orders, Products], model.quantity, default=0)
+
+    # Define variables, keeping the nested Variable[w][o][p] layout of LpVariable.dicts.
+    # Only the lanes of the model have an entry.
+    variables = [LpVariable(name, 0, None, LpInteger) for name in model.variable_names()]
+    Variable = {w: {o: {} for o in Orders} for w in Warehouses}
+    for var, w, o, p in zip(variables, model.var_w, model.var_o, model.var_p):
+        Variable[Warehouses[w]][Orders[o]][Products[p]] = var
+
+    # Create optimization problem, keeping the array model for the solvers that work on it directly
+    prob = LpProblem("Sourcing_Problem", model.sense)
+    prob.sourcing_model = model
+    prob.sourcing_variables = variables
+    model.pulp_problem = prob
 
     # Objective function
-    prob += lpSum(
-        Variable[w][o][p] * (
-            (weightage_Cost * -cost[w][o][p]) +
-            (weightage_Priority * -Priority[w]) +
-            (weightage_distance * -distance[w][o][p]) +
-            (weightage_days * -days[w][o][p])
-        )
-        for (w, o, p) in routes
-    ), "Sum_of_Costs"
-
-    # Stock Constraints
-    for w in Warehouses:
-        for p in Products:
-            prob += lpSum([Variable[w][o][p] for o in Orders]) <= Stock[w][p], f"Stock_Constraint_{p}_in_{w}"
-
-    # Order Constraints
-    for o in Orders:
-        for p in Products:
-            prob += lpSum([Variable[w][o][p] for w in Warehouses]) == Quantity[o][p], f"Order_Fulfillment_{p}_to_{o}"
+    prob += LpAffineExpression(zip(variables, model.c.tolist())), "Sum_of_Costs"
+
+    # Stock and order constraints, one per row of the sparse constraint matrices
+    for A, b, sense, names in [
+        (model.A_ub, model.b_ub, LpConstraintLE, model.stock_constraint_names()),
+        (model.A_eq, model.b_eq, LpConstraintEQ, model.order_constraint_names()),
+    ]:
+        for row, name in enumerate(names):
+            columns = A.indices[A.indptr[row]:A.indptr[row + 1]]
+            # A row without routes only matters if it asks for a non-zero quantity
+            if len(columns) == 0 and (sense == LpConstraintLE or b[row] == 0):
+                continue
+            expression = LpAffineExpression([(variables[j], 1) for j in columns])
+            prob += LpConstraint(expression, sense, name, b[row])
 
     return prob, Warehouses, Products, Stock, Priority, Orders, Quantity, Variable
 
+
+def update_sourcing_weights(prob, weightage_dict):
+    """
+    Replaces the objective of a problem created by create_sourcing_problem with one built from new weightages.
+
+    The constraints and variables are kept, and so are the variable values of the last
+    solve, which the solver can use as a warm start.
+
+    Parameters:
+        prob (LpProblem or SourcingModel): Problem returned by create_sourcing_problem, or a model whose
+            PuLP problem, if it has one, is updated too.
+        weightage_dict (dict): Dictionary containing weightages for cost, priority, distance, and days.
+    """
+    model = prob if isinstance(prob, SourcingModel) else prob.sourcing_model
+    model.set_weights(weightage_dict)
+    prob = model.pulp_problem
+    if prob is None:
+        return
+    prob.setObjective(LpAffineExpression(zip(prob.sourcing_variables, model.c.tolist())))
+    prob.objective.name = "Sum_of_Costs"
+
+
+def write_sourcing_mps(model, filepath):
+    """
+    Writes a SourcingModel to a free-format MPS file without building a PuLP problem.
+
+    MPS readers do not agree on an OBJSENSE section, so the file minimizes -c instead of
+    maximizing c. Its optimal objective is the negated optimum of the model.
+
+    Parameters:
+        model (SourcingModel): Array representation of the problem.
+        filepath (str): Path of the MPS file to write.
+    """
+    trans = str.maketrans(LpElement.illegal_chars, "_" * len(LpElement.illegal_chars))
+    columns = [name.translate(trans) for name in model.variable_names()]
+    rows = [name.translate(trans) for name in model.stock_constraint_names() + model.order_constraint_names()]
+    A = sparse.vstack([model.A_ub, model.A_eq]).tocsc()
+
+    with open(filepath, "w") as f:
+        f.write("NAME Sourcing_Problem\nROWS\n N  Sum_of_Costs\n")
+        f.writelines(f" L  {name}\n" for name in rows[:model.A_ub.shape[0]])
+        f.writelines(f" E  {name}\n" for name in rows[model.A_ub.shape[0]:])
+
+        f.write("COLUMNS\n    MARKER  'MARKER'  'INTORG'\n")
+        for j, name in enumerate(columns):
+            f.write(f"    {name}  Sum_of_Costs  {-model.c[j] + 0.0:.17g}\n")
+            for i in A.indices[A.indptr[j]:A.indptr[j + 1]]:
+                f.write(f"    {name}  {rows[i]}  1\n")
+        f.write("    MARKER  'MARKER'  'INTEND'\n")
+
+        f.write("RHS\n")
+        b = np.concatenate([model.b_ub, model.b_eq])
+        f.writelines(f"    RHS  {rows[i]}  {b[i]:.17g}\n" for i in np.flatnonzero(b))
+
+        # Integer columns default to binary in some readers, so give every route explicit bounds
+        f.write("BOUNDS\n")
+        f.writelines(f" PL BND  {name}\n" for name in columns)
+        f.write("ENDATA\n")
+
+
+def create_sourcing_problem(weightage_dict, priority_df, warehouse_df, order_df, cost_df=None, distance_df=None,
+                            days_df=None, report=None, tensors=None):
+    """
+    Creates and returns a linear programming problem for intelligent sourcing optimization.
+
+    Parameters:
+        weightage_dict (dict): Dictionary containing weightages for cost, priority, distance, and days.
+        priority_df (DataFrame): DataFrame containing priority values for each warehouse.
+        warehouse_df (DataFrame): DataFrame containing stock availability for each warehouse.
+        order_df (DataFrame): DataFrame containing order quantities for each product.
+        cost_df (DataFrame): DataFrame containing cost values, per route (Warehouse, Order, Product)
+            or factorized with some of these key columns left out, e.g. per Warehouse and Product.
+        distance_df (DataFrame): DataFrame containing distance values, per route or factorized, e.g. per Warehouse and Order.
+        days_df (DataFrame): DataFrame containing expected delivery days, per route or factorized.
+        report (RunReport): Records the normalization and model building phases when given.
+        tensors (RouteTensors): Route metrics used instead of the cost, distance and days sheets.
+
+    Returns:
+        LpProblem: Linear programming problem formulated for sourcing optimization.
+        Warehouses, Products, Stock, Priority, Orders, Quantity, Variable
+    """
+    phase = report.phase if report is not None else (lambda name: nullcontext())
+    with phase("Normalization"):
+        model = create_sourcing_model(weightage_dict, priority_df, warehouse_df, order_df, cost_df, distance_df, days_df,
+                                      tensors)
+    with phase("Model Building"):
+        return sourcing_model_to_pulp(model)
+
 if __name__ == "__main__":
     filepath = 'Intelligent_Sourcing.xlsx'  # Example file path
     weightage_dict, priority_df, warehouse_df, order_df, cost_df, distance_df, days_df,  = load_excel_data(filepath)
-    
+
     prob, Warehouses, Products, Stock, Priority, Orders, Quantity, Variable = create_sourcing_problem(weightage_dict, priority_df, warehouse_df, order_df, cost_df, distance_df, days_df)
     print(prob.objective)
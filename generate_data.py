@@ -1,7 +1,30 @@
 import pandas as pd
 import numpy as np
+import os
 from io import StringIO
-import matplotlib.pyplot as plt
+from read_data import EXCEL_EXTENSIONS, EXCEL_MAX_ROWS, PARQUET_EXTENSION, TENSOR_EXTENSION, save_tables, save_tensor_tables
+from route_tensors import RouteTensors, KEY_COLUMNS
+
+# Routes drawn and written at a time when streaming a dataset to Parquet
+CHUNK_ROWS = 1000000
+
+
+def _route_chunks(rng, shape, value_range, chunk_rows):
+    """
+    Draws a value for every route of the given shape, e.g. (warehouse, order, product), in row order.
+
+    Yields:
+    tuple: The code of every key, e.g. warehouse, order and product, and the drawn values of up
+    to chunk_rows consecutive routes. Consecutive draws continue the same random stream, so the
+    values do not depend on chunk_rows.
+    """
+    num_of_routes = int(np.prod(shape))
+    for start in range(0, num_of_routes, chunk_rows):
+        route = np.arange(start, min(start + chunk_rows, num_of_routes))
+        codes = [code.astype(np.int32) for code in np.unravel_index(route, shape)]
+        values = rng.integers(*value_range, size=len(route))
+        yield (*codes, values)
+
 
 def generate_intelligent_sourcing_excel(
     output_filename,
@@ -17,10 +40,24 @@ def generate_intelligent_sourcing_excel(
     range_order,
     range_cost,
     range_distance,
-    range_days
+    range_days,
+    seed=42,
+    chunk_rows=CHUNK_ROWS,
+    factorized=False
 ):
     """
     Generates an Excel file containing warehouse, order, and shipping data.
+
+    The format is chosen by the extension of output_filename, see read_data.load_tables.
+    Every metric is drawn with one vectorized call per chunk of routes. An Excel workbook
+    holds at most EXCEL_MAX_ROWS routes; a '.parquet' dataset is streamed chunk by chunk, so
+    datasets with tens of millions of routes are written with bounded memory, and so is a
+    '.tensors' dataset, whose route tensors are filled through memory maps. The same seed gives
+    the same data in every format.
+
+    A factorized dataset has the distance and days of every warehouse-order lane and the cost
+    of every warehouse-product pair, instead of a value for every route, so its shipping sheets
+    are smaller by the number of products or orders.
     
     Parameters:
     output_filename (str): The name of the output Excel file.
@@ -37,8 +74,27 @@ def generate_intelligent_sourcing_excel(
     range_cost (tuple): Range for cost values.
     range_distance (tuple): Range for distance values.
     range_days (tuple): Range for delivery days values.
+    seed (int): Seed of the random number generator, the same seed always gives the same data.
+    chunk_rows (int): Routes drawn and written at a time for a Parquet or tensor dataset.
+    factorized (bool): Write lane-level distance and days and warehouse-product cost.
     """
-    rng = np.random.default_rng(seed=42)  # Random number generator
+    rng = np.random.default_rng(seed=seed)  # Random number generator
+    extension = os.path.splitext(output_filename)[1].lower()
+
+    warehouses = [f'Warehouse#{w}' for w in range(1, num_of_warehouses + 1)]
+    products = [f'Product#{p}' for p in range(1, num_of_products + 1)]
+    orders = [f'Order#{o}' for o in range(1, num_of_orders + 1)]
+    names = dict(zip(KEY_COLUMNS, [warehouses, orders, products]))
+
+    # Shipping sheets in the order they are drawn, with their key columns
+    lane_keys = ['Warehouse', 'Order'] if factorized else KEY_COLUMNS
+    shipping = [('Cost Data', 'Cost', range_cost, ['Warehouse', 'Product'] if factorized else KEY_COLUMNS),
+                ('Distance Data', 'Distance', range_distance, lane_keys),
+                ('Days Data', 'Days', range_days, lane_keys)]
+    num_of_routes = max(int(np.prod([len(names[key]) for key in keys])) for *_, keys in shipping)
+    if extension in EXCEL_EXTENSIONS and num_of_routes > EXCEL_MAX_ROWS:
+        raise ValueError(f"{num_of_routes} routes do not fit in an Excel sheet, "
+                         f"use a '{PARQUET_EXTENSION}' dataset instead")
 
     # Create weightage DataFrame
     weightage_df = pd.DataFrame({
@@ -48,49 +104,73 @@ def generate_intelligent_sourcing_excel(
 
     # Generate priority data
     priority_df = pd.DataFrame({
-        'Warehouse': [f'Warehouse#{w}' for w in range(1, num_of_warehouses + 1)],
+        'Warehouse': warehouses,
         'Priority': rng.integers(*range_priority, size=num_of_warehouses)
     })
 
-    # Generate warehouse stock data
-    warehouse_df = pd.DataFrame({
-        'Warehouse': [f'Warehouse#{w}' for w in range(1, num_of_warehouses + 1)]
-    })
-    for p in range(1, num_of_products + 1):
-        warehouse_df[f'Product#{p}'] = rng.integers(*range_prod_stock, size=num_of_warehouses)
-
-    # Generate order data
-    order_df = pd.DataFrame({
-        'Order': [f'Order#{o}' for o in range(1, num_of_orders + 1)]
-    })
-    for p in range(1, num_of_products + 1):
-        order_df[f'Product#{p}'] = rng.integers(*range_order, size=num_of_orders)
-
-    # Function to generate shipping data
-    def generate_shipping_data(metric_name, value_range):
-        return pd.DataFrame([
-            (w, o, p, rng.integers(*value_range))
-            for w in warehouse_df["Warehouse"]
-            for o in order_df["Order"]
-            for p in warehouse_df.columns[1:]
-        ], columns=["Warehouse", "Order", "Product", metric_name])
-
-    # Generate cost, distance, and days DataFrames
-    cost_df = generate_shipping_data("Cost", range_cost)
-    distance_df = generate_shipping_data("Distance", range_distance)
-    days_df = generate_shipping_data("Days", range_days)
-
-    # Write data to Excel
-    with pd.ExcelWriter(output_filename, engine='xlsxwriter') as writer:
-        weightage_df.to_excel(writer, sheet_name='Weightage', index=False)
-        priority_df.to_excel(writer, sheet_name='Priority Data', index=False)
-        warehouse_df.to_excel(writer, sheet_name='Warehouse Data', index=False)
-        order_df.to_excel(writer, sheet_name='Order Data', index=False)
-        cost_df.to_excel(writer, sheet_name='Cost Data', index=False)
-        distance_df.to_excel(writer, sheet_name='Distance Data', index=False)
-        days_df.to_excel(writer, sheet_name='Days Data', index=False)
-
-    print(f"Excel file '{output_filename}' has been successfully created.")
+    # Generate warehouse stock and order data, drawn one product column at a time
+    stock = np.column_stack([rng.integers(*range_prod_stock, size=num_of_warehouses) for _ in products])
+    warehouse_df = pd.concat([pd.DataFrame({'Warehouse': warehouses}),
+                              pd.DataFrame(stock, columns=products)], axis=1)
+    quantity = np.column_stack([rng.integers(*range_order, size=num_of_orders) for _ in products])
+    order_df = pd.concat([pd.DataFrame({'Order': orders}),
+                          pd.DataFrame(quantity, columns=products)], axis=1)
+
+    tables = {
+        'Weightage': weightage_df,
+        'Priority Data': priority_df,
+        'Warehouse Data': warehouse_df,
+        'Order Data': order_df,
+    }
+    if extension == PARQUET_EXTENSION:
+        # pyarrow is only needed for Parquet datasets
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        os.makedirs(output_filename, exist_ok=True)
+        for sheet, df in tables.items():
+            df.to_parquet(os.path.join(output_filename, f'{sheet}.parquet'), index=False)
+
+        # Key columns are dictionary encoded, so a chunk only stores integer codes
+        for sheet, metric_name, value_range, keys in shipping:
+            dictionaries = [pa.array(names[key]) for key in keys]
+            shape = tuple(len(names[key]) for key in keys)
+            schema = pa.schema([(column, pa.dictionary(pa.int32(), pa.string()))
+                                for column in keys] + [(metric_name, pa.int64())])
+            with pq.ParquetWriter(os.path.join(output_filename, f'{sheet}.parquet'), schema) as writer:
+                for *codes, values in _route_chunks(rng, shape, value_range, chunk_rows):
+                    columns = [pa.DictionaryArray.from_arrays(code, dictionary)
+                               for code, dictionary in zip(codes, dictionaries)]
+                    writer.write_table(pa.Table.from_arrays(columns + [pa.array(values)], schema=schema))
+    elif extension == TENSOR_EXTENSION:
+        # Routes are drawn in the row order of the tensors, so every chunk fills the next flat range
+        save_tensor_tables(output_filename, tables)
+        tensors = RouteTensors.create(output_filename, warehouses, orders, products,
+                                      {metric_name: keys for _, metric_name, _, keys in shipping})
+        for sheet, metric_name, value_range, keys in shipping:
+            tensor = tensors.metrics[metric_name]
+            flat, start = tensor.reshape(-1), 0
+            for *_, values in _route_chunks(rng, tensor.shape, value_range, chunk_rows):
+                flat[start:start + len(values)] = values
+                start += len(values)
+            tensor.flush()
+    else:
+        # Function to generate shipping data, keys built by broadcasting the route codes
+        def generate_shipping_data(metric_name, value_range, keys):
+            shape = tuple(len(names[key]) for key in keys)
+            *codes, values = next(_route_chunks(rng, shape, value_range, max(int(np.prod(shape)), 1)),
+                                  [[] for _ in range(len(keys) + 1)])
+            return pd.DataFrame({
+                **{key: pd.Categorical.from_codes(code, names[key]) for key, code in zip(keys, codes)},
+                metric_name: np.asarray(values, dtype=np.int64),
+            })
+
+        for sheet, metric_name, value_range, keys in shipping:
+            tables[sheet] = generate_shipping_data(metric_name, value_range, keys)
+        save_tables(output_filename, tables)
+
+    kind = "Excel file" if extension in EXCEL_EXTENSIONS else "Dataset"
+    print(f"{kind} '{output_filename}' has been successfully created.")
     return 
 
 
@@ -98,6 +178,9 @@ def plot_histograms(excel_filename):
     """
     Reads the generated Excel file and plots separate histograms for relevant data columns.
     """
+    # matplotlib is only needed for the histograms, not for generating data
+    import matplotlib.pyplot as plt
+
     xls = pd.ExcelFile(excel_filename)
     
     data_sheets = {
@@ -1,12 +1,18 @@
 from generate_data import generate_intelligent_sourcing_excel, plot_histograms
-from read_data import load_excel_data
+from read_data import load_data_cached
 from create_optimization_problem import create_sourcing_problem
-from solve_optimization_problem import solve_sourcing_problem
+from solve_optimization_problem import solve_sourcing_problem, print_progress, SOLUTION_STATUSES
+from run_report import RunReport
+from result_writer import write_results
 from pulp import *
 import pandas as pd
 import xlsxwriter
 
 filepath = 'Intelligent_Sourcing.xlsx'
+results_filepath = 'Sourcing_Results.xlsx'
+
+# Seconds the solver may spend, it then returns the best solution found so far; None for no limit
+time_budget = None
 
 # Define parameters for execution
 output_filename = "Intelligent_Sourcing.xlsx"
@@ -32,30 +38,32 @@ generate_intelligent_sourcing_excel(output_filename, num_of_warehouses, num_of_p
 plot_histograms(excel_filename=output_filename)
 
 
+# Time, memory and model statistics of every phase of the run
+report = RunReport(verbose=True)
+
 # Read Data
-weightage_dict, priority_df, warehouse_df, order_df, cost_df, distance_df, days_df = load_excel_data(filepath)
+with report.phase("Load Data"):
+    weightage_dict, priority_df, warehouse_df, order_df, cost_df, distance_df, days_df = load_data_cached(filepath)
 
 # Create LP Problem
-prob, Warehouses, Products, Stock, Priority, Orders, Quantity, Variable = create_sourcing_problem(weightage_dict, priority_df, warehouse_df, order_df, cost_df, distance_df, days_df)
+prob, Warehouses, Products, Stock, Priority, Orders, Quantity, Variable = create_sourcing_problem(weightage_dict, priority_df, warehouse_df, order_df, cost_df, distance_df, days_df,
+                                                                                                   report=report)
 #print(prob.objective)
 
 # Solve LP Problem
-status, fulfillment_solution, warehouse_stock_status = solve_sourcing_problem(prob, Warehouses, Products, Stock, Priority, Orders, Quantity, Variable)
-
-if status == "Optimal":
-    # Create a Pandas Excel writer using XlsxWriter as the engine.
-    writer = pd.ExcelWriter(filepath, engine='openpyxl',
-                            mode='a', if_sheet_exists='replace')
+status, fulfillment_solution, warehouse_stock_status = solve_sourcing_problem(prob, Warehouses, Products, Stock, Priority, Orders, Quantity, Variable,
+                                                                              report=report, time_limit=time_budget,
+                                                                              progress=print_progress)
 
-    # Write each DataFrame to a different worksheet.
-    fulfillment_solution.to_excel(writer, sheet_name='Fulfillment Solution', index=False)
-    warehouse_stock_status.to_excel(writer, sheet_name='Warehouse Stock Status', index=False)
-
-    # Close the Pandas Excel writer and output the Excel file.
-    writer.close()
+if status in SOLUTION_STATUSES:
+    with report.phase("Write Results"):
+        # Write the shipments with a non-zero quantity and the stock levels, without touching the input workbook
+        write_results(results_filepath, fulfillment_solution, warehouse_stock_status)
 else:
     print("Solution not found - status is - ", status)
 
+report.to_json('run_report.json')
+
 
 
 
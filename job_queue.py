@@ -0,0 +1,191 @@
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Finished jobs kept for status requests, the oldest are forgotten first
+MAX_FINISHED_JOBS = 100
+
+
+class JobCancelled(Exception):
+    """
+    Raised inside a job at its next check when it was cancelled or ran out of time.
+    """
+
+
+class JobQueueFull(RuntimeError):
+    """
+    Raised by JobQueue.submit when the queue already holds its maximum number of jobs.
+    """
+
+
+class Job:
+    """
+    A function run by a JobQueue, with its status, progress messages and result.
+
+    The function receives the job as its first argument. It calls job.report to add progress
+    messages and job.check between steps, which raises JobCancelled once the job was
+    cancelled or its time budget is used up.
+
+    Attributes:
+        id (int): Number of the job.
+        status (str): "Queued", "Running", "Done", "Failed" or "Cancelled".
+        progress (list): Progress messages, each with the seconds since the job started.
+        result: Return value of the function once the job is done.
+        error (str): Why the job failed or was cancelled.
+        time_budget (float): Seconds the job may run, None for no limit.
+    """
+
+    def __init__(self, job_id, time_budget=None):
+        self.id = job_id
+        self.status = "Queued"
+        self.progress = []
+        self.result = None
+        self.error = None
+        self.time_budget = time_budget
+        self.started = None
+        self.finished = threading.Event()
+        self._cancel = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        """
+        Asks the job to stop. A queued job never starts, a running job stops at its next check.
+        """
+        self._cancel.set()
+
+    def remaining_time(self):
+        """
+        Returns the seconds left of the time budget, or None if the job has no budget.
+        """
+        if self.time_budget is None:
+            return None
+        elapsed = 0 if self.started is None else time.perf_counter() - self.started
+        return self.time_budget - elapsed
+
+    def check(self, budget=True):
+        """
+        Raises JobCancelled if the job was cancelled or, if budget is True, its time budget is used up.
+        Steps that finish a result found within the budget check with budget=False.
+        """
+        if self.cancelled:
+            raise JobCancelled("Cancelled")
+        if not budget:
+            return
+        remaining = self.remaining_time()
+        if remaining is not None and remaining <= 0:
+            raise JobCancelled(f"Time budget of {self.time_budget:g} seconds used up")
+
+    def report(self, message):
+        """
+        Adds a progress message.
+        """
+        elapsed = 0 if self.started is None else time.perf_counter() - self.started
+        self.progress.append(f"[{elapsed:6.1f}s] {message}")
+
+
+class JobQueue:
+    """
+    Runs jobs on a bounded pool of threads, so callers only wait for a result when they want it.
+
+    Usage:
+        queue = JobQueue(max_workers=1)
+        job = queue.submit(lambda job: 42)
+        for job in queue.follow(job):
+            print(job.status, job.progress)
+        print(job.result)
+    """
+
+    def __init__(self, max_workers=1, max_jobs=8):
+        """
+        Parameters:
+        max_workers (int): Jobs running at the same time.
+        max_jobs (int): Jobs queued or running at the same time, more are refused.
+        """
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, time_budget=None, **kwargs):
+        """
+        Queues fn(job, *args, **kwargs).
+
+        Parameters:
+        fn (function): The work of the job, receiving the job as first argument.
+        time_budget (float): Seconds the job may run once started, None for no limit.
+
+        Returns:
+        Job: The queued job.
+
+        Raises:
+        JobQueueFull: If max_jobs jobs are already queued or running.
+        """
+        with self._lock:
+            active = [job for job in self._jobs.values() if not job.finished.is_set()]
+            if len(active) >= self.max_jobs:
+                raise JobQueueFull(f"{len(active)} jobs are already queued or running")
+            finished = [job_id for job_id, job in self._jobs.items() if job.finished.is_set()]
+            for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+                del self._jobs[job_id]
+
+            job = Job(next(self._ids), time_budget)
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job, fn, args, kwargs):
+        try:
+            if job.cancelled:
+                job.status, job.error = "Cancelled", "Cancelled before it started"
+                return
+            job.status = "Running"
+            job.started = time.perf_counter()
+            job.result = fn(job, *args, **kwargs)
+            job.status = "Done"
+        except JobCancelled as e:
+            job.status, job.error = "Cancelled", str(e)
+        except Exception as e:
+            job.status, job.error = "Failed", f"{type(e).__name__}: {e}"
+        finally:
+            job.finished.set()
+
+    def get(self, job_id):
+        """
+        Returns the job with the given id, or None if it is unknown or forgotten.
+        """
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """
+        Cancels the job with the given id.
+
+        Returns:
+        bool: True if the job was still queued or running.
+        """
+        job = self.get(job_id)
+        if job is None or job.finished.is_set():
+            return False
+        job.cancel()
+        return True
+
+    def position(self, job):
+        """
+        Returns the number of queued jobs ahead of a queued job, 0 once it runs.
+        """
+        if job.status != "Queued":
+            return 0
+        with self._lock:
+            return sum(1 for other in self._jobs.values() if other.status == "Queued" and other.id < job.id)
+
+    def follow(self, job, interval=0.5):
+        """
+        Yields the job every interval seconds until it finished, and once more at the end.
+        """
+        while not job.finished.wait(interval):
+            yield job
+        yield job
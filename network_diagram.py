@@ -1,103 +1,162 @@
 import networkx as nx
-import matplotlib.pyplot as plt
+import numpy as np
 import matplotlib.patches as mpatches
-from collections import defaultdict
+from matplotlib.figure import Figure
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
 import os
-import gradio as gr
-from create_optimization_problem import create_sourcing_problem
-from solve_optimization_problem import solve_sourcing_problem
-from read_data import load_excel_data
 
-def create_sourcing_graph(fulfillment_solution, plot_folder="/tmp/plots"):
+# Folder the diagrams are saved in
+PLOT_FOLDER = "/tmp/plots"
 
+# Orders drawn in this process, more are drawn in a process pool
+SERIAL_ORDERS = 8
+
+# Largest height of a diagram in inches, reached with about a dozen warehouses
+MAX_FIGURE_HEIGHT = 20
+
+
+def order_shipments(fulfillment_solution):
+    """
+    Groups the shipments with a non-zero quantity by order and warehouse.
+
+    Parameters:
+    fulfillment_solution (DataFrame): Supply quantities from solve_sourcing_problem.
+
+    Returns:
+    DataFrame: One row per (order, warehouse) with the edge label listing every product and
+    its quantity, and the total quantity shipped.
+    """
+    shipped = fulfillment_solution[fulfillment_solution["Supply Quantity"] != 0]
+    label = shipped["Product"].astype(str) + " (" + shipped["Supply Quantity"].astype(int).astype(str) + ")"
+    return (shipped.assign(Label=label)
+            .groupby(["Order", "Warehouse"], sort=False, observed=True)
+            .agg(Label=("Label", "\n".join), Quantity=("Supply Quantity", "sum"))
+            .reset_index())
+
+
+def plot_path(order, plot_folder=PLOT_FOLDER):
+    return os.path.join(plot_folder, f"order_{order}.png")
+
+
+def _draw_order(args):
+    # Draws the warehouses shipping to one order and saves the figure
+    order, warehouses, labels, quantities, path = args
+    order_graph = nx.DiGraph()
+    order_graph.add_nodes_from(warehouses, color='green')
+    order_graph.add_node(order, color='red')
+    for w, label in zip(warehouses, labels):
+        order_graph.add_edge(w, order, label=label)
+    edge_labels = {(w, order): label for w, label in zip(warehouses, labels)}
+    edge_widths = [q / 10 for q in quantities]  # Scale edge width by total quantity
+
+    # Warehouses in a column on the left and the order on the right, the same on every run
+    heights = np.linspace(100, -100, len(warehouses)) if len(warehouses) > 1 else [0]
+    pos = {w: (-100, y) for w, y in zip(warehouses, heights)}
+    pos[order] = (100, 0)
+    node_colors = ["green" if node != order else "red" for node in order_graph.nodes]
+
+    # The height follows the number of warehouses, up to a limit
+    height = min(max(len(order_graph.nodes) * 1.7, 4), MAX_FIGURE_HEIGHT)
+    figure = Figure(figsize=(10, height))
+    ax = figure.subplots()
+    nx.draw(order_graph, pos, ax=ax, with_labels=True, node_color=node_colors, edge_color="black",
+            node_size=2000, font_size=10, width=edge_widths, arrows=True)
+    nx.draw_networkx_edge_labels(order_graph, pos, ax=ax, edge_labels=edge_labels, font_size=8, label_pos=0.5)
+
+    # Add a legend for clarity
+    warehouse_patch = mpatches.Patch(color="green", label="Warehouse")
+    order_patch = mpatches.Patch(color="red", label="Order")
+    ax.legend(handles=[warehouse_patch, order_patch], loc="upper right")
+
+    # Add title and save the plot
+    ax.set_title(f"Enhanced Sourcing Network Diagram for Order {order}")
+    figure.savefig(path)
+    return path
+
+
+def _draw_tasks(shipments, orders, plot_folder):
+    groups = shipments.groupby("Order", sort=False, observed=True)
+    return [(o, group["Warehouse"].tolist(), group["Label"].tolist(), group["Quantity"].tolist(), plot_path(o, plot_folder))
+            for o, group in groups if o in orders]
+
+
+def draw_order_graph(shipments, order, plot_folder=PLOT_FOLDER):
+    """
+    Draws the diagram of one order on demand, reusing it if it was already drawn.
+
+    Parameters:
+    shipments (DataFrame): Output of order_shipments or create_sourcing_graph.
+    order (str): The order to draw.
+    plot_folder (str): Folder the diagram is saved in.
+
+    Returns:
+    str: Path of the image, or None if nothing is shipped to the order.
+    """
+    path = plot_path(order, plot_folder)
+    if os.path.exists(path):
+        return path
+    tasks = _draw_tasks(shipments[shipments["Order"] == order], {order}, plot_folder)
+    if not tasks:
+        return None
+    os.makedirs(plot_folder, exist_ok=True)
+    return _draw_order(tasks[0])
+
+
+def create_sourcing_graph(fulfillment_solution, plot_folder=PLOT_FOLDER, processes=None, lazy=False):
+    """
+    Draws a network diagram of the warehouses shipping to every order.
+
+    Only shipments with a non-zero quantity are drawn. With more than SERIAL_ORDERS orders the
+    diagrams are drawn in a process pool.
+
+    Parameters:
+    fulfillment_solution (DataFrame): Supply quantities from solve_sourcing_problem.
+    plot_folder (str): Folder the diagrams are saved in, emptied first.
+    processes (int): Number of worker processes, defaults to the number of CPUs.
+    lazy (bool): Do not draw anything yet, draw_order_graph then draws an order when it is needed.
+
+    Returns:
+    DataFrame: The shipments of every order, see order_shipments.
+    """
     if os.path.exists(plot_folder) and os.path.isdir(plot_folder):  # Check if folder exists
         for filename in os.listdir(plot_folder):
             file_path = os.path.join(plot_folder, filename)
             os.remove(file_path)
-    
-    # Create a directed graph
-    G = nx.DiGraph()
-    
-    # Extract warehouses and orders from the DataFrame
-    warehouses = fulfillment_solution["Warehouse"].unique()
-    orders = fulfillment_solution["Order"].unique()
-    
-    # Add nodes for warehouses (green) and orders (red)
-    G.add_nodes_from(warehouses, color='green')  # Warehouses
-    G.add_nodes_from(orders, color='red')  # Orders
-
-    # Group shipments by (warehouse, order) and store product & quantity information
-    shipment_info = defaultdict(list)
-    for _, row in fulfillment_solution.iterrows():
-        w = row["Warehouse"]
-        o = row["Order"]
-        p = row["Product"]
-        q = row["Supply Quantity"]
-        shipment_info[(w, o)].append(f"{p} ({int(q)})")
-    
+
     # Ensure the plot folder exists
-    if not os.path.exists(plot_folder):
-        os.makedirs(plot_folder)
-
-    # Iterate through each order and generate its graph
-    for o in orders:
-        order_graph = nx.DiGraph()  # Create a new graph for each order
-        
-        # Add only the relevant warehouses and the current order node
-        relevant_warehouses = [w for w, ord in shipment_info if ord == o]
-        order_graph.add_nodes_from(relevant_warehouses, color='green')
-        order_graph.add_node(o, color='red')
-        
-        # Add edges and calculate edge properties (width and color)
-        edge_labels = {}
-        edge_widths = []
-        edge_colors = []
-        for (w, ord), products in shipment_info.items():
-            if ord == o:
-                label = "\n".join(products)  # Combine product info for the edge label
-                order_graph.add_edge(w, o, label=label)
-                edge_labels[(w, o)] = label
-                
-                # Sum quantities for edge width scaling
-                total_qty = sum(int(float(p.split('(')[-1].strip(')'))) for p in products)
-                edge_widths.append(total_qty / 10)  # Scale edge width by total quantity
-                edge_colors.append("black")
-        
-        # Positioning the nodes using spring layout
-        pos = nx.spring_layout(order_graph, k=400, scale=100, iterations=200)
-        
-        # Assign node colors based on type (warehouse or order)
-        node_colors = ["green" if node in relevant_warehouses else "red" for node in order_graph.nodes]
-        
-        # Calculate dynamic figure size based on the number of nodes
-        num_nodes = len(order_graph.nodes)
-        side = num_nodes * 1.7
-
-        # Draw the network with labels, node colors, edge widths, and labels
-        plt.figure(figsize=(side, side))
-        nx.draw(order_graph, pos, with_labels=True, node_color=node_colors, edge_color=edge_colors, 
-                node_size=2000, font_size=10, width=edge_widths, arrows=True)
-        nx.draw_networkx_edge_labels(order_graph, pos, edge_labels=edge_labels, font_size=8, label_pos=0.5)
-        
-        # Add a legend for clarity
-        warehouse_patch = mpatches.Patch(color="green", label="Warehouse")
-        order_patch = mpatches.Patch(color="red", label="Order")
-        plt.legend(handles=[warehouse_patch, order_patch], loc="upper right")
-        
-        # Add title and save the plot
-        plt.title(f"Enhanced Sourcing Network Diagram for Order {o}")
-        plt.savefig(f'{plot_folder}/order_{o}.png')
-        plt.close()
+    os.makedirs(plot_folder, exist_ok=True)
+
+    shipments = order_shipments(fulfillment_solution)
+    if lazy:
+        return shipments
+
+    tasks = _draw_tasks(shipments, set(shipments["Order"]), plot_folder)
+    if len(tasks) <= SERIAL_ORDERS or processes == 1:
+        for task in tasks:
+            _draw_order(task)
+    else:
+        processes = processes or os.cpu_count()
+        # Spawned workers, forking the threads of the app could copy locks held by other threads
+        with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn")) as executor:
+            list(executor.map(_draw_order, tasks, chunksize=max(1, len(tasks) // (4 * processes))))
+    return shipments
 
 def display_gallery():
     # Load all the images in the 'plots' folder for display
-    plot_folder = "/tmp/plots"
+    plot_folder = PLOT_FOLDER
     image_paths = [os.path.join(plot_folder, f) for f in os.listdir(plot_folder) if f.endswith(".png")]
     return image_paths
 
 if __name__ == "__main__":
+    # Only the example needs the solver and gradio, the app and the plot workers import this module without them
+    import gradio as gr
+    from create_optimization_problem import create_sourcing_problem
+    from solve_optimization_problem import solve_sourcing_problem
+    from read_data import load_data_cached
+
     filepath = 'Intelligent_Sourcing.xlsx'  # Example file path
-    weightage_dict, priority_df, warehouse_df, order_df, cost_df, distance_df, days_df = load_excel_data(filepath)
+    weightage_dict, priority_df, warehouse_df, order_df, cost_df, distance_df, days_df = load_data_cached(filepath)
     
     # Create LP Problem
     prob, Warehouses, Products, Stock, Priority, Orders, Quantity, Variable = create_sourcing_problem(weightage_dict, priority_df, warehouse_df, order_df, cost_df, distance_df, days_df)
@@ -0,0 +1,117 @@
+import numpy as np
+from read_data import load_data_cached
+from create_optimization_problem import create_sourcing_model
+
+
+def presolve_sourcing_model(model):
+    """
+    Reduces a SourcingModel before it is sent to a solver and detects infeasibility early.
+
+    The presolve
+    - checks the total stock of every product against the total quantity ordered,
+    - drops routes to order lines with no quantity and from warehouses without stock,
+    - fixes the routes that are the only one able to serve an order line, taking their
+      quantity from the warehouse stock, and repeats while this creates new such lines,
+    - reports the order lines that no route can serve and the warehouses left short by
+      the fixed routes.
+
+    Parameters:
+    model (SourcingModel): Array representation of the problem.
+
+    Returns:
+    tuple:
+        - reduced (SourcingModel): The model left to solve.
+        - kept (ndarray): Mask of the variables of model that are variables of reduced.
+        - fixed (ndarray): Values of the variables of model fixed by the presolve.
+        - report (dict): What the presolve found, see presolve_message.
+    """
+    num_warehouses, num_orders, num_products = model.shape
+    stock = model.stock.copy()
+    quantity = model.quantity.copy()
+    line = model.var_o * num_products + model.var_p
+    stock_row = model.var_w * num_products + model.var_p
+    fixed = np.zeros(model.num_variables)
+
+    report = {
+        "infeasible_products": [],
+        "unserved_lines": [],
+        "short_stock": [],
+        "removed_products": [model.products[p] for p in np.flatnonzero(quantity.sum(axis=0) == 0)],
+        "removed_variables": 0,
+        "fixed_variables": 0,
+    }
+
+    # Every product needs at least as much stock as is ordered
+    ordered, available = quantity.sum(axis=0), stock.sum(axis=0)
+    for p in np.flatnonzero(ordered > available):
+        report["infeasible_products"].append(
+            {"Product": model.products[p], "Ordered": ordered[p].item(), "Stock": available[p].item()})
+
+    kept = (quantity.ravel()[line] > 0) & (stock.ravel()[stock_row] > 0)
+    while True:
+        routes_per_line = np.bincount(line[kept], minlength=num_orders * num_products)
+        open_lines = quantity.ravel() > 0
+
+        for l in np.flatnonzero(open_lines & (routes_per_line == 0)):
+            o, p = divmod(l, num_products)
+            report["unserved_lines"].append(
+                {"Order": model.orders[o], "Product": model.products[p], "Quantity": quantity[o, p].item()})
+
+        # Routes that are the only one left for their order line carry the whole quantity
+        forced = np.flatnonzero(kept & (open_lines & (routes_per_line == 1))[line])
+        if report["unserved_lines"] or len(forced) == 0:
+            break
+        fixed[forced] = quantity.ravel()[line[forced]]
+        kept[forced] = False
+        quantity.ravel()[line[forced]] = 0
+        np.subtract.at(stock.ravel(), stock_row[forced], fixed[forced].astype(stock.dtype))
+        report["fixed_variables"] += len(forced)
+
+        short = stock < 0
+        if short.any():
+            for w, p in zip(*np.nonzero(short)):
+                report["short_stock"].append(
+                    {"Warehouse": model.warehouses[w], "Product": model.products[p], "Short By": -stock[w, p].item()})
+            break
+        kept &= stock.ravel()[stock_row] > 0
+
+    report["removed_variables"] = int(model.num_variables - kept.sum() - report["fixed_variables"])
+    report["feasible"] = not (report["infeasible_products"] or report["unserved_lines"] or report["short_stock"])
+
+    reduced = model.select(np.flatnonzero(kept), stock=np.maximum(stock, 0), quantity=quantity)
+    return reduced, kept, fixed, report
+
+
+def restore_solution(kept, fixed, x_reduced):
+    """
+    Returns the values of all variables of the original model from the solution of the reduced model.
+    """
+    x = fixed.copy()
+    x[kept] = x_reduced
+    return x
+
+
+def presolve_message(report):
+    """
+    Describes the infeasibilities found by the presolve in a few lines of text.
+    """
+    lines = []
+    for item in report["infeasible_products"]:
+        lines.append(f"{item['Product']}: ordered {item['Ordered']:g} but only {item['Stock']:g} in stock")
+    for item in report["unserved_lines"]:
+        lines.append(f"{item['Order']}: no warehouse can ship {item['Product']} ({item['Quantity']:g} ordered)")
+    for item in report["short_stock"]:
+        lines.append(f"{item['Warehouse']}: short of {item['Product']} by {item['Short By']:g} "
+                     f"for the orders only it can serve")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    filepath = 'Intelligent_Sourcing.xlsx'  # Example file path
+    weightage_dict, priority_df, warehouse_df, order_df, cost_df, distance_df, days_df = load_data_cached(filepath)
+    model = create_sourcing_model(weightage_dict, priority_df, warehouse_df, order_df, cost_df, distance_df, days_df)
+
+    reduced, kept, fixed, report = presolve_sourcing_model(model)
+    print(f"Variables: {model.num_variables} -> {reduced.num_variables}, "
+          f"fixed {report['fixed_variables']}, removed {report['removed_variables']}")
+    print("Feasible" if report["feasible"] else presolve_message(report))
@@ -1,13 +1,65 @@
 import pandas as pd
+import numpy as np
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from route_tensors import RouteTensors, ROUTE_SHEETS
+from sqlite_store import load_sqlite_tables, save_sqlite_tables, table_names, update_table, update_sheet_rows
+
+# Sheets (tables) that make up a sourcing dataset, in the order they are written
+SHEETS = [
+    'Weightage', 'Priority Data', 'Warehouse Data', 'Order Data',
+    'Cost Data', 'Distance Data', 'Days Data'
+]
+
+# File extensions of the supported dataset formats
+EXCEL_EXTENSIONS = ('.xlsx', '.xlsm', '.xls')
+PARQUET_EXTENSION = '.parquet'
+NPZ_EXTENSION = '.npz'
+SQLITE_EXTENSIONS = ('.sqlite', '.db')
+TENSOR_EXTENSION = '.tensors'
+
+# Sheets of a tensor dataset kept as tables, the shipping sheets are stored as route tensors
+TABLE_SHEETS = [sheet for sheet in SHEETS if sheet not in ROUTE_SHEETS.values()]
+
+# File of a tensor dataset holding the TABLE_SHEETS
+TENSOR_TABLES_FILE = 'tables.npz'
+
+# Rows available for data in an Excel sheet, one row is taken by the header
+EXCEL_MAX_ROWS = 1048575
+
+# Number of datasets kept in the in-memory cache, least recently used are evicted first
+CACHE_SIZE = 8
+
+# Directory the cache spills to, set with the SOURCING_CACHE_DIR environment variable or set_cache_dir
+cache_dir = os.environ.get('SOURCING_CACHE_DIR')
+
+# Cached entries by dataset key, each a dictionary with the 'tables' and any derived arrays
+_cache = OrderedDict()
+
+# Guards the order of _cache, the app loads datasets from several threads
+_cache_lock = threading.Lock()
+
+
+def _unpack_tables(tables):
+    """
+    Converts a dictionary of tables into the tuple returned by load_excel_data.
+    """
+    weightage_df = tables['Weightage']
+    weightage_dict = dict(zip(weightage_df['Variable'], weightage_df['Weightage']))
+    return (weightage_dict, tables['Priority Data'], tables['Warehouse Data'], tables['Order Data'],
+            tables['Cost Data'], tables['Distance Data'], tables['Days Data'])
+
 
 def load_excel_data(filepath):
     """
     Reads an Excel file and loads specific sheets into individual dataframes.
     Extracts a weightage dictionary from the 'Weightage' sheet.
-    
+
     Parameters:
     filepath (str): Path to the Excel file.
-    
+
     Returns:
     - weightage_dict (dict): A dictionary mapping variable names to their corresponding weightages.
     - priority_df (DataFrame): Data from the 'Priority Data' sheet.
@@ -16,35 +68,421 @@ def load_excel_data(filepath):
     - cost_df (DataFrame): Data from the 'Cost Data' sheet.
     - distance_df (DataFrame): Data from the 'Distance Data' sheet.
     - days_df (DataFrame): Data from the 'Days Data' sheet.
+
+    The shipping sheets either have a row per route (Warehouse, Order, Product) or are
+    factorized and leave out the keys their values do not depend on, e.g. 'Distance Data' with
+    Warehouse and Order only. They are read as they are, create_sourcing_problem broadcasts them.
+    """
+    # Read all sheets while the workbook is opened and parsed once
+    tables = pd.read_excel(filepath, sheet_name=SHEETS)
+    return _unpack_tables(tables)
+
+
+def _load_npz(filepath, sheets):
+    # Tables written by _save_npz
+    tables = {}
+    with np.load(filepath, allow_pickle=False) as arrays:
+        for sheet in sheets:
+            columns = {}
+            for column in arrays[f'{sheet}/columns']:
+                key = f'{sheet}/{column}'
+                if f'{key}/categories' in arrays:
+                    columns[column] = arrays[f'{key}/categories'].astype(object)[arrays[f'{key}/codes']]
+                else:
+                    columns[column] = arrays[key]
+            tables[sheet] = pd.DataFrame(columns)
+    return tables
+
+
+def _save_npz(filepath, tables, sheets):
+    # One array per column, text columns stored as category codes
+    arrays = {}
+    for sheet in sheets:
+        df = tables[sheet]
+        arrays[f'{sheet}/columns'] = np.array(df.columns, dtype=str)
+        for column in df.columns:
+            key = f'{sheet}/{column}'
+            if df[column].dtype == object or isinstance(df[column].dtype, pd.CategoricalDtype):
+                codes, categories = pd.factorize(df[column])
+                arrays[f'{key}/codes'] = codes.astype(np.int32)
+                arrays[f'{key}/categories'] = np.array(categories, dtype=str)
+            else:
+                arrays[key] = df[column].to_numpy()
+    np.savez(filepath, **arrays)
+
+
+def save_tensor_tables(filepath, tables):
+    """
+    Writes the tables of a tensor dataset other than the route tensors, creating the directory if needed.
+
+    Parameters:
+    filepath (str): Path to the '.tensors' dataset.
+    tables (dict): DataFrame of at least every sheet in TABLE_SHEETS, keyed by sheet name.
+    """
+    os.makedirs(filepath, exist_ok=True)
+    _save_npz(os.path.join(filepath, TENSOR_TABLES_FILE), tables, TABLE_SHEETS)
+
+
+def load_tables(filepath):
+    """
+    Reads the seven tables of a sourcing dataset, choosing the format by file extension.
+
+    Supported formats:
+    - Excel workbook (.xlsx): one sheet per table.
+    - Parquet (.parquet): a directory with one '<table>.parquet' file per table. Requires pyarrow.
+    - NumPy (.npz): one array per column, text columns stored as category codes.
+    - SQLite (.sqlite, .db): one indexed table per sheet, see sqlite_store.
+    - Tensors (.tensors): a directory with the cost, distance and days of every route as float32
+      tensors, see route_tensors, and the other tables in a 'tables.npz' file. Meant to be read
+      with load_tensor_data, load_tables turns the tensors back into shipping sheets.
+
+    Parameters:
+    filepath (str): Path to the dataset.
+
+    Returns:
+    dict: DataFrame of every table, keyed by sheet name.
     """
-    # Define the sheet names to be read
-    sheets = [
-        'Weightage', 'Priority Data', 'Warehouse Data', 'Order Data',
-        'Cost Data', 'Distance Data', 'Days Data'
-    ]
-    
-    # Read the 'Weightage' sheet and create a dictionary
-    weightage_df = pd.read_excel(filepath, sheet_name='Weightage')
+    extension = os.path.splitext(filepath)[1].lower()
+    if extension in EXCEL_EXTENSIONS:
+        return pd.read_excel(filepath, sheet_name=SHEETS)
+    if extension == PARQUET_EXTENSION:
+        return {sheet: pd.read_parquet(os.path.join(filepath, f'{sheet}.parquet')) for sheet in SHEETS}
+    if extension == NPZ_EXTENSION:
+        return _load_npz(filepath, SHEETS)
+    if extension in SQLITE_EXTENSIONS:
+        return load_sqlite_tables(filepath, SHEETS)
+    if extension == TENSOR_EXTENSION:
+        tables = {**_load_npz(os.path.join(filepath, TENSOR_TABLES_FILE), TABLE_SHEETS),
+                  **RouteTensors.load(filepath, mmap_mode=None).to_frames()}
+        return {sheet: tables[sheet] for sheet in SHEETS}
+    raise ValueError(f"Unsupported dataset format '{extension}' for {filepath}")
+
+
+def save_tables(filepath, tables):
+    """
+    Writes the seven tables of a sourcing dataset, choosing the format by file extension.
+
+    Parameters:
+    filepath (str): Path to the dataset, see load_tables for the supported formats.
+    tables (dict): DataFrame of every table, keyed by sheet name.
+    """
+    extension = os.path.splitext(filepath)[1].lower()
+    if extension in EXCEL_EXTENSIONS:
+        with pd.ExcelWriter(filepath, engine='xlsxwriter') as writer:
+            for sheet in SHEETS:
+                tables[sheet].to_excel(writer, sheet_name=sheet, index=False)
+    elif extension == PARQUET_EXTENSION:
+        os.makedirs(filepath, exist_ok=True)
+        for sheet in SHEETS:
+            tables[sheet].to_parquet(os.path.join(filepath, f'{sheet}.parquet'), index=False)
+    elif extension == NPZ_EXTENSION:
+        _save_npz(filepath, tables, SHEETS)
+    elif extension in SQLITE_EXTENSIONS:
+        save_sqlite_tables(filepath, {sheet: tables[sheet] for sheet in SHEETS})
+    elif extension == TENSOR_EXTENSION:
+        save_tensor_tables(filepath, tables)
+        warehouse_df, order_df = tables['Warehouse Data'], tables['Order Data']
+        frames = {metric: tables[sheet] for metric, sheet in ROUTE_SHEETS.items()}
+        RouteTensors.from_frames(warehouse_df['Warehouse'].tolist(), order_df['Order'].tolist(),
+                                 list(warehouse_df.columns[1:]), frames).save(filepath)
+    else:
+        raise ValueError(f"Unsupported dataset format '{extension}' for {filepath}")
+
+
+def load_data(filepath):
+    """
+    Reads a sourcing dataset in any supported format, see load_tables.
+
+    Returns:
+    The same tuple as load_excel_data.
+    """
+    return _unpack_tables(load_tables(filepath))
+
+
+def load_tensor_data(filepath, mmap_mode='r'):
+    """
+    Reads a tensor dataset for create_sourcing_problem without building the shipping sheets.
+
+    The route tensors are memory-mapped, so only the routes used by the model are read from disk.
+
+    Parameters:
+    filepath (str): Path to a '.tensors' dataset.
+    mmap_mode (str): Mode of numpy.load for the tensors, None to read them into memory.
+
+    Returns:
+    tuple: weightage_dict, priority_df, warehouse_df and order_df as returned by load_excel_data,
+    and the RouteTensors.
+    """
+    tables = _load_npz(os.path.join(filepath, TENSOR_TABLES_FILE), TABLE_SHEETS)
+    weightage_df = tables['Weightage']
     weightage_dict = dict(zip(weightage_df['Variable'], weightage_df['Weightage']))
-    
-    # Read all other sheets into separate dataframes
-    priority_df = pd.read_excel(filepath, sheet_name='Priority Data')
-    warehouse_df = pd.read_excel(filepath, sheet_name='Warehouse Data')
-    order_df = pd.read_excel(filepath, sheet_name='Order Data')
-    cost_df = pd.read_excel(filepath, sheet_name='Cost Data')
-    distance_df = pd.read_excel(filepath, sheet_name='Distance Data')
-    days_df = pd.read_excel(filepath, sheet_name='Days Data')
-    
-    return weightage_dict, priority_df, warehouse_df, order_df, cost_df, distance_df, days_df
+    return (weightage_dict, tables['Priority Data'], tables['Warehouse Data'], tables['Order Data'],
+            RouteTensors.load(filepath, mmap_mode))
+
+
+def list_sheets(filepath):
+    """
+    Returns the names of the sheets (tables) of a dataset, including any result sheets.
+    """
+    extension = os.path.splitext(filepath)[1].lower()
+    if extension in EXCEL_EXTENSIONS:
+        return pd.ExcelFile(filepath).sheet_names
+    if extension == PARQUET_EXTENSION:
+        return [os.path.splitext(name)[0] for name in sorted(os.listdir(filepath)) if name.endswith(PARQUET_EXTENSION)]
+    if extension in SQLITE_EXTENSIONS:
+        return table_names(filepath)
+    return list(SHEETS)
+
+
+def read_sheet(filepath, sheet):
+    """
+    Reads one sheet (table) of a dataset without parsing the others.
+    """
+    extension = os.path.splitext(filepath)[1].lower()
+    if extension in EXCEL_EXTENSIONS:
+        return pd.read_excel(filepath, sheet_name=sheet)
+    if extension == PARQUET_EXTENSION:
+        return pd.read_parquet(os.path.join(filepath, f'{sheet}.parquet'))
+    if extension in SQLITE_EXTENSIONS:
+        return load_sqlite_tables(filepath, [sheet])[sheet]
+    return load_tables(filepath)[sheet]
+
+
+def read_sheets(filepath):
+    """
+    Reads every sheet (table) of a dataset, including any result sheets.
+
+    Returns:
+    dict: DataFrame of every sheet, keyed by sheet name.
+    """
+    extension = os.path.splitext(filepath)[1].lower()
+    if extension in EXCEL_EXTENSIONS:
+        return pd.read_excel(filepath, sheet_name=None)
+    return {sheet: read_sheet(filepath, sheet) for sheet in list_sheets(filepath)}
+
+
+def write_sheets(filepath, tables):
+    """
+    Writes sheets (tables) into an existing dataset, keeping the other sheets.
+
+    An Excel workbook is re-saved as a whole. A SQLite store only writes the rows that
+    changed, see sqlite_store.update_table.
+
+    Parameters:
+    filepath (str): Path to the dataset.
+    tables (dict): DataFrame of every sheet to write, keyed by sheet name.
+    """
+    extension = os.path.splitext(filepath)[1].lower()
+    if extension in EXCEL_EXTENSIONS:
+        with pd.ExcelWriter(filepath, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
+            for sheet, df in tables.items():
+                df.to_excel(writer, sheet_name=sheet, index=False)
+    elif extension == PARQUET_EXTENSION:
+        for sheet, df in tables.items():
+            df.to_parquet(os.path.join(filepath, f'{sheet}.parquet'), index=False)
+    elif extension in SQLITE_EXTENSIONS:
+        for sheet, df in tables.items():
+            update_table(filepath, sheet, df)
+    else:
+        raise ValueError(f"Sheets of a '{extension}' dataset cannot be written one by one")
+
+
+def file_signature(filepath):
+    """
+    Returns a signature of the file that changes whenever the file is modified.
+
+    Parameters:
+    filepath (str): Path to the file.
+
+    Returns:
+    tuple: The modification time in nanoseconds and the size of the file.
+    """
+    stat = os.stat(filepath)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _dataset_files(filepath):
+    # A Parquet dataset is a directory, every other format a single file
+    if os.path.isdir(filepath):
+        return [os.path.join(filepath, name) for name in sorted(os.listdir(filepath))]
+    return [filepath]
+
+
+def dataset_key(filepath, content_hash=False):
+    """
+    Returns the cache key of a dataset.
+
+    Parameters:
+    filepath (str): Path to the dataset.
+    content_hash (bool): Hash the file contents, so identical datasets share a key wherever they are
+        stored. Otherwise the key is built from the path, modification time and size, which is
+        much cheaper for large files.
+
+    Returns:
+    str: Hexadecimal key.
+    """
+    digest = hashlib.sha256()
+    for path in _dataset_files(filepath):
+        if content_hash:
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+        else:
+            digest.update(repr((os.path.abspath(path), file_signature(path))).encode())
+    return digest.hexdigest()
+
+
+def set_cache_dir(path):
+    """
+    Sets the directory the cache spills to, or disables spilling with None.
+    """
+    global cache_dir
+    cache_dir = path
+
+
+def clear_cache():
+    """
+    Empties the in-memory cache. Files in the cache directory are kept.
+    """
+    _cache.clear()
+
+
+def _cache_entry(key):
+    # Entry of a key, created empty if needed and marked as most recently used
+    with _cache_lock:
+        entry = _cache.setdefault(key, {})
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return entry
+
+
+def load_data_cached(filepath, content_hash=False):
+    """
+    Reads a sourcing dataset like load_data, reusing the tables parsed for an unchanged dataset.
+
+    Tables are kept in memory with LRU eviction and, when a cache directory is set, spilled
+    to an .npz file per dataset so other processes and later runs skip parsing too. The
+    returned DataFrames are shared with the cache and must not be modified in place.
+
+    Parameters:
+    filepath (str): Path to the dataset.
+    content_hash (bool): Key the cache by file contents instead of modification time and size.
+
+    Returns:
+    The same tuple as load_excel_data.
+    """
+    key = dataset_key(filepath, content_hash)
+    entry = _cache_entry(key)
+    sheets = entry.get('sheets', {})
+    if 'tables' not in entry and all(sheet in sheets for sheet in SHEETS):
+        # Every table was already read by read_sheet_cached or kept by write_sheet_cached
+        entry['tables'] = {sheet: sheets[sheet].copy(deep=False) for sheet in SHEETS}
+    if 'tables' not in entry:
+        spill_path = os.path.join(cache_dir, f'{key}{NPZ_EXTENSION}') if cache_dir else None
+        if spill_path and os.path.exists(spill_path):
+            entry['tables'] = load_tables(spill_path)
+        else:
+            entry['tables'] = load_tables(filepath)
+            if spill_path:
+                os.makedirs(cache_dir, exist_ok=True)
+                save_tables(spill_path, entry['tables'])
+    # Marks the tables for cached_arrays, however they were built
+    for df in entry['tables'].values():
+        df.attrs['dataset_key'] = key
+    return _unpack_tables(entry['tables'])
+
+
+def read_sheet_cached(filepath, sheet):
+    """
+    Reads one sheet like read_sheet, reusing the sheet parsed for an unchanged dataset.
+
+    Sheets share the cache of load_data_cached, so a table loaded for a run is not parsed
+    again to be viewed, and the other way round. The returned DataFrame is shared with the
+    cache and must not be modified in place.
+
+    Parameters:
+    filepath (str): Path to the dataset.
+    sheet (str): Name of the sheet.
+
+    Returns:
+    DataFrame: The sheet.
+    """
+    entry = _cache_entry(dataset_key(filepath))
+    if sheet in entry.get('tables', {}):
+        return entry['tables'][sheet]
+    sheets = entry.setdefault('sheets', {})
+    if sheet not in sheets:
+        sheets[sheet] = read_sheet(filepath, sheet)
+    return sheets[sheet]
+
+
+def write_sheet_cached(filepath, sheet, df, changed_rows=None):
+    """
+    Writes one sheet like write_sheets and keeps it cached for the modified dataset.
+
+    Writing changes the cache key of the dataset, so the written sheet and the unchanged
+    sheets already parsed are moved to the new key and the next read does not parse them.
+
+    Parameters:
+    filepath (str): Path to the dataset.
+    sheet (str): Name of the sheet.
+    df (DataFrame): The complete sheet.
+    changed_rows (array): Positions of the only rows that changed, with unchanged key columns.
+        A SQLite store then only updates these rows; other formats always write the whole sheet.
+    """
+    old_entry = _cache.get(dataset_key(filepath), {})
+    if changed_rows is not None and os.path.splitext(filepath)[1].lower() in SQLITE_EXTENSIONS:
+        update_sheet_rows(filepath, sheet, df.iloc[changed_rows])
+    else:
+        write_sheets(filepath, {sheet: df})
+
+    unchanged = {**old_entry.get('tables', {}), **old_entry.get('sheets', {})}
+    unchanged.pop(sheet, None)
+    entry = _cache_entry(dataset_key(filepath))
+    entry['sheets'] = {**unchanged, **entry.get('sheets', {}), sheet: df}
+
+
+def cached_arrays(dfs, name, compute):
+    """
+    Returns arrays derived from cached tables, computing and caching them on first use.
+
+    The arrays are only reused when every DataFrame in dfs is the very object returned by
+    load_data_cached, so modified copies of the tables are never matched with stale arrays.
+
+    Parameters:
+    dfs (list): DataFrames the arrays are derived from.
+    name (str): Name of the derived arrays, e.g. 'normalized'.
+    compute (function): Called without arguments to compute a dictionary of arrays.
+
+    Returns:
+    dict: The arrays.
+    """
+    key = dfs[0].attrs.get('dataset_key')
+    entry = _cache.get(key)
+    if entry is None or not all(any(df is table for table in entry.get('tables', {}).values()) for df in dfs):
+        return compute()
+
+    if name not in entry:
+        spill_path = os.path.join(cache_dir, f'{key}.{name}{NPZ_EXTENSION}') if cache_dir else None
+        if spill_path and os.path.exists(spill_path):
+            with np.load(spill_path, allow_pickle=False) as arrays:
+                entry[name] = dict(arrays)
+        else:
+            entry[name] = compute()
+            if spill_path:
+                os.makedirs(cache_dir, exist_ok=True)
+                np.savez(spill_path, **entry[name])
+    return entry[name]
 
 if __name__ == "__main__":
     filepath = 'Intelligent_Sourcing.xlsx'  # Example file path
     weightage_dict, priority_df, warehouse_df, order_df, cost_df, distance_df, days_df = load_excel_data(filepath)
-    
+
     # Print output for verification
     print("Weightage Dictionary:")
     print(weightage_dict)
-    
+
     print("\nLoaded DataFrames:")
     for name, df in zip([
         "Priority Data", "Warehouse Data", "Order Data", "Cost Data", "Distance Data", "Days Data"
@@ -0,0 +1,77 @@
+import os
+import pandas as pd
+from read_data import (EXCEL_EXTENSIONS, EXCEL_MAX_ROWS, PARQUET_EXTENSION, SQLITE_EXTENSIONS,
+                       list_sheets, read_sheet, write_sheets)
+
+# Sheets written by an optimization run
+RESULT_SHEETS = ['Fulfillment Solution', 'Warehouse Stock Status']
+
+# Results are written to a folder of CSV files when the path ends with this extension
+CSV_EXTENSION = '.csv'
+
+# Rows written to a CSV file at a time
+CSV_CHUNK_ROWS = 100000
+
+
+def write_results(filepath, fulfillment_solution, warehouse_stock_status, nonzero_only=True):
+    """
+    Writes the results of an optimization run, separately from the input data.
+
+    The format is chosen by the extension of filepath:
+    - '.parquet': a folder with one Parquet file per result sheet.
+    - '.csv': a folder with one CSV file per result sheet, written in chunks.
+    - '.xlsx': a new workbook with the two result sheets, meant as a report for small runs.
+    - '.sqlite' or '.db': the result tables of a dataset store, see sqlite_store.
+
+    The input data is never read or rewritten, so the time taken only depends on the size
+    of the results.
+
+    Parameters:
+    filepath (str): Path of the results.
+    fulfillment_solution (DataFrame): Supply quantities from solve_sourcing_problem.
+    warehouse_stock_status (DataFrame): Stock levels from solve_sourcing_problem.
+    nonzero_only (bool): Only write the shipments with a non-zero quantity.
+
+    Raises:
+    ValueError: If the results do not fit in an Excel sheet or the format is not supported.
+    """
+    if nonzero_only:
+        fulfillment_solution = fulfillment_solution[fulfillment_solution['Supply Quantity'] != 0]
+    tables = dict(zip(RESULT_SHEETS, [fulfillment_solution, warehouse_stock_status]))
+
+    extension = os.path.splitext(filepath)[1].lower()
+    if extension in EXCEL_EXTENSIONS:
+        if max(len(df) for df in tables.values()) > EXCEL_MAX_ROWS:
+            raise ValueError(f"The results do not fit in an Excel sheet, use a '{PARQUET_EXTENSION}' "
+                             f"or '{CSV_EXTENSION}' path instead")
+        with pd.ExcelWriter(filepath, engine='xlsxwriter') as writer:
+            for sheet, df in tables.items():
+                df.to_excel(writer, sheet_name=sheet, index=False)
+    elif extension == PARQUET_EXTENSION:
+        os.makedirs(filepath, exist_ok=True)
+        for sheet, df in tables.items():
+            df.to_parquet(os.path.join(filepath, f'{sheet}.parquet'), index=False)
+    elif extension == CSV_EXTENSION:
+        os.makedirs(filepath, exist_ok=True)
+        for sheet, df in tables.items():
+            df.to_csv(os.path.join(filepath, f'{sheet}.csv'), index=False, chunksize=CSV_CHUNK_ROWS)
+    elif extension in SQLITE_EXTENSIONS:
+        write_sheets(filepath, tables)
+    else:
+        raise ValueError(f"Unsupported results format '{extension}' for {filepath}")
+
+
+def read_results(filepath):
+    """
+    Reads the results written by write_results.
+
+    Returns:
+    dict: DataFrame of every result sheet found, keyed by sheet name. Empty if there are no results yet.
+    """
+    if not os.path.exists(filepath):
+        return {}
+    if os.path.splitext(filepath)[1].lower() == CSV_EXTENSION:
+        return {sheet: pd.read_csv(os.path.join(filepath, f'{sheet}.csv')) for sheet in RESULT_SHEETS
+                if os.path.exists(os.path.join(filepath, f'{sheet}.csv'))}
+    sheets = list_sheets(filepath)
+    return {sheet: read_sheet(filepath, sheet) for sheet in RESULT_SHEETS if sheet in sheets}
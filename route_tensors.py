@@ -0,0 +1,304 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+
+# Metrics of a route (warehouse, order, product) and the shipping sheet each comes from
+ROUTE_SHEETS = {'Cost': 'Cost Data', 'Distance': 'Distance Data', 'Days': 'Days Data'}
+
+# File with the warehouse, order and product names in a saved tensor folder
+NAMES_FILE = 'names.json'
+
+# Key columns of a shipping sheet, one per axis of the tensors. A factorized sheet leaves out
+# the keys its metric does not depend on, e.g. Warehouse and Order for a lane distance.
+KEY_COLUMNS = ['Warehouse', 'Order', 'Product']
+
+# A full shipping sheet listing fewer routes than this share of W x O x P is held as lanes
+# rather than a dense tensor; a lane takes 12 bytes against 4 bytes per route of the tensor
+SPARSE_FILL = 1 / 3
+
+
+def lane_indices(df, Warehouses, Orders, Products):
+    """
+    Returns the warehouse, order and product index of every row of a shipping sheet.
+    A key column the sheet leaves out gives index 0 for every row.
+
+    Raises:
+        ValueError: If the sheet names a warehouse, order or product that is not in the input.
+    """
+    indices = [pd.Index(names).get_indexer(df[column]) if column in df.columns else np.zeros(len(df), dtype=np.intp)
+               for names, column in zip([Warehouses, Orders, Products], KEY_COLUMNS)]
+    if any(np.any(index < 0) for index in indices):
+        raise ValueError("Shipping data refers to a warehouse, order or product that is not in the input data")
+    return indices
+
+
+class LaneValues:
+    """
+    Values of a metric on the lanes of a sparse shipping sheet, in COO form.
+
+    Attributes:
+        lanes (np.ndarray): Sorted flat index of every route of the sheet, int64.
+        values (np.ndarray): Value of every lane, float32.
+    """
+
+    def __init__(self, lanes, values):
+        self.lanes = lanes
+        self.values = values
+
+    @property
+    def nbytes(self):
+        return self.lanes.nbytes + self.values.nbytes
+
+    def take(self, lanes):
+        """
+        Returns the values on the given lanes, NaN on the lanes that are not listed.
+        """
+        if len(self.lanes) == 0:
+            return np.full(len(lanes), np.nan, dtype=np.float32)
+        position = np.minimum(np.searchsorted(self.lanes, lanes), len(self.lanes) - 1)
+        return np.where(self.lanes[position] == lanes, self.values[position], np.float32(np.nan))
+
+
+class RouteTensors:
+    """
+    Cost, distance and days of every route as dense float32 tensors of shape (W, O, P).
+
+    Warehouses, orders and products are only stored once as names, a route is addressed by
+    their index, so a metric takes 4 bytes per route instead of a row with three key strings
+    and an int64 value. Routes missing from a shipping sheet are NaN. Values are matched to
+    routes by key, never by row order, and integers up to 2**24 are stored exactly.
+
+    A metric that does not depend on every key is held factorized, with length 1 on the axes
+    it does not depend on, e.g. (W, O, 1) for a lane distance or (W, 1, P) for a cost per
+    warehouse and product. It is broadcast to the routes only when their values are taken.
+
+    A full sheet that lists only a small share of the routes (see SPARSE_FILL) is held as
+    LaneValues instead, so memory and build time grow with its lanes rather than W x O x P.
+
+    The tensors can be saved as .npy files and memory-mapped when loaded, so building a model
+    only reads the routes it uses.
+
+    Attributes:
+        warehouses, orders, products (list): Names of the warehouses, orders and products.
+        metrics (dict): Tensor of every metric in ROUTE_SHEETS, shape (W, O, P), factorized or LaneValues.
+    """
+
+    def __init__(self, warehouses, orders, products, metrics):
+        self.warehouses = list(warehouses)
+        self.orders = list(orders)
+        self.products = list(products)
+        self.metrics = metrics
+
+    @property
+    def shape(self):
+        return len(self.warehouses), len(self.orders), len(self.products)
+
+    @property
+    def nbytes(self):
+        return sum(tensor.nbytes for tensor in self.metrics.values())
+
+    def metric_shape(self, columns):
+        """
+        Returns the shape of the tensor of a shipping sheet with the given columns, 1 on the
+        axes of the key columns it leaves out.
+        """
+        return tuple(n if key in columns else 1 for n, key in zip(self.shape, KEY_COLUMNS))
+
+    def _key_columns(self, tensor):
+        # Key columns of the sheet of a tensor; an axis of one name is always kept
+        if isinstance(tensor, LaneValues):
+            return KEY_COLUMNS
+        return [key for n, size, key in zip(self.shape, tensor.shape, KEY_COLUMNS) if size == n]
+
+    @classmethod
+    def from_frames(cls, warehouses, orders, products, frames):
+        """
+        Builds the tensors from the long shipping sheets, full or factorized.
+
+        Parameters:
+        warehouses, orders, products (list): Names that index the tensors.
+        frames (dict): Shipping sheet of every metric, keyed by metric name, e.g. {'Cost': cost_df}.
+            A sheet without some of the KEY_COLUMNS gives a factorized tensor, a full sheet with
+            few routes gives LaneValues. A route listed twice keeps its first value.
+
+        Raises:
+        ValueError: If a sheet names a warehouse, order or product that is not in the names.
+        """
+        tensors = cls(warehouses, orders, products, {})
+        for metric, df in frames.items():
+            w, o, p = lane_indices(df, warehouses, orders, products)
+            shape = tensors.metric_shape(df.columns)
+            if shape == tensors.shape and len(df) < SPARSE_FILL * np.prod(shape, dtype=np.int64):
+                lanes = np.ravel_multi_index((w, o, p), shape).astype(np.int64)
+                # np.unique returns the first of duplicate lanes
+                lanes, first = np.unique(lanes, return_index=True)
+                values = df[metric].to_numpy(dtype=np.float32)[first]
+                tensors.metrics[metric] = LaneValues(lanes, values)
+                continue
+            tensor = np.full(shape, np.nan, dtype=np.float32)
+            # Assigned in reverse so the first of duplicate rows is written last
+            tensor[w[::-1], o[::-1], p[::-1]] = df[metric].to_numpy(dtype=np.float32)[::-1]
+            tensors.metrics[metric] = tensor
+        return tensors
+
+    def values(self, metric, lanes):
+        """
+        Returns the values of a metric on the given lanes (flat indices of routes), broadcasting
+        a factorized tensor.
+        """
+        tensor = self.metrics[metric]
+        if isinstance(tensor, LaneValues):
+            return tensor.take(lanes)
+        if tensor.shape == self.shape:
+            return tensor.reshape(-1)[lanes]
+        index = np.unravel_index(lanes, self.shape)
+        # Index 0 on the axes of length 1
+        return tensor[tuple(np.minimum(i, size - 1) for i, size in zip(index, tensor.shape))]
+
+    def lanes(self):
+        """
+        Returns the flat index of every route of the Cost tensor, in (warehouse, order, product) order.
+        A factorized Cost tensor gives its lanes for every warehouse, order or product it leaves out.
+
+        Raises:
+        ValueError: If a route with a cost has no distance or days.
+        """
+        cost = self.metrics['Cost']
+        if isinstance(cost, LaneValues):
+            lanes = cost.lanes[~np.isnan(cost.values)]
+        else:
+            lanes = np.flatnonzero(np.broadcast_to(~np.isnan(cost), self.shape))
+        for metric in ROUTE_SHEETS:
+            if metric != 'Cost' and np.isnan(self.values(metric, lanes)).any():
+                raise ValueError(f"{ROUTE_SHEETS[metric]} has no value for some lanes of the Cost Data sheet")
+        return lanes
+
+    def scaled(self, metric, lanes):
+        """
+        Returns the values of a metric on the given lanes scaled to [0, 1] by the smallest and
+        largest value of all its routes, as a new float64 array. The bounds of a factorized
+        tensor are taken before broadcasting, which does not change them.
+        """
+        tensor = self.metrics[metric]
+        if isinstance(tensor, LaneValues):
+            tensor = tensor.values
+        min_val, max_val = float(np.nanmin(tensor)), float(np.nanmax(tensor))
+        values = self.values(metric, lanes).astype(float)
+        if max_val == min_val:
+            return np.zeros_like(values)
+        return (values - min_val) / (max_val - min_val)
+
+    def to_frames(self):
+        """
+        Returns the long shipping sheet of every metric, keyed by sheet name, with categorical key columns.
+        A factorized tensor gives a sheet with only the key columns it depends on.
+        """
+        names = dict(zip(KEY_COLUMNS, [self.warehouses, self.orders, self.products]))
+        frames = {}
+        for metric, tensor in self.metrics.items():
+            if isinstance(tensor, LaneValues):
+                routes = np.flatnonzero(~np.isnan(tensor.values))
+                codes = np.unravel_index(tensor.lanes[routes], self.shape)
+                values = tensor.values[routes]
+            else:
+                flat = tensor.reshape(-1)
+                routes = np.flatnonzero(~np.isnan(flat))
+                codes = np.unravel_index(routes, tensor.shape)
+                values = flat[routes]
+            if np.array_equal(values, np.round(values)):
+                values = values.astype(np.int64)
+            frames[ROUTE_SHEETS[metric]] = pd.DataFrame({
+                **{key: pd.Categorical.from_codes(code, names[key])
+                   for key, code in zip(KEY_COLUMNS, codes) if key in self._key_columns(tensor)},
+                metric: values,
+            })
+        return frames
+
+    def arrays(self):
+        """
+        Returns the metrics as plain arrays keyed by name, e.g. to be cached in an .npz file.
+        LaneValues are given as '<metric>' with the values and '<metric>_lanes' with the lanes.
+        """
+        arrays = {}
+        for metric, tensor in self.metrics.items():
+            if isinstance(tensor, LaneValues):
+                arrays[f'{metric}_lanes'] = tensor.lanes
+                tensor = tensor.values
+            arrays[metric] = tensor
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, warehouses, orders, products, arrays):
+        """
+        Builds the tensors from the arrays returned by arrays.
+        """
+        metrics = {}
+        for metric in ROUTE_SHEETS:
+            tensor = arrays[metric]
+            if f'{metric}_lanes' in arrays:
+                tensor = LaneValues(arrays[f'{metric}_lanes'], tensor)
+            metrics[metric] = tensor
+        return cls(warehouses, orders, products, metrics)
+
+    def _save_names(self, folder):
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, NAMES_FILE), 'w', encoding='utf-8') as f:
+            json.dump({'warehouses': self.warehouses, 'orders': self.orders, 'products': self.products}, f)
+
+    def save(self, folder):
+        """
+        Writes the names and one .npy file per metric into folder. LaneValues are written as
+        their values and a second '<metric>_lanes.npy' file with the lanes.
+        """
+        self._save_names(folder)
+        arrays = self.arrays()
+        for metric in self.metrics:
+            lanes_file = os.path.join(folder, f'{metric}_lanes.npy')
+            if f'{metric}_lanes' not in arrays and os.path.exists(lanes_file):
+                os.remove(lanes_file)
+        for name, array in arrays.items():
+            np.save(os.path.join(folder, f'{name}.npy'), array)
+
+    @classmethod
+    def create(cls, folder, warehouses, orders, products, key_columns=None):
+        """
+        Creates tensors memory-mapped to .npy files in folder, to be filled without holding them in memory.
+        Every route is NaN until it is written; call flush on every tensor when done.
+
+        Parameters:
+        key_columns (dict): Key columns of the metrics that are factorized, keyed by metric name,
+            e.g. {'Distance': ['Warehouse', 'Order']}. Other metrics get the full shape.
+        """
+        tensors = cls(warehouses, orders, products, {})
+        tensors._save_names(folder)
+        key_columns = key_columns or {}
+        for metric in ROUTE_SHEETS:
+            shape = tensors.metric_shape(key_columns.get(metric, KEY_COLUMNS))
+            lanes_file = os.path.join(folder, f'{metric}_lanes.npy')
+            if os.path.exists(lanes_file):
+                os.remove(lanes_file)
+            tensor = np.lib.format.open_memmap(os.path.join(folder, f'{metric}.npy'), mode='w+', dtype=np.float32,
+                                               shape=shape)
+            tensor[:] = np.nan
+            tensors.metrics[metric] = tensor
+        return tensors
+
+    @classmethod
+    def load(cls, folder, mmap_mode='r'):
+        """
+        Reads tensors written by save.
+
+        Parameters:
+        folder (str): Folder written by save.
+        mmap_mode (str): Memory-map the tensors with this mode of numpy.load, None to read them into memory.
+        """
+        with open(os.path.join(folder, NAMES_FILE), encoding='utf-8') as f:
+            names = json.load(f)
+        arrays = {}
+        for metric in ROUTE_SHEETS:
+            for name in [metric, f'{metric}_lanes']:
+                path = os.path.join(folder, f'{name}.npy')
+                if os.path.exists(path):
+                    arrays[name] = np.load(path, mmap_mode=mmap_mode)
+        return cls.from_arrays(names['warehouses'], names['orders'], names['products'], arrays)
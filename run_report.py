@@ -0,0 +1,213 @@
+import json
+import os
+import re
+import time
+import tracemalloc
+from contextlib import contextmanager
+import pandas as pd
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, the peak RSS is then not recorded
+    resource = None
+
+
+def _cpu_time():
+    # User and system time of this process and its finished children
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def peak_rss():
+    """
+    Returns the largest resident set size of this process so far in MB, or None if unknown.
+    """
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 2**20 if os.uname().sysname == "Darwin" else 2**10
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+class RunReport:
+    """
+    Records the wall time, CPU time and peak memory of every phase of an optimization run,
+    together with statistics of the model and the solver.
+
+    CPU time includes finished child processes such as CBC and the worker pools. Peak memory
+    is measured with tracemalloc, so it covers the memory allocated by Python and NumPy in this
+    process but not the memory of child processes. Peak RSS is the high-water mark of the
+    process at the end of the phase, so it only grows from phase to phase; the phase where it
+    jumps is the one that needed the memory. Phases must not be nested.
+
+    Usage:
+        report = RunReport()
+        with report.phase("Load Data"):
+            data = load_data_cached(filepath)
+        report.statistics["Variables"] = 160
+        print(report.to_json())
+    """
+
+    def __init__(self, trace_memory=True, verbose=False, listener=None):
+        """
+        Parameters:
+        trace_memory (bool): Measure the peak memory of every phase. Tracing makes memory heavy
+            phases somewhat slower.
+        verbose (bool): Print every phase when it ends.
+        listener (function): Called as listener(name, None) when a phase starts and as
+            listener(name, record) when it ends, e.g. to show progress. An exception raised when
+            a phase starts skips the phase, which is how a job is cancelled between phases.
+        """
+        self.trace_memory = trace_memory
+        self.verbose = verbose
+        self.listener = listener
+        self.phases = []
+        self.statistics = {}
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Measures the code run in the with block as the phase name.
+        """
+        if self.listener is not None:
+            self.listener(name, None)
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        wall, cpu = time.perf_counter(), _cpu_time()
+        try:
+            yield
+        finally:
+            record = {
+                "Phase": name,
+                "Wall Time (s)": time.perf_counter() - wall,
+                "CPU Time (s)": _cpu_time() - cpu,
+                "Peak Memory (MB)": tracemalloc.get_traced_memory()[1] / 2**20 if self.trace_memory else None,
+                "Peak RSS (MB)": peak_rss(),
+            }
+            if started_tracing:
+                tracemalloc.stop()
+            self.phases.append(record)
+            if self.listener is not None:
+                self.listener(name, record)
+            if self.verbose:
+                print(f"{name}: {record['Wall Time (s)']:.3f}s wall, {record['CPU Time (s)']:.3f}s CPU"
+                      + (f", {record['Peak Memory (MB)']:.1f} MB peak" if self.trace_memory else ""))
+
+    def to_dict(self):
+        """
+        Returns the report as a dictionary with the phases, their totals and the statistics.
+        """
+        return {
+            "phases": self.phases,
+            "total": {
+                "Wall Time (s)": sum(record["Wall Time (s)"] for record in self.phases),
+                "CPU Time (s)": sum(record["CPU Time (s)"] for record in self.phases),
+            },
+            "statistics": self.statistics,
+        }
+
+    def to_json(self, filepath=None):
+        """
+        Returns the report as JSON text and writes it to filepath if given.
+        """
+        text = json.dumps(self.to_dict(), indent=2, default=str)
+        if filepath:
+            with open(filepath, "w", encoding="utf-8") as f:
+                f.write(text)
+        return text
+
+    def phase_frame(self):
+        """
+        Returns one row per phase as a DataFrame.
+        """
+        return pd.DataFrame(self.phases, columns=["Phase", "Wall Time (s)", "CPU Time (s)", "Peak Memory (MB)",
+                                                  "Peak RSS (MB)"])
+
+
+def model_statistics(model):
+    """
+    Returns the size of a SourcingModel.
+    """
+    return {
+        "Warehouses": len(model.warehouses),
+        "Orders": len(model.orders),
+        "Products": len(model.products),
+        "Variables": model.num_variables,
+        "Constraints": model.A_ub.shape[0] + model.A_eq.shape[0],
+        "Non-zeros": model.A_ub.nnz + model.A_eq.nnz,
+    }
+
+
+def parse_cbc_log(text):
+    """
+    Reads the simplex iterations and branch-and-bound nodes from a CBC log.
+
+    Parameters:
+    text (str): Output of a CBC run, either a MIP or a pure LP solve.
+
+    Returns:
+    dict: "Iterations" and "Nodes", only those found in the log.
+    """
+    stats = {}
+    iterations = re.search(r"Total iterations:\s+(\d+)", text) or re.search(r" - (\d+) iterations", text)
+    if iterations:
+        stats["Iterations"] = int(iterations.group(1))
+    nodes = re.search(r"Enumerated nodes:\s+(\d+)", text)
+    if nodes:
+        stats["Nodes"] = int(nodes.group(1))
+    return stats
+
+
+# CBC log lines with an incumbent or bound: node reports, new integer solutions and the end of the search
+CBC_PROGRESS = re.compile(
+    r"Cbc0010I After \d+ nodes, \d+ on tree, (?P<incumbent>\S+) best solution, best possible (?P<bound>\S+) "
+    r"\((?P<elapsed>\S+) seconds\)"
+    r"|Cbc00(?:04|12)I Integer solution of (?P<solution>\S+) found .*?\((?P<found>\S+) seconds\)"
+    r"|Cbc0005I Partial search - best objective (?P<partial>\S+) \(best possible (?P<partial_bound>\S+)\)"
+    r".*?\((?P<stopped>\S+) seconds\)"
+    r"|Cbc0001I Search completed - best objective (?P<completed>\S+),.*?\((?P<finished>\S+) seconds\)")
+
+# Objective CBC logs while it has no integer solution
+CBC_NO_SOLUTION = 1e50
+
+
+def parse_cbc_progress(text):
+    """
+    Reads the incumbents and bounds CBC reports during its branch-and-bound search.
+
+    CBC logs them in its minimization sense, so for a maximization problem they are the negated
+    objective. A completed search proves its incumbent optimal, so its bound is the incumbent.
+
+    Parameters:
+    text (str): Output of a CBC run, complete or still being written.
+
+    Returns:
+    list: One tuple (bound, incumbent, elapsed seconds) per progress line, in log order, with the
+    latest bound and incumbent known at that line and None for those not known yet.
+    """
+    def number(value, known=None):
+        # Logged value, or the known one while CBC logs that it has no solution
+        value = float(value)
+        return known if abs(value) >= CBC_NO_SOLUTION else value
+
+    updates = []
+    bound = incumbent = None
+    for match in CBC_PROGRESS.finditer(text):
+        groups = match.groupdict()
+        if groups["incumbent"] is not None:
+            incumbent, bound = number(groups["incumbent"], incumbent), number(groups["bound"])
+            elapsed = groups["elapsed"]
+        elif groups["solution"] is not None:
+            incumbent, elapsed = number(groups["solution"]), groups["found"]
+        elif groups["partial"] is not None:
+            incumbent, bound = number(groups["partial"], incumbent), number(groups["partial_bound"])
+            elapsed = groups["stopped"]
+        else:
+            incumbent = number(groups["completed"], incumbent)
+            bound, elapsed = incumbent, groups["finished"]
+        updates.append((bound, incumbent, float(elapsed)))
+    return updates
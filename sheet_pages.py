@@ -0,0 +1,123 @@
+import math
+import numpy as np
+import pandas as pd
+from read_data import read_sheet_cached, write_sheet_cached
+from sqlite_store import sheet_keys
+
+# Rows shown per page in the View/Edit Data tab
+PAGE_SIZE = 500
+
+# Column added to every page with the position of the row in the sheet, used to save edits back
+ROW_COLUMN = 'Row'
+
+
+def filter_rows(df, column=None, value=None):
+    """
+    Returns the positions of the rows of df whose column equals value, or of all rows without a filter.
+
+    The value is text as typed in the app. It is compared as a number with numeric columns and
+    as text otherwise, on the column itself so categorical key columns stay fast.
+    """
+    if not column or value is None or str(value) == '':
+        return np.arange(len(df))
+    values = df[column]
+    if pd.api.types.is_numeric_dtype(values.dtype):
+        target = pd.to_numeric(value, errors='coerce')
+        mask = values.to_numpy() == target if not pd.isna(target) else np.zeros(len(df), dtype=bool)
+    else:
+        mask = (values == str(value)).to_numpy()
+    return np.flatnonzero(mask)
+
+
+def sheet_page(filepath, sheet, page=1, page_size=PAGE_SIZE, filter_column=None, filter_value=None):
+    """
+    Returns one page of a sheet, after filtering its rows on the server.
+
+    The sheet is parsed once and cached until the dataset changes, see read_sheet_cached, so
+    moving between pages or filters does not read the file again.
+
+    Parameters:
+    filepath (str): Path to the dataset.
+    sheet (str): Name of the sheet.
+    page (int): Number of the page, starting at 1. Pages past the end show the last page.
+    page_size (int): Rows per page.
+    filter_column (str): Only show rows whose value in this column equals filter_value.
+    filter_value (str): Value to filter on.
+
+    Returns:
+    tuple:
+        - page (DataFrame): The rows of the page, with their position in the sheet in ROW_COLUMN first.
+        - page (int): Number of the page shown.
+        - num_rows (int): Rows after filtering.
+        - num_pages (int): Pages after filtering, at least 1.
+    """
+    df = read_sheet_cached(filepath, sheet)
+    rows = filter_rows(df, filter_column, filter_value)
+    num_pages = max(1, math.ceil(len(rows) / page_size))
+    page = min(max(int(page), 1), num_pages)
+    positions = rows[(page - 1) * page_size:page * page_size]
+
+    page_df = df.iloc[positions].reset_index(drop=True)
+    page_df.insert(0, ROW_COLUMN, positions)
+    return page_df, page, len(rows), num_pages
+
+
+def _edited_values(edited, current):
+    # Edited values in the dtype of the sheet column; the table of the app returns text for edited cells
+    if pd.api.types.is_numeric_dtype(current.dtype):
+        return pd.to_numeric(edited).to_numpy()
+    return edited.astype(object).to_numpy()
+
+
+def save_sheet_page(filepath, sheet, edited_page):
+    """
+    Saves an edited page of a sheet, writing only the rows whose values changed.
+
+    A SQLite store updates these rows in place. An Excel workbook or Parquet dataset can only
+    be written a sheet at a time, so the sheet is written once with the changes applied. The
+    saved sheet stays cached, so the next page is served without parsing the file again.
+
+    Parameters:
+    filepath (str): Path to the dataset.
+    sheet (str): Name of the sheet.
+    edited_page (DataFrame): A page returned by sheet_page, with the edits applied.
+
+    Returns:
+    int: The number of rows changed.
+
+    Raises:
+    ValueError: If the columns of the page are not the columns of the sheet.
+    """
+    df = read_sheet_cached(filepath, sheet)
+    columns = [column for column in edited_page.columns if column != ROW_COLUMN]
+    if columns != list(df.columns):
+        raise ValueError(f"The columns of the page do not match the columns of '{sheet}'")
+
+    positions = edited_page[ROW_COLUMN].to_numpy(dtype=np.int64)
+    current = df.iloc[positions]
+    changed = np.zeros(len(positions), dtype=bool)
+    new_values = {}
+    for column in columns:
+        new = _edited_values(edited_page[column], df[column])
+        old = current[column].astype(object).to_numpy() if new.dtype == object else current[column].to_numpy()
+        changed |= (new != old) & ~(pd.isna(new) & pd.isna(old))
+        new_values[column] = new
+    if not changed.any():
+        return 0
+
+    changed_rows = positions[changed]
+    updated = df.copy()
+    for column in columns:
+        values = new_values[column][changed]
+        if isinstance(updated[column].dtype, pd.CategoricalDtype):
+            categories = updated[column].cat.categories
+            updated[column] = updated[column].cat.add_categories(pd.unique(values[~pd.Index(values).isin(categories)]))
+        updated.iloc[changed_rows, updated.columns.get_loc(column)] = values
+
+    # Rows are only updated in place while their keys stay the same
+    keys = sheet_keys(sheet, columns)
+    same_keys = keys is not None and all(
+        np.array_equal(updated[key].iloc[changed_rows].astype(object).to_numpy(),
+                       df[key].iloc[changed_rows].astype(object).to_numpy()) for key in keys)
+    write_sheet_cached(filepath, sheet, updated, changed_rows if same_keys else None)
+    return len(changed_rows)
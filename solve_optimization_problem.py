@@ -1,14 +1,724 @@
 from pulp import *
+import numpy as np
 import pandas as pd
+import os
+import re
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from scipy import sparse
+from scipy.optimize import milp, linprog, LinearConstraint, Bounds
+from scipy.sparse.csgraph import connected_components
 from read_data import load_excel_data
-from create_optimization_problem import create_sourcing_problem
+from create_optimization_problem import create_sourcing_problem, sourcing_model_to_pulp, SourcingModel
+from presolve import presolve_sourcing_model, restore_solution, presolve_message
+from transportation_solver import solve_transportation_problem
+from run_report import model_statistics, parse_cbc_log, parse_cbc_progress
 
-def solve_sourcing_problem(prob, Warehouses, Products, Stock, Priority, Orders, Quantity, Variable):
+
+def find_independent_blocks(model):
+    """
+    Splits a SourcingModel into blocks that share no constraint.
+
+    Stock and order constraints only involve a single product, so every product is
+    at least one independent block.
+
+    Parameters:
+    model (SourcingModel): Array representation of the problem.
+
+    Returns:
+    list: One tuple (variables, stock_rows, order_rows) of index arrays per block.
+    """
+    A = sparse.vstack([model.A_ub, model.A_eq]).tocsr()
+    num_rows, num_variables = A.shape
+
+    # Connected components of the bipartite constraint/variable graph
+    graph = sparse.bmat([[None, A], [A.T, None]], format="csr")
+    num_blocks, labels = connected_components(graph, directed=False)
+    row_labels, variable_labels = labels[:num_rows], labels[num_rows:]
+
+    def group(labels):
+        # Indices grouped by component label, one array per label
+        order = np.argsort(labels, kind="stable")
+        return np.split(order, np.cumsum(np.bincount(labels, minlength=num_blocks))[:-1])
+
+    num_stock_rows = model.A_ub.shape[0]
+    rows_by_block = group(row_labels)
+    blocks = []
+    for variables, rows in zip(group(variable_labels), rows_by_block):
+        # Components without variables are constraint rows that no route touches
+        if len(variables):
+            blocks.append((variables, rows[rows < num_stock_rows], rows[rows >= num_stock_rows] - num_stock_rows))
+    return blocks
+
+
+def is_integral(values, tolerance=1e-6):
+    """
+    Checks that every value is within tolerance of an integer.
+    """
+    values = np.asarray(values, dtype=float)
+    return bool(np.all(np.abs(values - np.round(values)) <= tolerance))
+
+
+# Status of a solve stopped by its time limit with an integer solution, the best one found so far
+FEASIBLE_STATUS = "Feasible within budget"
+
+# Statuses that come with a solution to write and show
+SOLUTION_STATUSES = ("Optimal", FEASIBLE_STATUS)
+
+# PuLP status names of the scipy.optimize.milp and linprog status codes, so every engine
+# reports the same statuses. A time limit reached without a solution is "Not Solved", as with CBC.
+HIGHS_STATUS = {0: "Optimal", 1: "Not Solved", 2: "Infeasible", 3: "Unbounded", 4: "Undefined"}
+
+# Seconds between reads of the CBC log for progress updates. CBC writes its log in blocks,
+# so updates arrive when a block is written, each with the time CBC logged it at.
+CBC_LOG_INTERVAL = 0.5
+
+
+def relative_gap(bound, incumbent):
+    """
+    Returns the distance between the best bound and the incumbent objective relative to the
+    incumbent, 0 for a proven optimum, or None if either is unknown.
+    """
+    if bound is None or incumbent is None:
+        return None
+    return abs(bound - incumbent) / max(abs(incumbent), 1e-10)
+
+
+def progress_message(bound, incumbent, elapsed):
+    """
+    Describes a progress update of solve_sourcing_problem in one line.
+    """
+    gap = relative_gap(bound, incumbent)
+    return (f"Solver at {elapsed:.1f}s: incumbent {'-' if incumbent is None else f'{incumbent:.6g}'}, "
+            f"bound {'-' if bound is None else f'{bound:.6g}'}, gap {'-' if gap is None else f'{gap:.2%}'}")
+
+
+def print_progress(bound, incumbent, elapsed):
+    """
+    Progress callback of solve_sourcing_problem for command line runs, prints every update.
+    """
+    print(progress_message(bound, incumbent, elapsed), flush=True)
+
+
+def _rescaled(progress, sign=1, offset=0.0):
+    # Progress callback that passes sign * value + offset of the bound and incumbent on to progress
+    if progress is None:
+        return None
+
+    def rescaled(bound, incumbent, elapsed):
+        progress(None if bound is None else sign * bound + offset,
+                 None if incumbent is None else sign * incumbent + offset, elapsed)
+    return rescaled
+
+
+def cbc_options(time_limit=None, threads=None, gap_rel=None):
+    """
+    Returns the arguments of PULP_CBC_CMD for the solver options of solve_sourcing_problem,
+    leaving out the options that are not set.
+    """
+    options = {"timeLimit": None if time_limit is None else max(time_limit, 1),
+               "threads": threads, "gapRel": gap_rel}
+    return {key: value for key, value in options.items() if value is not None}
+
+
+def _remaining_time(time_limit, started, minimum=0):
+    # Seconds left of a time limit counted from started, None without a limit
+    if time_limit is None:
+        return None
+    return max(time_limit - (time.perf_counter() - started), minimum)
+
+
+def solve_highs(c, A_ub, b_ub, A_eq, b_eq, mip=True, time_limit=None, gap_rel=None):
+    """
+    Solves a sourcing problem in array form with HiGHS, through scipy.optimize.milp or, if mip is
+    False, as a continuous LP through scipy.optimize.linprog.
+
+    The sparse constraint matrices are passed to HiGHS as they are, no PuLP problem or model
+    file is built. The objective c is maximized, every variable is a non-negative integer.
+
+    Parameters:
+    c, A_ub, b_ub, A_eq, b_eq: Objective and constraints, see SourcingModel.
+    mip (bool): Keep the variables integer.
+    time_limit (float): Seconds HiGHS may spend, it returns the best solution found so far when reached.
+    gap_rel (float): Relative MIP gap at which HiGHS stops.
+
+    Returns:
+    tuple: The status string, the array of variable values and the solver statistics.
+    """
+    if len(c) == 0:
+        # HiGHS refuses an empty problem; without routes it is solved only if nothing is ordered
+        return ("Optimal" if not np.any(b_eq) else "Infeasible"), np.zeros(0), {}
+
+    options = {key: value for key, value in [("time_limit", time_limit), ("mip_rel_gap", gap_rel)]
+               if value is not None}
+    if mip:
+        result = milp(-c, integrality=np.ones(len(c)), bounds=Bounds(0, np.inf),
+                      constraints=[LinearConstraint(A_ub, -np.inf, b_ub), LinearConstraint(A_eq, b_eq, b_eq)],
+                      options=options)
+        stats = {"Nodes": int(result.mip_node_count)} if result.mip_node_count is not None else {}
+        if result.mip_dual_bound is not None and np.isfinite(result.mip_dual_bound):
+            # HiGHS minimizes -c, so its dual bound is the negated bound of the objective
+            stats["Bound"] = -float(result.mip_dual_bound)
+    else:
+        options.pop("mip_rel_gap", None)
+        result = linprog(-c, A_ub=A_ub, b_ub=b_ub, A_eq=A_eq, b_eq=b_eq, bounds=(0, None), method="highs",
+                         options=options)
+        stats = {"Iterations": int(result.nit)}
+    status = HIGHS_STATUS.get(result.status, "Undefined")
+    if status == "Not Solved" and mip and result.x is not None:
+        status = FEASIBLE_STATUS
+    x = result.x if result.x is not None else np.zeros(len(c))
+    return status, x, stats
+
+
+def solve_highs_lp_relaxation(c, A_ub, b_ub, A_eq, b_eq, time_limit=None, gap_rel=None):
+    """
+    Solves a sourcing problem in array form as an LP with HiGHS and falls back to the MIP if the
+    LP solution is not integral, see solve_lp_relaxation. time_limit covers both solves.
+
+    Returns:
+    tuple: The status string, the array of variable values, the path used and the solver statistics.
+    """
+    started = time.perf_counter()
+    status, x, stats = solve_highs(c, A_ub, b_ub, A_eq, b_eq, mip=False, time_limit=time_limit)
+    if status == "Optimal" and is_integral(x):
+        return status, np.round(x), "LP relaxation", stats
+    status, x, mip_stats = solve_highs(c, A_ub, b_ub, A_eq, b_eq, time_limit=_remaining_time(time_limit, started),
+                                       gap_rel=gap_rel)
+    return status, x, "MIP", {**stats, **mip_stats}
+
+
+class SolveStopped(Exception):
+    """
+    Raised by a CBC solve that was terminated because its stop function returned True.
+    """
+
+
+class StoppableCbc(PULP_CBC_CMD):
+    """
+    PULP_CBC_CMD that starts CBC itself, so its process can be terminated from another thread with stop().
+
+    The problem is written with LpProblem.writeMPS and the solution read back with readsol_MPS,
+    as PULP_CBC_CMD does. CBC's output goes to the logPath option. Supports the options used
+    by solve_cbc: mip, warmStart, timeLimit, threads, gapRel and logPath.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.process = None
+        self.stopped = False
+        self._lock = threading.Lock()
+
+    def stop(self):
+        """
+        Terminates the CBC process, or keeps it from starting.
+        """
+        with self._lock:
+            self.stopped = True
+            if self.process is not None:
+                self.process.terminate()
+
+    def actualSolve(self, lp):
+        """
+        Solves lp with CBC and assigns the solution to it.
+
+        Raises:
+        SolveStopped: If stop was called before CBC finished.
+        PulpSolverError: If CBC failed.
+        """
+        tmp_mps, tmp_sol, tmp_mst = self.create_tmp_files(lp.name, "mps", "sol", "mst")
+        variables, variable_names, constraint_names, _ = lp.writeMPS(tmp_mps, rename=1)
+        args = [self.path, tmp_mps]
+        if lp.sense == LpMaximize:
+            args.append("-max")
+        if self.optionsDict.get("warmStart", False):
+            self.writesol(tmp_mst, lp, variables, variable_names, constraint_names)
+            args += ["-mips", tmp_mst]
+        if self.timeLimit is not None:
+            args += ["-sec", str(self.timeLimit)]
+        for option in self.options + self.getOptions():
+            args += f"-{option}".split()
+        args += ["-branch" if self.mip else "-initialSolve", "-printingOptions", "all", "-solution", tmp_sol]
+
+        with open(self.optionsDict.get("logPath") or os.devnull, "w") as log:
+            with self._lock:
+                if not self.stopped:
+                    self.process = subprocess.Popen(args, stdout=log, stderr=log, stdin=subprocess.DEVNULL)
+            returncode = self.process.wait() if self.process is not None else None
+        try:
+            if self.stopped:
+                raise SolveStopped("The CBC solve was stopped")
+            if returncode != 0 or not os.path.exists(tmp_sol):
+                raise PulpSolverError(f"CBC failed with exit code {returncode}, see its log")
+            status, values, reduced_costs, shadow_prices, slacks, sol_status = self.readsol_MPS(
+                tmp_sol, lp, variables, variable_names, constraint_names)
+        finally:
+            self.delete_tmp_files(tmp_mps, tmp_sol, tmp_mst)
+        lp.assignVarsVals(values)
+        lp.assignVarsDj(reduced_costs)
+        lp.assignConsPi(shadow_prices)
+        lp.assignConsSlack(slacks, activity=True)
+        lp.assignStatus(status, sol_status)
+        return status
+
+
+def _read_log(log_path):
+    # Text of a log file, empty if it was not created
+    if not os.path.exists(log_path):
+        return ""
+    with open(log_path) as f:
+        return f.read()
+
+
+def _follow_cbc_log(log_path, sign, progress, done, stop=None, solver=None, interval=CBC_LOG_INTERVAL):
+    # Passes the progress lines CBC adds to its log to progress until done is set, with the
+    # objective in the sense of the problem, and stops the solver once stop returns True
+    reported = 0
+    while True:
+        finished = done.wait(interval)
+        if stop is not None and not solver.stopped and stop():
+            solver.stop()
+        if progress is None:
+            if finished:
+                return
+            continue
+        text = _read_log(log_path)
+        # Only complete lines, the last one may still be written
+        updates = parse_cbc_progress(text[:text.rfind("\n") + 1])
+        for bound, incumbent, elapsed in updates[reported:]:
+            progress(None if bound is None else sign * bound, None if incumbent is None else sign * incumbent,
+                     elapsed)
+        reported = len(updates)
+        if finished:
+            return
+
+
+def solve_cbc(prob, msg=True, progress=None, stop=None, **options):
+    """
+    Solves a PuLP problem with CBC and adds the simplex iterations and branch-and-bound nodes
+    of the run to prob.solver_stats.
+
+    The CBC log is written to a temporary file to read the statistics and printed if msg is True.
+    The best bound CBC proved is kept in prob.solver_bound, None if it logged none.
+
+    Parameters:
+    prob (LpProblem): The problem to solve.
+    msg (bool): Print the CBC log.
+    progress (function): Called as progress(bound, incumbent, elapsed) for every incumbent and
+        bound CBC logs while it runs, read from its log in a separate thread. Either may be None.
+    stop (function): Called without arguments from the same thread while CBC runs; once it returns
+        True the CBC process is terminated.
+    options: Further arguments of PULP_CBC_CMD, e.g. mip or warmStart.
+
+    Raises:
+    SolveStopped: If stop returned True before CBC finished.
+    """
+    # CBC logs the minimization of the negated objective of a maximization problem
+    sign = -1 if prob.sense == LpMaximize else 1
+    with tempfile.TemporaryDirectory() as folder:
+        log_path = os.path.join(folder, "cbc.log")
+        done = threading.Event()
+        solver = StoppableCbc(msg=False, logPath=log_path, **options)
+        solver.tmpDir = folder
+        watcher = None
+        if progress is not None or stop is not None:
+            watcher = threading.Thread(target=_follow_cbc_log, args=(log_path, sign, progress, done, stop, solver),
+                                       daemon=True)
+            watcher.start()
+        try:
+            prob.solve(solver)
+        finally:
+            done.set()
+            if watcher is not None:
+                watcher.join()
+            log = _read_log(log_path)
+            if msg:
+                print(log)
+
+    if prob.status == LpStatusInfeasible and _cbc_timed_out(log, options.get("timeLimit")):
+        prob.status = LpStatusNotSolved
+    if not hasattr(prob, "solver_stats"):
+        prob.solver_stats = {}
+    for key, value in parse_cbc_log(log).items():
+        prob.solver_stats[key] = prob.solver_stats.get(key, 0) + value
+    updates = parse_cbc_progress(log)
+    prob.solver_bound = sign * updates[-1][0] if updates and updates[-1][0] is not None else None
+
+
+def _cbc_timed_out(log, time_limit):
+    # True if CBC stopped at its time limit. Stopped before a solution, or with its preprocessing
+    # cut short, it reports the problem as infeasible without having proven it.
+    if "Result - Stopped on time limit" in log:
+        return True
+    wall_time = re.search(r"Total time \(CPU seconds\):\s+\S+\s+\(Wallclock seconds\):\s+(\S+)", log)
+    return time_limit is not None and wall_time is not None and float(wall_time.group(1)) >= time_limit
+
+
+def cbc_status(prob):
+    """
+    Returns the status of the last CBC solve of a PuLP problem, FEASIBLE_STATUS when CBC stopped
+    at its time limit with an integer solution, which PuLP reports as "Optimal" or "Not Solved".
+    """
+    if prob.sol_status == LpSolutionIntegerFeasible:
+        return FEASIBLE_STATUS
+    return LpStatus[prob.status]
+
+
+def solve_warm_started(prob, msg=True, progress=None, stop=None, **options):
+    """
+    Solves a PuLP problem with CBC, starting the MIP search from the current variable values.
+
+    CBC can stop at a worse solution than the optimum when given a start for a maximization
+    problem, so the equivalent minimization problem is solved instead. Progress and the bound
+    are still reported for the objective of prob. Further options are passed to solve_cbc.
+    """
+    objective, sense = prob.objective, prob.sense
+    flipped = sense == LpMaximize
+    if flipped:
+        prob.sense, prob.objective = LpMinimize, -objective
+        progress = _rescaled(progress, sign=-1)
+    try:
+        solve_cbc(prob, msg=msg, progress=progress, stop=stop, warmStart=True, **options)
+    finally:
+        prob.sense, prob.objective = sense, objective
+    if flipped and prob.solver_bound is not None:
+        prob.solver_bound = -prob.solver_bound
+
+
+def solve_lp_relaxation(prob, variables, msg=True, warm_start=False, progress=None, stop=None, **options):
+    """
+    Solves a PuLP problem as a continuous LP and falls back to the MIP if the LP solution is not integral.
+
+    The stock and order constraints of the sourcing problem have integral vertex solutions
+    whenever stock and order quantities are integers, so the LP relaxation is normally
+    enough and the branch-and-bound of the MIP is skipped. progress is only passed to the MIP
+    solve, and stop and further options to both solves, see solve_cbc. The timeLimit option
+    covers both solves, the MIP gets what the LP left of it but at least one second.
+
+    Returns:
+    str: The path used, "LP relaxation" or "MIP".
+    """
+    started = time.perf_counter()
+    solve_cbc(prob, msg=msg, stop=stop, mip=False, **options)
+    values = [var.varValue or 0 for var in variables]
+    if LpStatus[prob.status] == "Optimal" and is_integral(values):
+        for var, value in zip(variables, values):
+            var.varValue = round(value)
+        return "LP relaxation"
+
+    if "timeLimit" in options:
+        options["timeLimit"] = _remaining_time(options["timeLimit"], started, minimum=1)
+    if warm_start:
+        solve_warm_started(prob, msg=msg, progress=progress, stop=stop, **options)
+    else:
+        solve_cbc(prob, msg=msg, progress=progress, stop=stop, **options)
+    return "MIP"
+
+
+def _block_problem(c, A_ub, b_ub, A_eq, b_eq):
+    # PuLP problem for one block of the sourcing problem
+    variables = [LpVariable(f"x{j}", 0, None, LpInteger) for j in range(len(c))]
+    prob = LpProblem("Sourcing_Block", LpMaximize)
+    prob += LpAffineExpression(zip(variables, c.tolist()))
+    for A, b, sense in [(A_ub, b_ub, LpConstraintLE), (A_eq, b_eq, LpConstraintEQ)]:
+        for row in range(A.shape[0]):
+            columns = A.indices[A.indptr[row]:A.indptr[row + 1]]
+            prob += LpConstraint(LpAffineExpression([(variables[j], 1) for j in columns]), sense, None, b[row])
+    return prob, variables
+
+
+def solve_block_cbc(c, A_ub, b_ub, A_eq, b_eq):
+    """
+    Solves one block of the sourcing problem with CBC.
+
+    Returns:
+    tuple: The status string, the array of variable values and the path used.
+    """
+    prob, variables = _block_problem(c, A_ub, b_ub, A_eq, b_eq)
+    prob.solve(PULP_CBC_CMD(msg=False))
+    return LpStatus[prob.status], np.array([var.varValue or 0 for var in variables]), "MIP"
+
+
+def solve_block_lp(c, A_ub, b_ub, A_eq, b_eq):
+    """
+    Solves one block of the sourcing problem as an LP relaxation with CBC, falling back to the MIP.
+
+    Returns:
+    tuple: The status string, the array of variable values and the path used.
+    """
+    prob, variables = _block_problem(c, A_ub, b_ub, A_eq, b_eq)
+    path = solve_lp_relaxation(prob, variables, msg=False)
+    return LpStatus[prob.status], np.array([var.varValue or 0 for var in variables]), path
+
+
+def solve_block_highs(c, A_ub, b_ub, A_eq, b_eq):
+    """
+    Solves one block of the sourcing problem with HiGHS through scipy.optimize.milp.
+
+    Returns:
+    tuple: The status string, the array of variable values and the path used.
+    """
+    status, x, _ = solve_highs(c, A_ub, b_ub, A_eq, b_eq)
+    return status, x, "MIP"
+
+
+def solve_block_highs_lp(c, A_ub, b_ub, A_eq, b_eq):
+    """
+    Solves one block of the sourcing problem as an LP relaxation with HiGHS, falling back to the MIP.
+
+    Returns:
+    tuple: The status string, the array of variable values and the path used.
+    """
+    status, x, path, _ = solve_highs_lp_relaxation(c, A_ub, b_ub, A_eq, b_eq)
+    return status, x, path
+
+
+def solve_block_flow(c, A_ub, b_ub, A_eq, b_eq):
+    """
+    Solves one block of the sourcing problem as a transportation problem.
+
+    Every route appears in exactly one stock constraint and one order constraint, so the
+    block is a network from warehouses to orders that the successive shortest path
+    algorithm solves without branch-and-bound.
+
+    Returns:
+    tuple: The status string, the array of variable values and the path used.
+    """
+    tails = A_ub.tocsc().indices
+    heads = A_eq.tocsc().indices
+    status, flow = solve_transportation_problem(tails, heads, -c, b_ub, b_eq)
+    return status, flow, "Transportation"
+
+
+# Solvers available for the blocks of a decomposed model
+BLOCK_SOLVERS = {
+    "cbc": solve_block_cbc,
+    "lp": solve_block_lp,
+    "flow": solve_block_flow,
+    "highs": solve_block_highs,
+    "highs-lp": solve_block_highs_lp,
+}
+
+
+def _solve_block(args):
+    block_solver, c, A_ub, b_ub, A_eq, b_eq = args
+    return block_solver(c, A_ub, b_ub, A_eq, b_eq)
+
+
+def solve_sourcing_model_decomposed(model, block_solver=solve_block_cbc, processes=None):
+    """
+    Solves a SourcingModel block by block in a process pool.
+
+    Parameters:
+    model (SourcingModel): Array representation of the problem.
+    block_solver (function): Solver called as block_solver(c, A_ub, b_ub, A_eq, b_eq) for every block,
+        returning the status, the variable values and the path used.
+    processes (int): Number of worker processes, defaults to the number of CPUs. With 1 the blocks are solved in this process.
+
+    Returns:
+    tuple: The status string, the array of variable values of the whole model and
+    a dictionary with the number of blocks solved by each path.
+    """
+    # An order line that no route can serve makes the whole problem infeasible
+    served = np.diff(model.A_eq.indptr) > 0
+    if np.any(model.b_eq[~served] != 0):
+        return "Infeasible", np.zeros(model.num_variables), {}
+
+    blocks = find_independent_blocks(model)
+    tasks = [(block_solver, model.c[variables],
+              model.A_ub[stock_rows][:, variables], model.b_ub[stock_rows],
+              model.A_eq[order_rows][:, variables], model.b_eq[order_rows])
+             for variables, stock_rows, order_rows in blocks]
+
+    processes = processes or os.cpu_count()
+    if processes == 1:
+        results = [_solve_block(task) for task in tasks]
+    else:
+        chunksize = max(1, len(tasks) // (4 * processes))
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            results = list(executor.map(_solve_block, tasks, chunksize=chunksize))
+
+    x = np.zeros(model.num_variables)
+    status = "Optimal"
+    paths = {}
+    for (variables, _, _), (block_status, values, path) in zip(blocks, results):
+        x[variables] = values
+        paths[path] = paths.get(path, 0) + 1
+        if block_status != "Optimal" and status == "Optimal":
+            status = block_status
+    return status, x, paths
+
+
+def solution_frames(model, x, nonzero_only=False):
+    """
+    Builds the fulfillment_solution and warehouse_stock_status DataFrames from an array of variable values.
+
+    Parameters:
+    model (SourcingModel): Array representation of the problem.
+    x (ndarray): Value of every variable of the model.
+    nonzero_only (bool): Only include the shipments with a non-zero quantity in fulfillment_solution.
+
+    Returns:
+    tuple: fulfillment_solution and warehouse_stock_status, rows ordered by warehouse, product and then order.
+    """
+    num_warehouses, num_orders, num_products = model.shape
+    warehouses = np.array(model.warehouses, dtype=object)
+    orders = np.array(model.orders, dtype=object)
+    products = np.array(model.products, dtype=object)
+
+    if nonzero_only:
+        shipped = np.flatnonzero(x)
+        shipped = shipped[np.lexsort((model.var_o[shipped], model.var_p[shipped], model.var_w[shipped]))]
+        w, p, o = model.var_w[shipped], model.var_p[shipped], model.var_o[shipped]
+        quantity = x[shipped]
+    else:
+        supply = np.zeros(model.shape)
+        supply[model.var_w, model.var_o, model.var_p] = x
+        w, p, o = (index.ravel() for index in np.indices((num_warehouses, num_products, num_orders)))
+        quantity = supply.transpose(0, 2, 1).ravel()
+
+    fulfillment_solution = pd.DataFrame({
+        "Warehouse": warehouses[w],
+        "Product": products[p],
+        "Order": orders[o],
+        "Supply Quantity": quantity
+    })
+
+    # Supplied stock is the sum over the orders of every (warehouse, product)
+    supplied = np.bincount(model.var_w * num_products + model.var_p, weights=x,
+                           minlength=num_warehouses * num_products)
+    w, p = (index.ravel() for index in np.indices((num_warehouses, num_products)))
+    warehouse_stock_status = pd.DataFrame({
+        "Warehouse": warehouses[w],
+        "Product": products[p],
+        "Initial Stock": model.stock.ravel(),
+        "Supplied Stock": supplied,
+        "Remaining Stock": model.stock.ravel() - supplied
+    })
+    return fulfillment_solution, warehouse_stock_status
+
+
+def _cbc_result(prob, path):
+    # Status, variable values in the order of the model (read in a single pass), path and statistics
+    x = np.array([var.varValue or 0 for var in prob.sourcing_variables])
+    stats = dict(prob.solver_stats)
+    if prob.solver_bound is not None:
+        stats["Bound"] = prob.solver_bound
+    return cbc_status(prob), x, path, stats
+
+
+def solve_backend_cbc(prob, model, warm_start=False, progress=None, stop=None, **options):
+    """
+    Solves the PuLP problem of a model as a MIP with CBC, PuLP's default solver.
+
+    Returns:
+    tuple: The status, the value of every variable of model, the path used and the solver statistics.
+    """
+    prob.solver_stats = {}
+    if warm_start:
+        solve_warm_started(prob, progress=progress, stop=stop, **cbc_options(**options))
+    else:
+        solve_cbc(prob, progress=progress, stop=stop, **cbc_options(**options))
+    return _cbc_result(prob, "MIP")
+
+
+def solve_backend_lp(prob, model, warm_start=False, progress=None, stop=None, **options):
+    """
+    Solves the PuLP problem of a model as an LP relaxation with CBC, falling back to the MIP.
+
+    Returns:
+    tuple: The status, the value of every variable of model, the path used and the solver statistics.
+    """
+    prob.solver_stats = {}
+    path = solve_lp_relaxation(prob, prob.variables(), warm_start=warm_start, progress=progress, stop=stop,
+                               **cbc_options(**options))
+    return _cbc_result(prob, path)
+
+
+def _keep_solution(prob, x):
+    # Variable values on the PuLP problem, if there is one, so a later CBC warm start can use them
+    if prob is not None:
+        for var, value in zip(prob.sourcing_variables, x.tolist()):
+            var.varValue = value
+
+
+def solve_backend_highs(prob, model, warm_start=False, progress=None, time_limit=None, threads=None, gap_rel=None,
+                        stop=None):
+    """
+    Solves a model as a MIP with HiGHS through scipy.optimize.milp, from its sparse arrays.
+
+    HiGHS does not take a starting solution, report progress or stop early through SciPy, so
+    warm_start, progress and stop are not used, and SciPy runs it on one thread; use decompose
+    to solve the products on several processes instead.
+
+    Returns:
+    tuple: The status, the value of every variable of model, the path used and the solver statistics.
+    """
+    status, x, stats = solve_highs(model.c, model.A_ub, model.b_ub, model.A_eq, model.b_eq,
+                                   time_limit=time_limit, gap_rel=gap_rel)
+    _keep_solution(prob, x)
+    return status, x, "MIP", stats
+
+
+def solve_backend_highs_lp(prob, model, warm_start=False, progress=None, time_limit=None, threads=None,
+                           gap_rel=None, stop=None):
+    """
+    Solves a model as an LP relaxation with HiGHS through scipy.optimize.linprog, falling back to
+    scipy.optimize.milp if the solution is not integral. See solve_backend_highs for the options.
+
+    Returns:
+    tuple: The status, the value of every variable of model, the path used and the solver statistics.
+    """
+    status, x, path, stats = solve_highs_lp_relaxation(model.c, model.A_ub, model.b_ub, model.A_eq, model.b_eq,
+                                                       time_limit=time_limit, gap_rel=gap_rel)
+    _keep_solution(prob, x)
+    return status, x, path, stats
+
+
+# Engines that solve the whole problem at once, called as backend(prob, model, warm_start, progress=,
+# time_limit=, threads=, gap_rel=, stop=). The flow engine only works product by product, see BLOCK_SOLVERS.
+SOLVER_BACKENDS = {
+    "cbc": solve_backend_cbc,
+    "lp": solve_backend_lp,
+    "highs": solve_backend_highs,
+    "highs-lp": solve_backend_highs_lp,
+}
+
+# Engines that solve the PuLP problem, the others only need the SourcingModel
+PULP_ENGINES = ("cbc", "lp")
+
+
+def _solve_prob(prob, model, engine, decompose, processes, warm_start, **options):
+    """
+    Solves a sourcing problem with the chosen engine. The solver options (progress, time_limit,
+    threads, gap_rel and stop) are not used by the flow engine and the decomposed solve.
+
+    Returns:
+    tuple: The status, the value of every variable of model, the path used and the solver statistics.
+    """
+    if decompose or engine == "flow":
+        # The flow engine always works product by product, in this process unless decompose is set
+        status, x, paths = solve_sourcing_model_decomposed(model, BLOCK_SOLVERS[engine],
+                                                           processes=processes if decompose else 1)
+        return status, x, paths, {"Blocks": sum(paths.values())}
+    return SOLVER_BACKENDS[engine](prob, model, warm_start, **options)
+
+
+def solve_sourcing_problem(prob, Warehouses=None, Products=None, Stock=None, Priority=None, Orders=None,
+                           Quantity=None, Variable=None, engine="cbc", decompose=False, processes=None, warm_start=False, nonzero_only=False,
+                           presolve=False, report=None, time_limit=None, threads=None, gap_rel=None, progress=None,
+                           stop=None):
     """
     Solves the sourcing optimization problem using PuLP.
 
     Parameters:
-    prob (LpProblem): The linear programming problem instance.
+    prob (LpProblem or SourcingModel): The linear programming problem instance, or the model of
+        create_sourcing_model. The PuLP problem of a model is only built for the cbc and lp engines
+        (in a "Model Building" phase), the other arguments up to Variable are then not needed.
     Warehouses (list): List of warehouse names.
     Products (list): List of product names.
     Stock (dict): Dictionary containing initial stock levels for each warehouse and product.
@@ -16,57 +726,133 @@ def solve_sourcing_problem(prob, Warehouses, Products, Stock, Priority, Orders,
     Orders (list): List of order identifiers.
     Quantity (dict): Dictionary of order quantities for each product.
     Variable (dict): Dictionary of PuLP variables representing the decision variables.
+    engine (str): "cbc" to solve the MIP with CBC, "lp" to solve the LP relaxation with CBC and fall back
+        to the MIP only if the solution is not integral, "highs" and "highs-lp" to do the same with
+        HiGHS from the sparse model through SciPy, or "flow" to solve every product with the built-in
+        transportation solver. Every engine reports the same statuses and DataFrames.
+    decompose (bool): Solve every product as an independent problem in a process pool.
+    processes (int): Number of worker processes used when decompose is True, defaults to the number of CPUs.
+    warm_start (bool): Start CBC's MIP search from the current variable values, e.g. the solution of the
+        previous solve after update_sourcing_weights changed the objective. Not used with presolve.
+    nonzero_only (bool): Only include the shipments with a non-zero quantity in fulfillment_solution.
+    presolve (bool): Run presolve_sourcing_model first. Infeasible problems are then reported without
+        calling a solver, and only the reduced problem is solved otherwise.
+
+    report (RunReport): Records the presolve, solve and result extraction phases and the model and
+        solver statistics when given.
+    time_limit (float): Seconds the solver may spend on the solve, for an anytime solve. CBC and HiGHS
+        stop with the best solution found so far (the incumbent) when the limit is reached, which is
+        reported as FEASIBLE_STATUS, or "Not Solved" if they found none. Not used by the flow engine
+        and the decomposed solve.
+    threads (int): Threads CBC may use. Not used by the other engines.
+    gap_rel (float): Relative MIP gap at which CBC or HiGHS stops with the best solution found,
+        e.g. 0.01 for 1%. Not used by the flow engine and the decomposed solve.
+    progress (function): Called as progress(bound, incumbent, elapsed) with the best bound, the
+        objective of the incumbent (either may be None) and the seconds since the solve started,
+        every time CBC logs a new incumbent or bound, and once more with the final solution.
+        The other engines only report the final solution.
+    stop (function): Called without arguments every CBC_LOG_INTERVAL seconds while CBC runs, e.g. to
+        cancel a run; once it returns True CBC is terminated and SolveStopped is raised. Not used
+        by the other engines, which run to their time limit.
+
+    The path used to solve the problem is printed and stored in solve_info on the model and on
+    the PuLP problem if there is one, together with the objective of the solution, the best bound,
+    their relative gap (0 for a proven optimum, None without a solution) and the presolve report
+    if presolve is True.
 
     Returns:
     tuple: A tuple containing a string and two DataFrames:
-        - LpStatus[prob.status] (str): The status of the solution.
+        - status (str): The status of the solution, "Optimal", FEASIBLE_STATUS when the time limit
+          stopped the solver with a solution, or a PuLP status without a solution, e.g. "Infeasible".
         - fulfillment_solution: Contains details of supply quantities for each order from each warehouse.
         - warehouse_stock_status: Contains initial stock, supplied stock, and remaining stock levels.
+
+    Raises:
+    SolveStopped: If stop returned True before CBC finished.
     """
-    
-    # The problem is solved using PuLP's choice of Solver
-    prob.solve()
+    if engine not in BLOCK_SOLVERS:
+        raise ValueError(f"Unknown engine '{engine}', choose one of {', '.join(BLOCK_SOLVERS)}")
+    if isinstance(prob, SourcingModel):
+        model, prob = prob, prob.pulp_problem
+    else:
+        model = prob.sourcing_model
+    options = {"progress": progress, "time_limit": time_limit, "threads": threads, "gap_rel": gap_rel, "stop": stop}
+    phase = report.phase if report is not None else (lambda name: nullcontext())
+    if prob is None and engine in PULP_ENGINES and not decompose and not presolve:
+        with phase("Model Building"):
+            prob = sourcing_model_to_pulp(model)[0]
+    solve_info = {"engine": engine}
+    model.solve_info = solve_info
+    if prob is not None:
+        prob.solve_info = solve_info
+    solver_stats = {}
+    started = time.perf_counter()
 
-    # The status of the solution is printed to the screen
-    print("***** Solution Status *****")
-    print("Status:", LpStatus[prob.status])
+    if presolve:
+        with phase("Presolve"):
+            reduced, kept, fixed, presolve_report = presolve_sourcing_model(model)
+        solve_info["presolve"] = presolve_report
+        print("***** Presolve *****")
+        print(f"Variables: {model.num_variables} -> {reduced.num_variables}, "
+              f"fixed {presolve_report['fixed_variables']}, removed {presolve_report['removed_variables']}")
 
+        if not presolve_report["feasible"]:
+            status, x, path = "Infeasible", fixed, "Presolve"
+            print(presolve_message(presolve_report))
+        elif reduced.num_variables == 0:
+            # Every route was fixed, nothing is left to solve
+            status, x, path = "Optimal", fixed, "Presolve"
+        else:
+            # Objective of the fixed routes, which the reduced problem leaves out of its incumbents and bounds
+            offset = float(model.c @ restore_solution(kept, fixed, np.zeros(reduced.num_variables)))
+            reduced_options = {**options, "progress": _rescaled(progress, offset=offset)}
+            with phase("Solve"):
+                reduced_prob = None if decompose or engine not in PULP_ENGINES else sourcing_model_to_pulp(reduced)[0]
+                status, x_reduced, path, solver_stats = _solve_prob(reduced_prob, reduced, engine, decompose,
+                                                                    processes, False, **reduced_options)
+            x = restore_solution(kept, fixed, x_reduced)
+            if "Bound" in solver_stats:
+                solver_stats["Bound"] += offset
 
-    # Fulfillment Solution
-    fulfillment_solution = []
-    for w in Warehouses:
-        for p in Products:
-            for o in Orders:
-                fulfillment_solution.append({
-                    "Warehouse": w,
-                    "Product": p,
-                    "Order": o,
-                    "Supply Quantity": Variable[w][o][p].varValue
-                })
-    fulfillment_solution = pd.DataFrame(fulfillment_solution)
+        # Keep the solution on the full problem so a later warm start can use it
+        _keep_solution(prob, x)
+    else:
+        with phase("Solve"):
+            status, x, path, solver_stats = _solve_prob(prob, model, engine, decompose, processes, warm_start,
+                                                          **options)
+    solve_info["path"] = path
 
-    # Stock Status
-    warehouse_stock_status = []
+    # Without a bound from the solver, an optimal solution is its own bound
+    objective = float(model.c @ x) if status in SOLUTION_STATUSES else None
+    bound = solver_stats.get("Bound", objective if status == "Optimal" else None)
+    gap = relative_gap(bound, objective)
+    solve_info.update({"objective": objective, "bound": bound, "gap": gap})
+    if progress is not None and objective is not None:
+        progress(bound, objective, time.perf_counter() - started)
 
-    for w in Warehouses:
-        for p in Products:
-            warehouse_stock_status.append({
-                "Warehouse": w,
-                "Product": p,
-                "Initial Stock": Stock[w][p],
-                "Supplied Stock": sum(Variable[w][o][p].varValue for o in Orders),
-                "Remaining Stock": Stock[w][p] - sum(Variable[w][o][p].varValue for o in Orders)
-            })
-    warehouse_stock_status = pd.DataFrame(warehouse_stock_status)
+    # The status of the solution is printed to the screen
+    print("***** Solution Status *****")
+    print("Status:", status)
+    print("Solved as:", path)
+    if gap is not None:
+        print(f"Objective: {objective:.6g}, gap: {gap:.2%}")
 
-    return LpStatus[prob.status], fulfillment_solution, warehouse_stock_status
+    with phase("Result Extraction"):
+        fulfillment_solution, warehouse_stock_status = solution_frames(model, x, nonzero_only)
 
+    if report is not None:
+        report.statistics.update(model_statistics(model))
+        if presolve:
+            report.statistics["Presolved Variables"] = reduced.num_variables
+        report.statistics.update({"Engine": engine, "Path": path, "Status": status}, **solver_stats)
+        report.statistics.update({"Objective": objective, "Gap": gap})
+    return status, fulfillment_solution, warehouse_stock_status
 
 
 if __name__ == "__main__":
     filepath = 'Intelligent_Sourcing.xlsx'  # Example file path
     weightage_dict, priority_df, warehouse_df, order_df, cost_df, distance_df, days_df,  = load_excel_data(filepath)
-    
+
     # Create LP Problem
     prob, Warehouses, Products, Stock, Priority, Orders, Quantity, Variable = create_sourcing_problem(weightage_dict, priority_df, warehouse_df, order_df, cost_df, distance_df, days_df)
     #print(prob.objective)
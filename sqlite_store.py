@@ -0,0 +1,196 @@
+import sqlite3
+from contextlib import closing
+import pandas as pd
+
+# Tables that are wide in the workbook (one column per product) but stored with one row per
+# (name, product), so a single stock level or order quantity is one indexed row.
+# Maps the sheet to its name column and the column of the stored value.
+LONG_TABLES = {
+    'Warehouse Data': ('Warehouse', 'Stock'),
+    'Order Data': ('Order', 'Quantity'),
+}
+
+# Key columns of every table, each covered by a unique index. The last two are the
+# result sheets of an optimization run, stored next to the input tables.
+KEYS = {
+    'Weightage': ['Variable'],
+    'Priority Data': ['Warehouse'],
+    'Warehouse Data': ['Warehouse', 'Product'],
+    'Order Data': ['Order', 'Product'],
+    'Cost Data': ['Warehouse', 'Order', 'Product'],
+    'Distance Data': ['Warehouse', 'Order', 'Product'],
+    'Days Data': ['Warehouse', 'Order', 'Product'],
+    'Fulfillment Solution': ['Warehouse', 'Order', 'Product'],
+    'Warehouse Stock Status': ['Warehouse', 'Product'],
+}
+
+
+def _keys(sheet, columns):
+    # Key columns of a table that it has, a factorized shipping sheet leaves out the order or product
+    keys = [key for key in KEYS.get(sheet, []) if key in columns]
+    return keys or None
+
+
+def _quote(name):
+    # Quoted SQL identifier, sheet and column names contain spaces and '#'
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _to_stored(sheet, df):
+    # Layout of a sheet in the database
+    if sheet not in LONG_TABLES:
+        return df
+    name, value = LONG_TABLES[sheet]
+    return df.melt(id_vars=name, var_name='Product', value_name=value)
+
+
+def _from_stored(sheet, df):
+    # Layout of a stored table in the workbook, rows and product columns in their stored order
+    if sheet not in LONG_TABLES:
+        return df
+    name, value = LONG_TABLES[sheet]
+    wide = df.pivot(index=name, columns='Product', values=value)
+    wide = wide.reindex(index=pd.unique(df[name]), columns=pd.unique(df['Product']))
+    wide.columns.name = None
+    return wide.rename_axis(name).reset_index()
+
+
+def _write_table(con, sheet, df):
+    # Replaces a table and indexes its key columns
+    stored = _to_stored(sheet, df)
+    stored = stored.astype({column: object for column in stored.columns
+                            if isinstance(stored[column].dtype, pd.CategoricalDtype)})
+    stored.to_sql(sheet, con, if_exists='replace', index=False)
+    keys = _keys(sheet, stored.columns)
+    if keys:
+        con.execute(f"CREATE UNIQUE INDEX {_quote('Key of ' + sheet)} ON {_quote(sheet)} "
+                    f"({', '.join(_quote(key) for key in keys)})")
+
+
+def _read_table(con, sheet):
+    return _from_stored(sheet, pd.read_sql_query(f"SELECT * FROM {_quote(sheet)} ORDER BY rowid", con))
+
+
+def table_names(filepath):
+    """
+    Returns the names of the tables in a dataset store.
+    """
+    with closing(sqlite3.connect(filepath)) as con:
+        names = [row[0] for row in con.execute("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY rowid")]
+    # Known tables in workbook order, whenever they were last replaced
+    return [sheet for sheet in KEYS if sheet in names] + [name for name in names if name not in KEYS]
+
+
+def save_sqlite_tables(filepath, tables):
+    """
+    Writes tables to a dataset store, replacing the tables of the same name.
+
+    Parameters:
+    filepath (str): Path to the SQLite file, created if needed.
+    tables (dict): DataFrame of every table, keyed by sheet name, in the layout of the workbook.
+    """
+    with closing(sqlite3.connect(filepath)) as con, con:
+        for sheet, df in tables.items():
+            _write_table(con, sheet, df)
+
+
+def load_sqlite_tables(filepath, sheets):
+    """
+    Reads tables from a dataset store in the layout of the workbook.
+
+    Parameters:
+    filepath (str): Path to the SQLite file.
+    sheets (list): Names of the tables to read.
+
+    Returns:
+    dict: DataFrame of every table, keyed by sheet name.
+    """
+    with closing(sqlite3.connect(filepath)) as con:
+        return {sheet: _read_table(con, sheet) for sheet in sheets}
+
+
+def update_rows(filepath, sheet, rows):
+    """
+    Updates single rows of a table through its key index, e.g. one stock level.
+
+    Parameters:
+    filepath (str): Path to the SQLite file.
+    sheet (str): Name of the table.
+    rows (DataFrame): Key columns of the rows to update and the new values, in the stored
+        layout, e.g. Warehouse, Product and Stock for 'Warehouse Data'.
+
+    Returns:
+    int: The number of rows updated.
+    """
+    keys = _keys(sheet, rows.columns)
+    values = [column for column in rows.columns if column not in keys]
+    statement = (f"UPDATE {_quote(sheet)} SET {', '.join(f'{_quote(c)} = ?' for c in values)} "
+                 f"WHERE {' AND '.join(f'{_quote(k)} = ?' for k in keys)}")
+    parameters = rows[values + keys].astype(object).itertuples(index=False, name=None)
+    with closing(sqlite3.connect(filepath)) as con, con:
+        return con.executemany(statement, parameters).rowcount
+
+
+def sheet_keys(sheet, columns):
+    """
+    Returns the key columns of a sheet with the given columns in the layout of the workbook, or
+    None if it has no keys.
+    """
+    if sheet in LONG_TABLES:
+        return [LONG_TABLES[sheet][0]]
+    return _keys(sheet, columns)
+
+
+def update_sheet_rows(filepath, sheet, df):
+    """
+    Updates rows of a table given in the layout of the workbook, e.g. the edited rows of a page.
+
+    Parameters:
+    filepath (str): Path to the SQLite file.
+    sheet (str): Name of the table.
+    df (DataFrame): Complete rows in the layout of the workbook, with unchanged key columns.
+
+    Returns:
+    int: The number of stored rows updated.
+    """
+    return update_rows(filepath, sheet, _to_stored(sheet, df))
+
+
+def update_table(filepath, sheet, df):
+    """
+    Stores an edited table, writing only the rows whose values changed.
+
+    The table is replaced instead when its columns or keys changed, e.g. when a product or
+    warehouse was added.
+
+    Parameters:
+    filepath (str): Path to the SQLite file.
+    sheet (str): Name of the table.
+    df (DataFrame): The edited table in the layout of the workbook.
+
+    Returns:
+    int: The number of rows written.
+    """
+    stored = _to_stored(sheet, df)
+    keys = _keys(sheet, stored.columns)
+    with closing(sqlite3.connect(filepath)) as con:
+        exists = con.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (sheet,)).fetchone()
+        current = pd.read_sql_query(f"SELECT * FROM {_quote(sheet)}", con) if exists else None
+
+    same_keys = (current is not None and keys is not None and list(current.columns) == list(stored.columns)
+                 and len(current) == len(stored)
+                 and current[keys].merge(stored[keys].astype(object), on=keys).shape[0] == len(stored))
+    if not same_keys:
+        with closing(sqlite3.connect(filepath)) as con, con:
+            _write_table(con, sheet, df)
+        return len(stored)
+
+    values = [column for column in stored.columns if column not in keys]
+    merged = stored.astype({key: object for key in keys}).merge(current, on=keys, suffixes=('', ' Stored'))
+    changed = pd.Series(False, index=merged.index)
+    for column in values:
+        new, old = merged[column], merged[f'{column} Stored']
+        changed |= (new != old) & ~(new.isna() & old.isna())
+    if not changed.any():
+        return 0
+    return update_rows(filepath, sheet, merged.loc[changed, keys + values])
@@ -0,0 +1,40 @@
+import os
+import sys
+import pandas as pd
+import pytest
+
+# The modules of the app live at the top of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_data(stock, quantity, cost=None):
+    """
+    Returns the tuple of load_excel_data for a small problem.
+
+    Parameters:
+    stock (list): Stock of every warehouse (rows) and product (columns).
+    quantity (list): Quantity of every order (rows) and product (columns).
+    cost (dict): Cost of some routes keyed by (warehouse, order, product) index, all routes cost 1 by default.
+    """
+    products = [f'Product#{p + 1}' for p in range(len(stock[0]))]
+    warehouses = [f'Warehouse#{w + 1}' for w in range(len(stock))]
+    orders = [f'Order#{o + 1}' for o in range(len(quantity))]
+    routes = [(w, o, p) for w in range(len(warehouses)) for o in range(len(orders)) for p in range(len(products))]
+    keys = {'Warehouse': [warehouses[w] for w, _, _ in routes], 'Order': [orders[o] for _, o, _ in routes],
+            'Product': [products[p] for _, _, p in routes]}
+    cost = cost or {}
+    return (
+        {'Cost': 1, 'Priority': 0.8, 'Distance': 0.6, 'Days': 0.4},
+        pd.DataFrame({'Warehouse': warehouses, 'Priority': range(1, len(warehouses) + 1)}),
+        pd.concat([pd.DataFrame({'Warehouse': warehouses}), pd.DataFrame(stock, columns=products)], axis=1),
+        pd.concat([pd.DataFrame({'Order': orders}), pd.DataFrame(quantity, columns=products)], axis=1),
+        pd.DataFrame({**keys, 'Cost': [cost.get(route, 1) for route in routes]}),
+        pd.DataFrame({**keys, 'Distance': [1 + sum(route) for route in routes]}),
+        pd.DataFrame({**keys, 'Days': [1 + route[0] for route in routes]}),
+    )
+
+
+@pytest.fixture
+def small_data():
+    # Two warehouses, two orders and two products that can all be served
+    return make_data(stock=[[5, 3], [4, 6]], quantity=[[3, 2], [4, 5]])
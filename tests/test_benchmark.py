@@ -0,0 +1,25 @@
+import pandas as pd
+import pytest
+from benchmark import compare_to_baseline, CONFIGURATION
+
+
+def results(engine, wall_time, time_limit=None):
+    configuration = dict.fromkeys(CONFIGURATION, False)
+    configuration.update({"Engine": engine, "Format": ".xlsx", "Time Limit": time_limit, "Threads": None,
+                          "Gap Limit": None})
+    return pd.DataFrame([{"Size": "4x2x10", **configuration, "Phase": "Solve", "Wall Time (s)": wall_time,
+                          "Peak RSS (MB)": 100.0}])
+
+
+def test_compare_only_matching_configuration(tmp_path):
+    # Settings read back from a CSV file match the settings of a run
+    results(engine="cbc", wall_time=1.0).to_csv(tmp_path / "baseline.csv", index=False)
+    baseline = pd.read_csv(tmp_path / "baseline.csv")
+
+    comparison = compare_to_baseline(results(engine="cbc", wall_time=2.0), baseline)
+    assert comparison.set_index("Measure").loc["Wall Time (s)", "Regression"]
+    assert compare_to_baseline(results(engine="highs", wall_time=2.0), baseline).empty
+    assert compare_to_baseline(results(engine="cbc", wall_time=2.0, time_limit=5.0), baseline).empty
+
+    with pytest.raises(ValueError, match="Engine"):
+        compare_to_baseline(results(engine="cbc", wall_time=2.0), baseline.drop(columns="Engine"))
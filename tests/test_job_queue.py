@@ -0,0 +1,36 @@
+import time
+import numpy as np
+from pulp import LpInteger, LpMaximize, LpProblem, LpVariable, lpSum
+from job_queue import JobQueue
+from solve_optimization_problem import solve_cbc, SolveStopped
+
+
+def knapsack_problem(items=150, constraints=40, seed=1):
+    # A multi-dimensional knapsack that takes CBC far longer than the test waits
+    rng = np.random.default_rng(seed)
+    x = [LpVariable(f"x{i}", 0, 1, LpInteger) for i in range(items)]
+    prob = LpProblem("Knapsack", LpMaximize)
+    prob += lpSum(int(v) * var for v, var in zip(rng.integers(10, 100, items), x))
+    for _ in range(constraints):
+        weights = rng.integers(5, 60, items)
+        prob += lpSum(int(w) * var for w, var in zip(weights, x)) <= int(weights.sum() * 0.3)
+    return prob
+
+
+def test_cancel_during_solve():
+    def run(job):
+        try:
+            solve_cbc(knapsack_problem(), msg=False, stop=lambda: job.cancelled)
+        except SolveStopped:
+            job.check(budget=False)
+            raise
+
+    queue = JobQueue()
+    job = queue.submit(run)
+    time.sleep(1)
+    assert job.status == "Running"
+    cancelled = time.perf_counter()
+    job.cancel()
+    assert job.finished.wait(10)
+    assert job.status == "Cancelled"
+    assert time.perf_counter() - cancelled < 3
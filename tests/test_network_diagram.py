@@ -0,0 +1,31 @@
+import os
+import subprocess
+import sys
+import pandas as pd
+from network_diagram import create_sourcing_graph, SERIAL_ORDERS
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_draw_orders_in_pool(tmp_path):
+    orders = [f"Order#{o + 1}" for o in range(SERIAL_ORDERS + 4)]
+    fulfillment_solution = pd.DataFrame({
+        "Warehouse": [f"Warehouse#{o % 3 + 1}" for o in range(len(orders))] + ["Warehouse#1"],
+        "Order": orders + ["Order#1"],
+        "Product": ["Product#1"] * len(orders) + ["Product#2"],
+        "Supply Quantity": [2] * len(orders) + [0],
+    })
+    shipments = create_sourcing_graph(fulfillment_solution, plot_folder=str(tmp_path), processes=2)
+    assert len(shipments) == len(orders)
+    assert len([name for name in os.listdir(tmp_path) if name.endswith(".png")]) == len(orders)
+
+
+def test_import_app_does_not_start_it():
+    # Spawned worker processes import the main module again, which must not launch a second server
+    code = ("import gradio as gr\n"
+            "gr.Blocks.launch = lambda *args, **kwargs: sys.exit('launched')\n"
+            "import app\n"
+            "print('imported')\n")
+    result = subprocess.run([sys.executable, "-c", "import sys\n" + code], cwd=REPO, capture_output=True, text=True,
+                            timeout=120)
+    assert result.returncode == 0 and "imported" in result.stdout, result.stderr
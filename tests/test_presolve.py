@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from conftest import make_data
+from create_optimization_problem import create_sourcing_model
+from presolve import presolve_message, presolve_sourcing_model, restore_solution
+from solve_optimization_problem import solve_sourcing_problem
+
+
+def test_unserved_line():
+    # No warehouse has a route for Product#1 of Order#1
+    model = create_sourcing_model(*make_data(stock=[[5, 3], [4, 6]], quantity=[[3, 2], [4, 5]],
+                                             cost={(0, 0, 0): np.nan, (1, 0, 0): np.nan}))
+    _, _, _, report = presolve_sourcing_model(model)
+    assert not report["feasible"]
+    assert report["unserved_lines"] == [{"Order": "Order#1", "Product": "Product#1", "Quantity": 3}]
+    assert presolve_message(report) == "Order#1: no warehouse can ship Product#1 (3 ordered)"
+
+
+def test_forced_route():
+    # Only Warehouse#1 can ship Product#1 to Order#1, which leaves Warehouse#1 for Order#2
+    data = make_data(stock=[[5, 3], [4, 6]], quantity=[[3, 2], [4, 5]], cost={(1, 0, 0): np.nan})
+    model = create_sourcing_model(*data)
+    reduced, kept, fixed, report = presolve_sourcing_model(model)
+    assert report["feasible"] and report["fixed_variables"] >= 1
+    forced = np.flatnonzero((model.var_w == 0) & (model.var_o == 0) & (model.var_p == 0))
+    np.testing.assert_array_equal(fixed[forced], [3])
+    assert not kept[forced].any()
+    assert reduced.stock[0, 0] == 2 and reduced.quantity[0, 0] == 0
+
+    # The restored solution of the reduced model is as good as solving the whole model
+    solve_sourcing_problem(model, engine="highs")
+    expected = model.solve_info["objective"]
+    presolved = create_sourcing_model(*data)
+    status, _, _ = solve_sourcing_problem(presolved, engine="highs", presolve=True)
+    assert status == "Optimal"
+    assert presolved.solve_info["objective"] == pytest.approx(expected)
+    assert restore_solution(kept, fixed, np.zeros(reduced.num_variables))[forced] == 3
+
+
+def test_short_stock():
+    # Both orders can only get Product#2 from Warehouse#2, which holds 4 of the 7 ordered
+    data = make_data(stock=[[5, 9], [4, 4]], quantity=[[3, 2], [1, 5]],
+                     cost={(0, 0, 1): np.nan, (0, 1, 1): np.nan})
+    _, _, _, report = presolve_sourcing_model(create_sourcing_model(*data))
+    assert not report["feasible"] and not report["infeasible_products"]
+    assert report["short_stock"] == [{"Warehouse": "Warehouse#2", "Product": "Product#2", "Short By": 3}]
+    assert "Warehouse#2: short of Product#2 by 3" in presolve_message(report)
+
+    status, _, _ = solve_sourcing_problem(create_sourcing_model(*data), engine="highs", presolve=True)
+    assert status == "Infeasible"
@@ -0,0 +1,20 @@
+import os
+import shutil
+from read_data import cached_arrays, clear_cache, load_data_cached, read_sheet_cached, SHEETS
+
+
+def test_tables_from_cached_sheets_reuse_arrays(tmp_path):
+    filepath = str(tmp_path / 'Intelligent_Sourcing.xlsx')
+    shutil.copyfile(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'Intelligent_Sourcing.xlsx'), filepath)
+    clear_cache()
+    # Every sheet viewed first, as in the View/Edit Data tab, then loaded for a run
+    for sheet in SHEETS:
+        read_sheet_cached(filepath, sheet)
+    tables = load_data_cached(filepath)[1:]
+    assert all('dataset_key' in df.attrs for df in tables)
+
+    computed = []
+    compute = lambda: computed.append(1) or {}
+    cached_arrays(list(tables), 'test', compute)
+    cached_arrays(list(load_data_cached(filepath)[1:]), 'test', compute)
+    assert len(computed) == 1
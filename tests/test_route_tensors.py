@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+from route_tensors import LaneValues, RouteTensors
+
+WAREHOUSES, ORDERS, PRODUCTS = ['W1', 'W2'], ['O1', 'O2', 'O3'], ['P1', 'P2', 'P3', 'P4']
+
+
+def sheet(metric, routes, values):
+    return pd.DataFrame({'Warehouse': [w for w, _, _ in routes], 'Order': [o for _, o, _ in routes],
+                         'Product': [p for _, _, p in routes], metric: values})
+
+
+def test_sparse_sheets_are_held_as_lanes(tmp_path):
+    routes = [('W2', 'O3', 'P4'), ('W1', 'O1', 'P2'), ('W2', 'O3', 'P4')]
+    frames = {'Cost': sheet('Cost', routes, [5, 7, 9]),
+              'Distance': sheet('Distance', routes[:2], [1, 2]),
+              'Days': sheet('Days', routes[1::-1], [3, 4])}
+    tensors = RouteTensors.from_frames(WAREHOUSES, ORDERS, PRODUCTS, frames)
+    assert all(isinstance(tensor, LaneValues) for tensor in tensors.metrics.values())
+
+    # Lanes in (warehouse, order, product) order, the first of duplicate routes is kept
+    lanes = tensors.lanes()
+    np.testing.assert_array_equal(lanes, [1, 23])
+    np.testing.assert_array_equal(tensors.values('Cost', lanes), [7, 5])
+    np.testing.assert_array_equal(tensors.values('Days', lanes), [3, 4])
+    assert np.isnan(tensors.values('Cost', np.array([0, 22]))).all()
+
+    # Plain arrays, so the tensors can be cached in an .npz file
+    np.savez(tmp_path / 'arrays.npz', **tensors.arrays())
+    with np.load(tmp_path / 'arrays.npz', allow_pickle=False) as arrays:
+        cached = RouteTensors.from_arrays(WAREHOUSES, ORDERS, PRODUCTS, dict(arrays))
+    np.testing.assert_array_equal(cached.values('Cost', lanes), [7, 5])
+
+    tensors.save(tmp_path)
+    loaded = RouteTensors.load(tmp_path)
+    np.testing.assert_array_equal(loaded.values('Distance', lanes), [2, 1])
+    pd.testing.assert_frame_equal(loaded.to_frames()['Cost Data'], tensors.to_frames()['Cost Data'])
+
+
+def test_lanes_without_distance():
+    frames = {'Cost': sheet('Cost', [('W1', 'O1', 'P1'), ('W1', 'O2', 'P1')], [1, 2]),
+              'Distance': sheet('Distance', [('W1', 'O1', 'P1')], [1]),
+              'Days': sheet('Days', [('W1', 'O1', 'P1'), ('W1', 'O2', 'P1')], [1, 2])}
+    with pytest.raises(ValueError, match='Distance Data'):
+        RouteTensors.from_frames(WAREHOUSES, ORDERS, PRODUCTS, frames).lanes()
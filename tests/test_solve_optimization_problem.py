@@ -0,0 +1,74 @@
+import time
+import numpy as np
+import pytest
+from pulp import LpProblem, LpStatus, PULP_CBC_CMD, value
+from scipy import sparse
+from conftest import make_data
+import solve_optimization_problem
+from create_optimization_problem import create_sourcing_model, create_sourcing_problem, write_sourcing_mps
+from solve_optimization_problem import solve_highs, solve_sourcing_problem
+
+
+def test_solve_highs_without_variables():
+    A_ub, A_eq = sparse.csr_matrix((2, 0)), sparse.csr_matrix((3, 0))
+    for mip in [True, False]:
+        status, x, _ = solve_highs(np.zeros(0), A_ub, np.ones(2), A_eq, np.zeros(3), mip=mip)
+        assert status == "Optimal" and len(x) == 0
+        status, x, _ = solve_highs(np.zeros(0), A_ub, np.ones(2), A_eq, np.array([0, 2, 0]), mip=mip)
+        assert status == "Infeasible" and len(x) == 0
+
+
+@pytest.mark.parametrize("engine", ["highs", "highs-lp"])
+def test_highs_engines_without_variables(engine):
+    # Nothing ordered: no route becomes a variable and there is nothing to do
+    problem = create_sourcing_problem(*make_data(stock=[[5, 3]], quantity=[[0, 0]]))
+    status, fulfillment_solution, _ = solve_sourcing_problem(*problem, engine=engine)
+    assert status == "Optimal"
+    assert fulfillment_solution["Supply Quantity"].sum() == 0
+
+    # Ordered but not in stock anywhere
+    problem = create_sourcing_problem(*make_data(stock=[[0, 3]], quantity=[[2, 0]]))
+    status, _, _ = solve_sourcing_problem(*problem, engine=engine)
+    assert status == "Infeasible"
+
+
+def test_mps_round_trip(small_data, tmp_path):
+    model = create_sourcing_model(*small_data)
+    write_sourcing_mps(model, tmp_path / "sourcing.mps")
+    _, prob = LpProblem.fromMPS(str(tmp_path / "sourcing.mps"))
+    prob.solve(PULP_CBC_CMD(msg=0))
+    assert LpStatus[prob.status] == "Optimal"
+
+    problem = create_sourcing_problem(*small_data)
+    status, _, _ = solve_sourcing_problem(*problem)
+    assert status == "Optimal"
+    # The file minimizes the negated objective of the model
+    assert value(prob.objective) == pytest.approx(-value(problem[0].objective))
+
+
+@pytest.mark.parametrize("engine", ["cbc", "lp", "highs", "highs-lp", "flow"])
+def test_solve_sourcing_model(small_data, engine):
+    problem = create_sourcing_problem(*small_data)
+    status, expected, _ = solve_sourcing_problem(*problem, engine=engine)
+
+    # A model is solved without its PuLP problem unless the engine needs one
+    model = create_sourcing_model(*small_data)
+    status_model, fulfillment_solution, _ = solve_sourcing_problem(model, engine=engine)
+    assert status_model == status == "Optimal"
+    assert (model.pulp_problem is not None) == (engine in ("cbc", "lp"))
+    assert model.solve_info["objective"] == pytest.approx(problem[0].solve_info["objective"])
+    assert fulfillment_solution["Supply Quantity"].sum() == expected["Supply Quantity"].sum()
+
+
+def test_lp_relaxation_shares_time_limit(monkeypatch):
+    # The MIP fallback only gets what the LP solve left of the time limit
+    time_limits = []
+
+    def fractional_solve(c, A_ub, b_ub, A_eq, b_eq, mip=True, time_limit=None, gap_rel=None):
+        time_limits.append(time_limit)
+        time.sleep(0.2)
+        return "Optimal", np.full(len(c), 0.5), {}
+
+    monkeypatch.setattr(solve_optimization_problem, "solve_highs", fractional_solve)
+    solve_optimization_problem.solve_highs_lp_relaxation(np.ones(2), None, None, None, None, time_limit=1)
+    assert time_limits[0] == 1 and time_limits[1] == pytest.approx(0.8, abs=0.05)
@@ -0,0 +1,45 @@
+import pandas as pd
+from conftest import make_data
+from sqlite_store import load_sqlite_tables, save_sqlite_tables, update_table
+
+
+def saved_tables(tmp_path):
+    _, priority_df, warehouse_df, order_df, cost_df, _, _ = make_data(stock=[[5, 3], [4, 6]], quantity=[[3, 2], [4, 5]])
+    tables = {'Priority Data': priority_df, 'Warehouse Data': warehouse_df, 'Cost Data': cost_df}
+    filepath = tmp_path / 'dataset.sqlite'
+    save_sqlite_tables(filepath, tables)
+    return filepath, tables
+
+
+def test_update_table_writes_changed_values(tmp_path):
+    filepath, tables = saved_tables(tmp_path)
+    assert update_table(filepath, 'Warehouse Data', tables['Warehouse Data']) == 0
+
+    # One stock level is one stored row of the long table
+    warehouse_df = tables['Warehouse Data'].copy()
+    warehouse_df.loc[1, 'Product#2'] = 8
+    assert update_table(filepath, 'Warehouse Data', warehouse_df) == 1
+
+    cost_df = tables['Cost Data'].copy()
+    cost_df.loc[[0, 5], 'Cost'] = [2.5, 7]
+    assert update_table(filepath, 'Cost Data', cost_df) == 2
+
+    loaded = load_sqlite_tables(filepath, ['Warehouse Data', 'Cost Data'])
+    pd.testing.assert_frame_equal(loaded['Warehouse Data'], warehouse_df, check_dtype=False)
+    pd.testing.assert_frame_equal(loaded['Cost Data'], cost_df, check_dtype=False)
+
+
+def test_update_table_replaces_changed_keys(tmp_path):
+    filepath, tables = saved_tables(tmp_path)
+
+    # A renamed warehouse changes the keys
+    priority_df = tables['Priority Data'].replace({'Warehouse#2': 'Warehouse#3'})
+    assert update_table(filepath, 'Priority Data', priority_df) == 2
+
+    # An added product changes the columns of the workbook layout
+    warehouse_df = tables['Warehouse Data'].assign(**{'Product#3': [1, 2]})
+    assert update_table(filepath, 'Warehouse Data', warehouse_df) == 6
+
+    loaded = load_sqlite_tables(filepath, ['Priority Data', 'Warehouse Data'])
+    pd.testing.assert_frame_equal(loaded['Priority Data'], priority_df, check_dtype=False)
+    pd.testing.assert_frame_equal(loaded['Warehouse Data'], warehouse_df, check_dtype=False)
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from scipy import sparse
+from scipy.optimize import linprog
+from transportation_solver import solve_transportation_problem
+
+
+def random_instance(rng, num_supply, num_demand, density, fractional):
+    # Random arcs, at least one, that leave some demand nodes unreachable at low density
+    arcs = np.flatnonzero(rng.random(num_supply * num_demand) < density)
+    if len(arcs) == 0:
+        arcs = np.array([0])
+    tails, heads = np.divmod(arcs, num_demand)
+    cost = rng.integers(1, 20, len(arcs)).astype(float)
+    if fractional:
+        supply, demand = rng.random(num_supply) * 10, rng.random(num_demand) * 5
+    else:
+        supply, demand = rng.integers(0, 10, num_supply), rng.integers(0, 6, num_demand)
+    return tails, heads, cost, supply, demand
+
+
+def solve_linprog(tails, heads, cost, supply, demand):
+    columns = np.arange(len(cost))
+    A_ub = sparse.csr_matrix((np.ones(len(cost)), (tails, columns)), shape=(len(supply), len(cost)))
+    A_eq = sparse.csr_matrix((np.ones(len(cost)), (heads, columns)), shape=(len(demand), len(cost)))
+    return linprog(cost, A_ub=A_ub, b_ub=supply, A_eq=A_eq, b_eq=demand, method="highs")
+
+
+@pytest.mark.parametrize("fractional", [False, True])
+def test_matches_linprog(fractional):
+    rng = np.random.default_rng(3)
+    statuses = set()
+    for _ in range(40):
+        num_supply, num_demand = rng.integers(1, 8), rng.integers(1, 10)
+        tails, heads, cost, supply, demand = random_instance(rng, num_supply, num_demand, rng.uniform(0.2, 1), fractional)
+        status, flow = solve_transportation_problem(tails, heads, cost, supply, demand)
+        expected = solve_linprog(tails, heads, cost, supply, demand)
+        statuses.add(status)
+
+        assert status == ("Optimal" if expected.status == 0 else "Infeasible")
+        if status == "Optimal":
+            assert cost @ flow == pytest.approx(expected.fun, abs=1e-6)
+            assert (flow >= -1e-9).all()
+            np.testing.assert_allclose(np.bincount(heads, flow, len(demand)), demand, atol=1e-9)
+            assert (np.bincount(tails, flow, len(supply)) <= supply + 1e-9).all()
+            if not fractional:
+                np.testing.assert_allclose(flow, np.round(flow))
+    # The random instances cover both outcomes
+    assert statuses == {"Optimal", "Infeasible"}
+
+
+def test_surplus_stock_uses_cheapest_arcs():
+    # The first supply node is cheaper for both demand nodes but short, it serves the one where it saves most
+    status, flow = solve_transportation_problem([0, 0, 1, 1], [0, 1, 0, 1], [1, 2, 3, 5], [3, 10], [2, 2])
+    assert status == "Optimal"
+    np.testing.assert_allclose(flow, [1, 2, 1, 0])
+
+
+def test_infeasible():
+    # Enough stock in total but not where the demand can be reached
+    status, _ = solve_transportation_problem([0, 1], [0, 0], [1, 1], [1, 1], [3])
+    assert status == "Infeasible"
+    status, _ = solve_transportation_problem([0], [0], [1], [5], [1, 2])
+    assert status == "Infeasible"
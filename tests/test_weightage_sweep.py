@@ -0,0 +1,39 @@
+import pandas as pd
+import pytest
+from conftest import make_data
+from create_optimization_problem import METRICS, create_sourcing_model
+from solve_optimization_problem import solve_sourcing_problem
+from weightage_sweep import pareto_front, sweep_weightages, weightage_grid
+
+
+def test_weightage_grid():
+    grid = weightage_grid([0, 1])
+    assert len(grid) == 2 ** len(METRICS)
+    assert {'Cost': 1, 'Priority': 0, 'Distance': 1, 'Days': 0} in grid
+    assert len(weightage_grid({'Cost': [0, 0.5, 1], 'Priority': [1], 'Distance': [1], 'Days': [0, 1]})) == 6
+
+
+def test_sweep_matches_single_solves():
+    # Cheap routes come from the far warehouse, so cost and distance pull apart
+    data = make_data(stock=[[5, 5], [5, 5]], quantity=[[3, 2], [4, 1]],
+                     cost={(0, o, p): 5 for o in range(2) for p in range(2)})
+    weightage_list = [{'Cost': 1, 'Priority': 0, 'Distance': 0, 'Days': 0},
+                      {'Cost': 0, 'Priority': 0, 'Distance': 1, 'Days': 0},
+                      {'Cost': 1, 'Priority': 0, 'Distance': 1, 'Days': 0}]
+    results = sweep_weightages(create_sourcing_model(*data), weightage_list, processes=2)
+    assert list(results['Status']) == ['Optimal'] * 3
+
+    for scenario, weightage_dict in enumerate(weightage_list):
+        model = create_sourcing_model(weightage_dict, *data[1:])
+        solve_sourcing_problem(model, engine='highs')
+        assert results.loc[scenario, 'Objective'] == pytest.approx(model.solve_info['objective'])
+        assert results.loc[scenario, 'Weightage Cost'] == weightage_dict['Cost']
+
+
+def test_pareto_front():
+    results = pd.DataFrame({'Status': ['Optimal'] * 4 + ['Infeasible'],
+                            'Cost': [1, 2, 1, 3, 0], 'Priority': [0, 0, 0, 0, 0],
+                            'Distance': [3, 1, 3, 3, 0], 'Days': [0, 0, 0, 0, 0]}).rename_axis('Scenario')
+    pareto = pareto_front(results)
+    # Scenario 2 repeats scenario 0, scenario 3 is dominated and scenario 4 was not solved
+    assert list(pareto.index) == [0, 1]
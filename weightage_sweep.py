@@ -0,0 +1,127 @@
+import argparse
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from read_data import load_data_cached
+from create_optimization_problem import METRICS, create_sourcing_model
+from solve_optimization_problem import BLOCK_SOLVERS, solve_sourcing_model_decomposed
+
+# Model shared by the scenarios solved in a worker process
+_worker_model = None
+
+
+def weightage_grid(values):
+    """
+    Creates every combination of weightages from the given values.
+
+    Parameters:
+    values (list or dict): Values tried for every metric, or a dictionary of values per metric.
+
+    Returns:
+    list: One weightage dictionary per combination.
+    """
+    if not isinstance(values, dict):
+        values = {metric: values for metric in METRICS}
+    return [dict(zip(METRICS, combination)) for combination in itertools.product(*(values[m] for m in METRICS))]
+
+
+def _init_worker(model):
+    global _worker_model
+    _worker_model = model
+
+
+def _solve_scenario(args):
+    weightage_dict, engine = args
+    model = _worker_model
+    model.set_weights(weightage_dict)
+    status, x, _ = solve_sourcing_model_decomposed(model, BLOCK_SOLVERS[engine], processes=1)
+
+    # Objective components are the totals of the normalized metrics over the shipped quantities
+    result = {f"Weightage {metric}": weightage_dict[metric] for metric in METRICS}
+    result["Status"] = status
+    result["Objective"] = x @ model.c
+    for metric in METRICS:
+        result[metric] = x @ model.metrics[metric]
+    return result
+
+
+def sweep_weightages(model, weightage_list, engine="flow", processes=None):
+    """
+    Solves the same sourcing model for many weightages in a process pool.
+
+    Every worker receives the model once and only swaps the objective for each scenario.
+
+    Parameters:
+    model (SourcingModel): Array representation of the problem.
+    weightage_list (list): Weightage dictionaries to solve.
+    engine (str): Block solver used for every scenario, see BLOCK_SOLVERS.
+    processes (int): Number of worker processes, defaults to the number of CPUs.
+
+    Returns:
+    DataFrame: One row per scenario with its weightages, status, objective and the
+    total of every normalized metric.
+    """
+    tasks = [(weightage_dict, engine) for weightage_dict in weightage_list]
+    processes = processes or os.cpu_count()
+    chunksize = max(1, len(tasks) // (4 * processes))
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(model,)) as executor:
+        results = list(executor.map(_solve_scenario, tasks, chunksize=chunksize))
+    return pd.DataFrame(results).rename_axis("Scenario")
+
+
+def pareto_front(results):
+    """
+    Selects the optimal scenarios that are not dominated on the metric totals.
+
+    A scenario is dominated if another scenario is at least as good on every metric and
+    strictly better on one. Lower totals are better for every metric.
+
+    Parameters:
+    results (DataFrame): Output of sweep_weightages.
+
+    Returns:
+    DataFrame: The non-dominated scenarios.
+    """
+    optimal = results[results["Status"] == "Optimal"]
+    values = optimal[METRICS].to_numpy()
+
+    # dominated[i, j] is True when scenario j dominates scenario i
+    no_worse = np.all(values[None, :, :] <= values[:, None, :] + 1e-9, axis=2)
+    better = np.any(values[None, :, :] < values[:, None, :] - 1e-9, axis=2)
+    dominated = (no_worse & better).any(axis=1)
+
+    # Different weightages can lead to the same allocation, keep it once
+    return optimal[~dominated].drop_duplicates(subset=METRICS)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve the sourcing problem for many weightages.")
+    parser.add_argument("filepath", nargs="?", default="Intelligent_Sourcing.xlsx",
+                        help="Input dataset in any format supported by read_data.load_data.")
+    parser.add_argument("--grid", default="0,0.25,0.5,0.75,1",
+                        help="Comma separated weightage values tried for every metric.")
+    parser.add_argument("--weights", action="append",
+                        help="Cost,Priority,Distance,Days weightages of one scenario, can be repeated. Replaces --grid.")
+    parser.add_argument("--engine", default="flow", choices=sorted(BLOCK_SOLVERS))
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--output", default="weightage_sweep.csv", help="CSV file for all scenarios.")
+    parser.add_argument("--pareto-output", default="weightage_pareto.csv", help="CSV file for the Pareto set.")
+    args = parser.parse_args()
+
+    if args.weights:
+        weightage_list = [dict(zip(METRICS, map(float, weights.split(",")))) for weights in args.weights]
+    else:
+        weightage_list = weightage_grid([float(value) for value in args.grid.split(",")])
+
+    weightage_dict, priority_df, warehouse_df, order_df, cost_df, distance_df, days_df = load_data_cached(args.filepath)
+    model = create_sourcing_model(weightage_dict, priority_df, warehouse_df, order_df, cost_df, distance_df, days_df)
+
+    results = sweep_weightages(model, weightage_list, engine=args.engine, processes=args.processes)
+    pareto = pareto_front(results)
+    results.to_csv(args.output)
+    pareto.to_csv(args.pareto_output)
+
+    print(f"Solved {len(results)} scenarios, {len(pareto)} on the Pareto front.")
+    print(pareto)
@@ -0,0 +1,89 @@
+import os
+import shutil
+import tempfile
+import threading
+from read_data import SQLITE_EXTENSIONS
+
+# Folder the session workspaces are created in, set with the SOURCING_WORKSPACES environment variable
+WORKSPACE_ROOT = os.environ.get("SOURCING_WORKSPACES", os.path.join(tempfile.gettempdir(), "sourcing_workspaces"))
+
+# File name of the results of a workspace whose dataset is not a SQLite store
+RESULTS_FILE = "Sourcing_Results.xlsx"
+
+
+class Workspace:
+    """
+    Files and state of one user session of the app.
+
+    A workspace starts out reading a shared dataset, which it never writes. The dataset is
+    copied into the workspace folder on the first write (copy-on-write), so sessions that only
+    run optimizations on the sample data share its file and its cached tables, while edits of
+    one session are never seen by another. Results, diagrams and the problem kept for warm
+    starts live in the workspace too, so sessions can run at the same time.
+
+    The lock serializes the actions of the session itself, e.g. a save while its run is going on.
+
+    Usage:
+        workspace = Workspace("Intelligent_Sourcing.xlsx")
+        write_sheets(workspace.writable_dataset(), {'Weightage': weightage_df})
+        workspace.close()
+    """
+
+    def __init__(self, shared_dataset, root=WORKSPACE_ROOT):
+        """
+        Parameters:
+        shared_dataset (str): Path of the dataset the session starts with, only ever read.
+        root (str): Folder the workspace folder is created in.
+        """
+        os.makedirs(root, exist_ok=True)
+        self.folder = tempfile.mkdtemp(prefix="session_", dir=root)
+        self.shared_dataset = shared_dataset
+        self.dataset = shared_dataset
+        self.plot_folder = os.path.join(self.folder, "plots")
+        self.lock = threading.RLock()
+
+        # Problem built by the last run, the signature of the dataset it was built from and the
+        # weightages it should be solved with
+        self.sourcing_problem = None
+        self.sourcing_problem_signature = None
+        self.sourcing_weightage_dict = None
+        # Shipments of the last run grouped by order, used to draw diagrams on demand
+        self.plot_shipments = None
+
+    @property
+    def is_store(self):
+        # True if the dataset is a SQLite store, which also holds the results
+        return os.path.splitext(self.dataset)[1].lower() in SQLITE_EXTENSIONS
+
+    @property
+    def results_file(self):
+        """
+        Path the results of the session are written to and read from.
+        """
+        return self.dataset if self.is_store else os.path.join(self.folder, RESULTS_FILE)
+
+    def path(self, name):
+        """
+        Returns the path of a file in the workspace folder.
+        """
+        return os.path.join(self.folder, name)
+
+    def writable_dataset(self):
+        """
+        Returns the path of the dataset for writing, copying the shared dataset into the workspace
+        folder the first time.
+        """
+        if self.dataset == self.shared_dataset:
+            copy = self.path(os.path.basename(os.path.normpath(self.shared_dataset)))
+            if os.path.isdir(self.shared_dataset):
+                shutil.copytree(self.shared_dataset, copy)
+            else:
+                shutil.copy2(self.shared_dataset, copy)
+            self.dataset = copy
+        return self.dataset
+
+    def close(self):
+        """
+        Deletes the workspace folder.
+        """
+        shutil.rmtree(self.folder, ignore_errors=True)